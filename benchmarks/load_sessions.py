@@ -0,0 +1,489 @@
+"""
+Measure how many concurrent sessions one process sustains before latency degrades.
+
+Each concurrency level runs in a fresh interpreter: N text-mode `AgentSession`s
+(as in tests/test_agent.py) run scripted caller turns against the real
+`Assistant` or `InvoiceReminderAgent` and their tools. The providers are local
+stand-ins with fixed latencies, so the numbers are the agent's own cost:
+
+- the LLM is a scripted fake that streams replies and calls the agents' tools
+- knowledge base search goes to an in-process retriever instead of Weaviate
+- MCP tools come from a local FastMCP server, started once for all levels
+
+Reported per level: turn latency percentiles, event-loop lag, CPU and RSS per
+session, and the largest level that stayed within the degradation limits.
+
+    python benchmarks/load_sessions.py --sessions 1 10 25 50 100
+    python benchmarks/load_sessions.py --agent invoice_reminder --turns 6 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.append(SRC)
+
+# (user input, tool the fake LLM calls for it, tool arguments) per agent, cycled through
+SCRIPTS = {
+    "assistant": [
+        (
+            "Hi, what are your opening hours?",
+            "search_knowledge_base",
+            {"query": "opening hours"},
+        ),
+        ("Is there a free slot on Monday?", "check_availability", {"day": "monday"}),
+        (
+            "How much does a cleaning cost?",
+            "search_knowledge_base",
+            {"query": "cleaning price"},
+        ),
+        ("Great, thanks. That's all.", None, None),
+    ],
+    "invoice_reminder": [
+        (
+            "Hi, I got a message about an invoice.",
+            "lookup_outstanding_invoices",
+            {"customer_phone": "+15550100"},
+        ),
+        ("Can I pay it next week?", None, None),
+        (
+            "Which invoices are still open?",
+            "lookup_outstanding_invoices",
+            {"customer_phone": "+15550100"},
+        ),
+        ("Okay, thank you.", None, None),
+    ],
+}
+
+REPLY = "Sure, I can help with that. Here is what I found for you, is there anything else I can do?"
+
+# Runs in its own interpreter so its CPU does not count towards the measured sessions
+_MCP_SERVER = """
+import asyncio, sys
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("load-test", host="127.0.0.1", port=int(sys.argv[1]), log_level="WARNING")
+latency = float(sys.argv[2])
+
+@server.tool()
+async def check_availability(day: str) -> str:
+    \"\"\"Free appointment slots on a day.\"\"\"
+    await asyncio.sleep(latency)
+    return f"Free on {day}: 09:00, 11:30 and 15:00"
+
+server.run("streamable-http")
+"""
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def _make_fakes(args):
+    """Fake LLM and retriever classes; defined late so the parent process does not import livekit"""
+    from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, llm
+
+    script = {text: (tool, arguments) for text, tool, arguments in SCRIPTS[args.agent]}
+
+    class ScriptedStream(llm.LLMStream):
+        async def _run(self) -> None:
+            await asyncio.sleep(args.llm_ttft)
+            names = set(llm.ToolContext(list(self._tools)).function_tools)
+            last = self._chat_ctx.items[-1] if self._chat_ctx.items else None
+            tool, arguments = None, None
+            if last is not None and last.type == "message" and last.role == "user":
+                tool, arguments = script.get(last.text_content or "", (None, None))
+            request_id = f"fake-{id(self)}"
+            if tool in names:
+                call = llm.FunctionToolCall(
+                    name=tool,
+                    arguments=json.dumps(arguments),
+                    call_id=f"call-{id(self)}",
+                )
+                self._event_ch.send_nowait(
+                    llm.ChatChunk(
+                        id=request_id,
+                        delta=llm.ChoiceDelta(role="assistant", tool_calls=[call]),
+                    )
+                )
+            else:
+                for word in REPLY.split():
+                    self._event_ch.send_nowait(
+                        llm.ChatChunk(
+                            id=request_id,
+                            delta=llm.ChoiceDelta(role="assistant", content=word + " "),
+                        )
+                    )
+                    await asyncio.sleep(1 / args.llm_tokens_per_second)
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    id=request_id,
+                    usage=llm.CompletionUsage(
+                        completion_tokens=20, prompt_tokens=800, total_tokens=820
+                    ),
+                )
+            )
+
+    class ScriptedLLM(llm.LLM):
+        @property
+        def model(self) -> str:
+            return "scripted"
+
+        def chat(
+            self,
+            *,
+            chat_ctx,
+            tools=None,
+            conn_options=DEFAULT_API_CONNECT_OPTIONS,
+            **kwargs,
+        ):
+            return ScriptedStream(
+                self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options
+            )
+
+    class FakeRetriever:
+        """Stands in for WeaviateRAG with a fixed search latency"""
+
+        last_context_tokens = 120
+
+        async def retrieve_context(self, query: str, limit: int = 3) -> str:
+            await asyncio.sleep(args.rag_latency)
+            return f"Context for {query}: open weekdays 08:00-17:00, a cleaning is 85 euros."
+
+        def close(self) -> None:
+            pass
+
+    return ScriptedLLM, FakeRetriever
+
+
+async def _monitor(lag_ms: List[float], rss_peak: List[int], interval: float = 0.05):
+    """Sample event-loop lag (oversleep of a short sleep) and peak RSS"""
+    ticks = 0
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms.append(max(0.0, (time.perf_counter() - start - interval) * 1000))
+        ticks += 1
+        if ticks % 10 == 0:
+            rss_peak[0] = max(rss_peak[0], rss_kb())
+
+
+async def _run_session(
+    index: int,
+    args,
+    fakes,
+    mcp_url: Optional[str],
+    turn_ms: List[float],
+    errors: List[str],
+):
+    from livekit.agents import AgentSession
+
+    scripted_llm, fake_retriever = fakes
+    rng = random.Random(index)
+    await asyncio.sleep(args.ramp * index / max(1, args.level))
+
+    if args.agent == "assistant":
+        from agent import Assistant
+
+        agent = Assistant(prefetch="off")
+        agent.rag = fake_retriever()
+    else:
+        from agents.invoice_reminder import InvoiceReminderAgent
+
+        agent = InvoiceReminderAgent()
+
+    mcp_server = None
+    if mcp_url:
+        from mcp_pool import PooledMCPServerHTTP
+
+        # One MCP session per call, as separate job processes would have; like a job
+        # it stays open until the process exits
+        mcp_server = PooledMCPServerHTTP(mcp_url)
+    try:
+        async with (
+            scripted_llm() as fake_llm,
+            AgentSession(
+                llm=fake_llm, mcp_servers=[mcp_server] if mcp_server else []
+            ) as session,
+        ):
+            await session.start(agent)
+            script = SCRIPTS[args.agent]
+            for turn in range(args.turns):
+                user_input = script[turn % len(script)][0]
+                started = time.perf_counter()
+                await session.run(user_input=user_input)
+                turn_ms.append((time.perf_counter() - started) * 1000)
+                # The caller listens to the reply and speaks the next turn
+                await asyncio.sleep(args.think * rng.uniform(0.5, 1.5))
+    except Exception as e:
+        errors.append(f"session {index}: {type(e).__name__}: {e}")
+
+
+async def run_level(args) -> Dict:
+    """Run `args.level` concurrent sessions in this process and measure them"""
+    fakes = _make_fakes(args)
+    if args.agent == "assistant":
+        import agent  # noqa: F401 - module import cost belongs to the baseline
+    else:
+        import agents.invoice_reminder  # noqa: F401
+
+    lag_ms: List[float] = []
+    baseline_rss = rss_kb()
+    rss_peak = [baseline_rss]
+    monitor = asyncio.create_task(_monitor(lag_ms, rss_peak))
+    turn_ms: List[float] = []
+    errors: List[str] = []
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    await asyncio.gather(
+        *(
+            _run_session(i, args, fakes, args.mcp_url, turn_ms, errors)
+            for i in range(args.level)
+        )
+    )
+    wall_s, cpu_s = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    monitor.cancel()
+
+    return {
+        "sessions": args.level,
+        "turns": len(turn_ms),
+        "errors": errors[:5],
+        "turn_ms": {f"p{q}": percentile(turn_ms, q) for q in (50, 95, 99)},
+        "loop_lag_ms": {
+            "p50": percentile(lag_ms, 50),
+            "p99": percentile(lag_ms, 99),
+            "max": max(lag_ms, default=None),
+        },
+        "cpu_core_pct_per_session": cpu_s / wall_s / args.level * 100,
+        "cpu_ms_per_turn": cpu_s * 1000 / max(1, len(turn_ms)),
+        "baseline_rss_mib": baseline_rss / 1024,
+        "rss_mib_per_session": (rss_peak[0] - baseline_rss) / 1024 / args.level,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mcp_server(latency: float) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-c", _MCP_SERVER, str(port), str(latency)]
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}/mcp"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Fake MCP server did not start")
+
+
+def run(args) -> Dict:
+    server, mcp_url = (None, None)
+    if args.agent == "assistant" and not args.no_mcp:
+        server, mcp_url = start_mcp_server(args.mcp_latency)
+    env = {
+        **os.environ,
+        # Keep the measured processes from writing metrics snapshots and schema caches
+        "AGENT_METRICS_DIR": "",
+        "MCP_TOOLS_CACHE_DIR": "",
+    }
+    levels = []
+    try:
+        for level in args.sessions:
+            command = [
+                sys.executable,
+                __file__,
+                "--child-level",
+                str(level),
+                *_child_args(args, mcp_url),
+            ]
+            result = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=os.path.join(SRC, ".."),
+            )
+            if result.returncode != 0:
+                levels.append(
+                    {
+                        "sessions": level,
+                        "errors": [result.stderr.strip().splitlines()[-1]],
+                    }
+                )
+                continue
+            levels.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return {"agent": args.agent, "levels": levels, "capacity": capacity(levels, args)}
+
+
+def _child_args(args, mcp_url: Optional[str]) -> List[str]:
+    child = [
+        "--agent",
+        args.agent,
+        "--turns",
+        str(args.turns),
+        "--think",
+        str(args.think),
+        "--ramp",
+        str(args.ramp),
+        "--llm-ttft",
+        str(args.llm_ttft),
+        "--llm-tokens-per-second",
+        str(args.llm_tokens_per_second),
+        "--rag-latency",
+        str(args.rag_latency),
+    ]
+    return child + (["--mcp-url", mcp_url] if mcp_url else [])
+
+
+def capacity(levels: List[Dict], args) -> Optional[int]:
+    """
+    Largest level whose p95 turn latency stays within `max_degradation` of the
+    lowest level's, with p99 loop lag under `max_loop_lag_ms` and no errors
+    """
+    measured = [level for level in levels if level.get("turns")]
+    if not measured:
+        return None
+    reference = measured[0]["turn_ms"]["p95"]
+    sustained = None
+    for level in measured:
+        if (
+            level["errors"]
+            or level["turn_ms"]["p95"] > reference * (1 + args.max_degradation)
+            or level["loop_lag_ms"]["p99"] > args.max_loop_lag_ms
+        ):
+            break
+        sustained = level["sessions"]
+    return sustained
+
+
+def print_table(results: Dict) -> None:
+    print(
+        f"{'sessions':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'lag p99':>10}"
+        f"{'CPU %/sess':>12}{'CPU ms/turn':>13}{'MiB/sess':>10}  errors"
+    )
+    for level in results["levels"]:
+        if not level.get("turns"):
+            print(
+                f"{level['sessions']:>8}  failed: {'; '.join(level['errors']) or 'no turns completed'}"
+            )
+            continue
+        turn = level["turn_ms"]
+        print(
+            f"{level['sessions']:>8}{turn['p50']:>10.0f}{turn['p95']:>10.0f}{turn['p99']:>10.0f}"
+            f"{level['loop_lag_ms']['p99']:>10.1f}{level['cpu_core_pct_per_session']:>12.2f}"
+            f"{level['cpu_ms_per_turn']:>13.1f}{level['rss_mib_per_session']:>10.2f}  {len(level['errors'])}"
+        )
+    measured = [level for level in results["levels"] if level.get("turns")]
+    if measured:
+        print(f"\nbaseline process RSS: {measured[0]['baseline_rss_mib']:.0f} MiB")
+    print(
+        f"sustained sessions per process: {results['capacity'] or 'none within limits'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concurrent session load test against local provider stand-ins"
+    )
+    parser.add_argument("--agent", choices=sorted(SCRIPTS), default="assistant")
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=[1, 10, 25, 50],
+        help="Concurrency levels to run",
+    )
+    parser.add_argument("--turns", type=int, default=8, help="Caller turns per session")
+    parser.add_argument(
+        "--think",
+        type=float,
+        default=2.0,
+        help="Mean seconds between the reply and the next caller turn",
+    )
+    parser.add_argument(
+        "--ramp", type=float, default=2.0, help="Seconds over which the sessions start"
+    )
+    parser.add_argument(
+        "--llm-ttft", type=float, default=0.3, help="Fake LLM time to first token"
+    )
+    parser.add_argument(
+        "--llm-tokens-per-second",
+        type=float,
+        default=100.0,
+        help="Fake LLM streaming rate",
+    )
+    parser.add_argument(
+        "--rag-latency",
+        type=float,
+        default=0.15,
+        help="Fake knowledge base search latency",
+    )
+    parser.add_argument(
+        "--mcp-latency", type=float, default=0.2, help="Fake MCP tool latency"
+    )
+    parser.add_argument(
+        "--no-mcp", action="store_true", help="Run without the fake MCP server"
+    )
+    parser.add_argument(
+        "--max-degradation",
+        type=float,
+        default=0.2,
+        help="Allowed p95 turn latency growth over the lowest level",
+    )
+    parser.add_argument(
+        "--max-loop-lag-ms", type=float, default=50.0, help="Allowed p99 event-loop lag"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--child-level", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mcp-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_level is not None:
+        import logging
+
+        logging.basicConfig(level=logging.ERROR)
+        args.level = args.child_level
+        print(json.dumps(asyncio.run(run_level(args))))
+        return
+
+    results = run(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+Benchmark `WeaviateRAG` retrieval on recorded responses.
+
+Queries are answered by a replay client serving the responses recorded in
+benchmarks/fixtures/rag_replay.json, with a seeded, injectable network round
+trip per request, so runs are repeatable and comparable between commits:
+
+- `retrieve_context`: the whole uncached path, existence check and search
+  included, as the agent's tool sees it
+- `_sync_search`: one search round trip on the client
+- `_format_results`: turning a response into context (packing included)
+
+Reported per operation: p50/p95/p99 latency, latency minus injected network
+time, and allocation peak per call (tracemalloc). Also the output tokens of
+each query's context. Results are written as JSON keyed by commit; compare two
+runs with `--compare`, which fails on a latency, allocation or token regression.
+
+    python benchmarks/rag_retrieval.py
+    python benchmarks/rag_retrieval.py --rtt-ms 40 --jitter-ms 10 --compare .cache/benchmarks/rag_retrieval-abc1234.json
+    python benchmarks/rag_retrieval.py --record --tenant acme   # needs Weaviate credentials
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Sequence
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from context_packer import estimate_tokens
+from db_utils import WeaviateRAG
+
+FIXTURE = Path(__file__).parent / "fixtures" / "rag_replay.json"
+RESULTS_DIR = Path(".cache/benchmarks")
+OPERATIONS = ("retrieve_context", "sync_search", "format_results")
+
+
+class _QueryVector(list):
+    """Embedding stand-in that remembers its query, so near_vector can be replayed"""
+
+    def __init__(self, query: str):
+        super().__init__([0.0])
+        self.query = query
+
+
+class ReplayEmbedder:
+    async def embed(self, query: str) -> List[float]:
+        return _QueryVector(query)
+
+
+class ReplayClient:
+    """
+    Synchronous Weaviate client stand-in answering from recorded responses.
+
+    Every request (existence check, search) sleeps one simulated round trip of
+    `rtt_ms` plus seeded uniform jitter; `injected` sums the sleeps since the
+    last reset.
+    """
+
+    def __init__(
+        self,
+        responses: Dict[str, List[Dict]],
+        rtt_ms: float,
+        jitter_ms: float,
+        seed: int = 0,
+    ):
+        self.responses = responses
+        self.rtt_ms = rtt_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self.injected = 0.0
+        self.collections = self
+        self.query = self
+
+    def _round_trip(self):
+        delay = (
+            max(
+                0.0, self.rtt_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            )
+            / 1000
+        )
+        self.injected += delay
+        if delay:
+            time.sleep(delay)
+
+    def _response(self, query: str, limit: int):
+        objects = [
+            SimpleNamespace(
+                properties=obj["properties"],
+                metadata=SimpleNamespace(distance=obj["distance"]),
+            )
+            for obj in self.responses.get(query, [])[:limit]
+        ]
+        return SimpleNamespace(objects=objects)
+
+    def exists(self, name: str) -> bool:
+        self._round_trip()
+        return True
+
+    def get(self, name: str):
+        return self
+
+    def near_text(self, query: str, limit: int, return_metadata=None):
+        self._round_trip()
+        return self._response(query, limit)
+
+    def near_vector(self, near_vector, limit: int, return_metadata=None):
+        self._round_trip()
+        return self._response(near_vector.query, limit)
+
+
+class ReplayPool:
+    def __init__(self, client: ReplayClient):
+        self.client = client
+
+    def acquire(self, tenant_id: str) -> ReplayClient:
+        return self.client
+
+    def release(self, client):
+        pass
+
+    def invalidate(self, client):
+        pass
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+def make_rag(client: ReplayClient, tenant_id: str) -> WeaviateRAG:
+    rag = WeaviateRAG(tenant_id, pool=ReplayPool(client), embedder=ReplayEmbedder())
+    # Measure the uncached remote path; the result cache and local mirror have their own tests
+    rag.cache = None
+    rag.local_index = None
+    return rag
+
+
+def _operations(
+    rag: WeaviateRAG, client: ReplayClient, limit: int, loop: asyncio.AbstractEventLoop
+) -> Dict[str, Callable[[str], object]]:
+    responses = {query: client._response(query, limit) for query in client.responses}
+    return {
+        "retrieve_context": lambda query: loop.run_until_complete(
+            rag.retrieve_context(query, limit)
+        ),
+        "sync_search": lambda query: rag._sync_search(query, limit),
+        "format_results": lambda query: rag._format_results(responses[query], query),
+    }
+
+
+def measure(fixture: Dict, args) -> Dict:
+    queries = sorted(fixture["responses"])
+    limit = args.limit or fixture["limit"]
+    results: Dict = {}
+    rags: List[WeaviateRAG] = []
+    loop = asyncio.new_event_loop()
+    try:
+        # Timing pass, with network latency
+        client = ReplayClient(
+            fixture["responses"], args.rtt_ms, args.jitter_ms, args.seed
+        )
+        rag = make_rag(client, fixture["tenant_id"])
+        rags.append(rag)
+        for name, operation in _operations(rag, client, limit, loop).items():
+            for query in queries[: args.warmup]:
+                operation(query)
+            elapsed, overhead = [], []
+            for _ in range(args.iterations):
+                for query in queries:
+                    client.injected = 0.0
+                    start = time.perf_counter()
+                    operation(query)
+                    seconds = time.perf_counter() - start
+                    elapsed.append(seconds * 1000)
+                    overhead.append((seconds - client.injected) * 1000)
+            results[name] = {
+                "latency_ms": percentiles(elapsed),
+                "overhead_ms": percentiles(overhead),
+                "calls": len(elapsed),
+            }
+
+        # Allocation pass, without latency so tracing overhead does not stretch the run
+        client = ReplayClient(fixture["responses"], 0, 0, args.seed)
+        rag = make_rag(client, fixture["tenant_id"])
+        rags.append(rag)
+        tracemalloc.start()
+        try:
+            for name, operation in _operations(rag, client, limit, loop).items():
+                peaks = []
+                for query in queries:
+                    operation(query)  # first call allocates one-off state
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    operation(query)
+                    peaks.append((tracemalloc.get_traced_memory()[1] - before) / 1024)
+                results[name]["alloc_peak_kib"] = percentiles(peaks)
+        finally:
+            tracemalloc.stop()
+
+        contexts = {
+            query: rag._format_results(client._response(query, limit), query)
+            for query in queries
+        }
+    finally:
+        for rag in rags:
+            rag.close()
+        loop.close()
+
+    tokens = {query: estimate_tokens(context) for query, context in contexts.items()}
+    results["output_tokens"] = {
+        "mean": sum(tokens.values()) / len(tokens),
+        "max": max(tokens.values()),
+        "per_query": tokens,
+    }
+    return results
+
+
+def _git_commit() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+        )
+        return {"commit": commit.stdout.strip(), "dirty": bool(dirty.stdout.strip())}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": True}
+
+
+def run(args) -> Dict:
+    logging.basicConfig(level=logging.WARNING)
+    fixture_bytes = Path(args.fixture).read_bytes()
+    fixture = json.loads(fixture_bytes)
+    return {
+        "meta": {
+            **_git_commit(),
+            "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "fixture": str(args.fixture),
+            "fixture_sha256": hashlib.sha256(fixture_bytes).hexdigest()[:16],
+            "settings": {
+                "rtt_ms": args.rtt_ms,
+                "jitter_ms": args.jitter_ms,
+                "seed": args.seed,
+                "iterations": args.iterations,
+                "limit": args.limit or fixture["limit"],
+                "context_token_budget": int(
+                    os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600")
+                ),
+            },
+        },
+        "results": measure(fixture, args),
+    }
+
+
+def compare(current: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """
+    Print the change of every metric against a baseline run.
+
+    Returns:
+        Regressions: p95 latency, median overhead, allocation peak, or mean
+        output tokens growing by more than `max_regression` and by more than
+        the metric's noise floor
+    """
+    if current["meta"]["settings"] != baseline["meta"]["settings"]:
+        print(
+            "warning: the runs used different settings, the comparison is not like for like"
+        )
+    if current["meta"]["fixture_sha256"] != baseline["meta"]["fixture_sha256"]:
+        print("warning: the runs used different fixtures")
+
+    regressions = []
+    print(
+        f"\n{'vs ' + baseline['meta']['commit']:<34}{'baseline':>12}{'current':>12}{'change':>10}"
+    )
+    # (label, path to the value, smallest absolute change that is not noise)
+    rows = []
+    for operation in OPERATIONS:
+        rows += [
+            (
+                f"{operation} latency p95 ms",
+                ("results", operation, "latency_ms", "p95"),
+                1.0,
+            ),
+            (
+                f"{operation} overhead p50 ms",
+                ("results", operation, "overhead_ms", "p50"),
+                0.25,
+            ),
+            (
+                f"{operation} alloc peak p95 KiB",
+                ("results", operation, "alloc_peak_kib", "p95"),
+                1.0,
+            ),
+        ]
+    rows.append(("output tokens mean", ("results", "output_tokens", "mean"), 1.0))
+    for label, path, noise in rows:
+        old, new = baseline, current
+        for key in path:
+            old, new = old[key], new[key]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > max_regression and new - old > noise:
+            regressions.append(f"{label}: {old:.2f} -> {new:.2f} ({change:+.0%})")
+            flag = "  REGRESSION"
+        print(f"{label:<34}{old:>12.2f}{new:>12.2f}{change:>+10.0%}{flag}")
+    return regressions
+
+
+def print_table(results: Dict) -> None:
+    meta = results["meta"]
+    print(
+        f"commit {meta['commit']}{' (dirty)' if meta['dirty'] else ''}, "
+        f"rtt {meta['settings']['rtt_ms']}ms +/- {meta['settings']['jitter_ms']}ms, limit {meta['settings']['limit']}"
+    )
+    print(
+        f"{'operation':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'overhead p95':>14}{'alloc KiB p95':>15}"
+    )
+    for operation in OPERATIONS:
+        result = results["results"][operation]
+        latency = result["latency_ms"]
+        print(
+            f"{operation:<20}{latency['p50']:>9.2f}{latency['p95']:>9.2f}{latency['p99']:>9.2f}"
+            f"{result['overhead_ms']['p95']:>14.3f}{result['alloc_peak_kib']['p95']:>15.1f}"
+        )
+    tokens = results["results"]["output_tokens"]
+    print(f"output tokens: mean {tokens['mean']:.0f}, max {tokens['max']}")
+
+
+def record(args):
+    """Record the fixture's queries (or --queries) from a live Weaviate tenant"""
+    from dotenv import load_dotenv
+
+    load_dotenv(".env.local")
+    logging.basicConfig(level=logging.WARNING)
+    fixture = (
+        json.loads(Path(args.fixture).read_text())
+        if Path(args.fixture).exists()
+        else {"responses": {}}
+    )
+    queries = args.queries or sorted(fixture["responses"])
+    limit = args.limit or fixture.get("limit", 5)
+
+    rag = WeaviateRAG(args.tenant)
+    responses = {}
+    try:
+        for query in queries:
+            response = rag._sync_search(query, limit)
+            responses[query] = [
+                {
+                    "properties": {
+                        key: obj.properties.get(key, "")
+                        for key in ("title", "filename", "content")
+                    },
+                    "distance": obj.metadata.distance,
+                }
+                for obj in (response.objects if response else [])
+            ]
+            print(f"{query!r}: {len(responses[query])} objects")
+    finally:
+        rag.close()
+
+    recorded = {
+        "tenant_id": args.tenant,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": f"Weaviate collection Documents_{args.tenant}",
+        "limit": limit,
+        "responses": responses,
+    }
+    Path(args.fixture).write_text(json.dumps(recorded, indent=2) + "\n")
+    print(f"Recorded {len(responses)} queries to {args.fixture}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deterministic WeaviateRAG retrieval benchmark on recorded responses"
+    )
+    parser.add_argument(
+        "--fixture", default=str(FIXTURE), help="Recorded responses to replay"
+    )
+    parser.add_argument(
+        "--rtt-ms",
+        type=float,
+        default=25.0,
+        help="Simulated network round trip per request",
+    )
+    parser.add_argument(
+        "--jitter-ms",
+        type=float,
+        default=5.0,
+        help="Uniform jitter around the round trip",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the jitter")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10,
+        help="Passes over the fixture's queries per operation",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=3,
+        help="Queries run before measuring each operation",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        help="Search limit, the fixture's recording limit by default",
+    )
+    parser.add_argument(
+        "--output",
+        help="Where to write the results, .cache/benchmarks/rag_retrieval-<commit>.json by default",
+    )
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to compare against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.10,
+        help="Allowed growth of a compared metric",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Record the fixture from a live tenant instead",
+    )
+    parser.add_argument("--tenant", default="default", help="Tenant to record from")
+    parser.add_argument(
+        "--queries", nargs="*", help="Queries to record, the fixture's by default"
+    )
+    args = parser.parse_args()
+
+    if args.record:
+        record(args)
+        return
+
+    results = run(args)
+    output = (
+        Path(args.output)
+        if args.output
+        else RESULTS_DIR / f"rag_retrieval-{results['meta']['commit']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+        print(f"\nWrote {output}")
+
+    if args.compare:
+        regressions = compare(
+            results, json.loads(Path(args.compare).read_text()), args.max_regression
+        )
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
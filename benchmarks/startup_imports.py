@@ -0,0 +1,128 @@
+"""
+Measure what each provider plugin costs a worker at startup.
+
+Every plugin is imported in a fresh interpreter after `livekit.agents`, so the
+numbers are the plugin's own import time and resident memory, not shared
+dependencies another plugin already pulled in.
+
+    python benchmarks/startup_imports.py
+    AGENT_PIPELINE=cascade python benchmarks/startup_imports.py --json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from pipeline import PLUGIN_MODULES, PipelineConfig
+
+# Runs in the child interpreter; prints {"ms": ..., "rss_kb": ...} for importing the given modules
+_PROBE = """
+import importlib, json, sys, time
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+import livekit.agents  # noqa: F401 - every worker pays this regardless of the pipeline
+rss_before = rss_kb()
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "rss_kb": rss_kb() - rss_before}))
+"""
+
+
+def measure(modules: List[str], repeat: int = 3) -> Dict[str, float]:
+    """Median import time and RSS growth of importing `modules` in a fresh interpreter"""
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE, *modules],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    runs.sort(key=lambda run: run["ms"])
+    return runs[len(runs) // 2]
+
+
+def run(
+    config: PipelineConfig, repeat: int, plugins: Optional[List[str]] = None
+) -> Dict:
+    plugins = plugins or sorted(PLUGIN_MODULES)
+    results: Dict = {"plugins": {}}
+    for name in plugins:
+        try:
+            results["plugins"][name] = measure([PLUGIN_MODULES[name]], repeat)
+        except subprocess.CalledProcessError as e:
+            results["plugins"][name] = {"error": e.stderr.strip().splitlines()[-1]}
+
+    configured = config.plugins()
+    results["pipeline"] = {
+        "mode": config.mode,
+        "plugins": configured,
+        **measure([PLUGIN_MODULES[name] for name in configured], repeat),
+    }
+    results["all_plugins"] = measure(
+        [PLUGIN_MODULES[name] for name in sorted(PLUGIN_MODULES)], repeat
+    )
+    return results
+
+
+def print_table(results: Dict) -> None:
+    print(f"{'plugin':<20}{'import ms':>12}{'RSS MiB':>12}")
+    for name, result in results["plugins"].items():
+        if "error" in result:
+            print(f"{name:<20}{'failed: ' + result['error']:>24}")
+        else:
+            print(f"{name:<20}{result['ms']:>12.0f}{result['rss_kb'] / 1024:>12.1f}")
+    pipeline = results["pipeline"]
+    everything = results["all_plugins"]
+    print()
+    print(
+        f"{pipeline['mode']} pipeline ({', '.join(pipeline['plugins'])}): "
+        f"{pipeline['ms']:.0f}ms, {pipeline['rss_kb'] / 1024:.1f} MiB"
+    )
+    print(
+        f"all plugins: {everything['ms']:.0f}ms, {everything['rss_kb'] / 1024:.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-plugin import time and RSS at worker startup"
+    )
+    parser.add_argument(
+        "--plugins",
+        nargs="*",
+        choices=sorted(PLUGIN_MODULES),
+        help="Plugins to measure, all by default",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Fresh interpreters per measurement, the median is reported",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(PipelineConfig.from_env(avatar="bey"), args.repeat, args.plugins)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
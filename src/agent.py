@@ -1,29 +1,42 @@
-from db_utils import get_user_data, WeaviateRAG
-
+from db_utils import get_search_limiter, AsyncWeaviateRAG, WeaviateRAG
+from caller_directory import lookup_caller
+from mcp_pool import get_mcp_server
+from phrase_cache import say_phrase
+from prompts import InstructionTemplate
+from pipeline import PipelineConfig, load_plugins, noise_cancellation_filter, session_components, start_avatar
+from warmup import prewarm_components, resolve_components
+from rag_cache import get_retrieval_cache
+from prefetch import RAG_PREFETCH, KnowledgePrefetcher
+from startup import StartupOrchestrator
+from tool_deadlines import with_deadline
+from turn_metrics import cached_prompt_ratio, get_turn_metrics, set_labels, start_metrics_server
+from memory_profile import JobMemoryProfiler
+from worker_load import LoopLagReporter, worker_options
+
+import asyncio
 import logging
 import json
 import os
-from openai.types.beta.realtime.session import TurnDetection
+import time
 
 from dotenv import load_dotenv
 from livekit.agents import (
     Agent,
     AgentSession,
+    ChatContext,
+    ChatMessage,
     JobContext,
     JobProcess,
     MetricsCollectedEvent,
     RoomInputOptions,
-    WorkerOptions,
     cli,
     metrics,
 )
-from livekit.plugins import noise_cancellation, silero, openai, assemblyai, cartesia, bey
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents.llm import function_tool
-from livekit.agents import mcp, RunContext, get_job_context
+from livekit.agents import RunContext, UserInputTranscribedEvent, get_job_context
 from livekit import api, rtc
 
-from datetime import datetime
+from typing import Optional
 
 logger = logging.getLogger("agent")
 # Set logger to debug
@@ -31,6 +44,11 @@ logger = logging.getLogger("agent")
 load_dotenv(".env.local")
 
 MCP_SERVER_URL = os.getenv("MCP_SERVER_URL")
+
+# Realtime model with a Beyond Presence avatar by default, see pipeline.py for the options
+PIPELINE = PipelineConfig.from_env(avatar="bey")
+# Plugins register on the main thread at import time, so only the configured ones are imported here
+load_plugins(PIPELINE.plugins())
 # if not MCP_SERVER_URL:
 #     raise ValueError("MCP_SERVER_URL is not set")
 
@@ -39,8 +57,13 @@ MODEL = "gpt-realtime-mini"
 VOICE = "marin"
 TIMESLOT = "30 mins"
 TIMEZONE = "Europe/Amsterdam or Central European Time"
+# Fixed phrases, played from the phrase audio cache instead of being generated
+GREETING = f"Hello, and welcome to {COMPANY_NAME}! How can I help you today?"
+GOODBYE = "Thank you for calling! Goodbye!"
+PHRASES = [GREETING, GOODBYE]
 
-DEFAULT_INSTRUCTIONS = f"""Always respond in English. 
+# The time and caller are appended per session, keeping this prefix cacheable by the provider
+DEFAULT_INSTRUCTIONS = InstructionTemplate(f"""Always respond in English. 
 You are a helpful voice AI assistant with access to tools to manage calendars of dental practice {COMPANY_NAME}. Use the tools to respond to the user's request.
 The user is interacting with you via voice, even if you perceive the conversation as text. 
 Always respond in English.
@@ -53,7 +76,6 @@ You can search the calendar and book appointments. Say a few seconds to the user
 Always search in the timezone - {TIMEZONE}
 Pass in corresponding arguments to execute the tool. 
 You are a receptionist with {COMPANY_NAME}. 
-Current date time: {datetime.now().strftime('%A, %B %d, %Y %H:%M:%S')}
 First search if the appointment asked by the user is available, do not book conflicting appointments.
 Confirm explicitly the date, time with the user before booking an appointment.
 After booking the appointment, confirm with the user and end the call.
@@ -65,7 +87,7 @@ subject: Appointment confirmation - {COMPANY_NAME}
 As an intelligent AI Agent, I have booked your appointment at ..
 Looking forward to meeting you.
 
-"""
+""")
 
 async def hangup_call():
     ctx = get_job_context()
@@ -80,17 +102,32 @@ async def hangup_call():
     )
 
 class Assistant(Agent):
-    def __init__(self, tenant_id: str = "default") -> None:
+    def __init__(self, tenant_id: str = "default", prefetch: str = RAG_PREFETCH, caller_name: str = "Guest") -> None:
+        """
+        Args:
+            tenant_id: Tenant whose knowledge base is searched
+            prefetch: Speculative knowledge base lookup while the user speaks -
+                "off", "tool" (hand results to search_knowledge_base) or "inject"
+                (add them to the turn context like RAGVoiceAgent)
+            caller_name: Caller's name for the per-session instructions
+        """
         super().__init__(
-            instructions=DEFAULT_INSTRUCTIONS,
+            instructions=DEFAULT_INSTRUCTIONS.render(caller_name),
         )
         self.tenant_id = tenant_id
+        # Caller record, loaded while the call starts up
+        self.caller: Optional[dict] = None
         self.rag = None
+        self.prefetch = prefetch
+        self.prefetcher = None
         
         # Initialize RAG if Weaviate is configured
         try:
             if all([os.getenv("WEAVIATE_URL"), os.getenv("WEAVIATE_API_KEY"), os.getenv("OPENAI_API_KEY")]):
-                self.rag = WeaviateRAG(tenant_id=tenant_id)
+                # The async client keeps searches off the default thread pool; set
+                # RAG_CLIENT=sync to fall back to the threaded client
+                rag_cls = WeaviateRAG if os.getenv("RAG_CLIENT", "async") == "sync" else AsyncWeaviateRAG
+                self.rag = rag_cls(tenant_id=tenant_id)
                 logger.info(f"RAG initialized for tenant: {tenant_id}")
             else:
                 logger.warning("Weaviate not configured. Knowledge base search will not be available.")
@@ -98,12 +135,53 @@ class Assistant(Agent):
             logger.error(f"Failed to initialize RAG: {e}")
             self.rag = None
 
+        if self.rag and prefetch in ("tool", "inject"):
+            self.prefetcher = KnowledgePrefetcher(self.rag)
+
+    async def on_enter(self) -> None:
+        if self.prefetcher:
+            self.session.on("user_input_transcribed", self._on_user_input_transcribed)
+
+    def _on_user_input_transcribed(self, ev: UserInputTranscribedEvent) -> None:
+        # Start retrieval from partial transcripts so it overlaps with the user's speech
+        self.prefetcher.on_transcript(ev.transcript, ev.is_final)
+
+    async def on_user_turn_completed(self, turn_ctx: ChatContext, new_message: ChatMessage) -> None:
+        if not self.prefetcher or self.prefetch != "inject":
+            return
+
+        user_query = new_message.text_content or ""
+        started = time.perf_counter()
+        rag_content = await self.prefetcher.result_for(user_query)
+        get_turn_metrics().observe("rag", time.perf_counter() - started)
+        if rag_content:
+            # Inject context into chat for next LLM generation
+            turn_ctx.add_message(
+                role="assistant",
+                content=f"""Relevant context from knowledge base:{rag_content}
+                Use this context to answer the user's question: "{user_query}" """
+            )
+            logger.info("Prefetched RAG context added to conversation")
+
+    async def on_exit(self) -> None:
+        if self.prefetcher:
+            self.session.off("user_input_transcribed", self._on_user_input_transcribed)
+            self.prefetcher.close()
+            logger.info(f"RAG prefetch: {self.prefetcher.stats}")
+
+        # Hand the pooled Weaviate client back so idle connections can be evicted
+        if isinstance(self.rag, AsyncWeaviateRAG):
+            await self.rag.aclose()
+        elif self.rag:
+            self.rag.close()
+
     # To add tools, use the @function_tool decorator.
     # Here's an example that adds a simple weather tool.
     # You also have to add `from livekit.agents.llm import function_tool, RunContext` to the top of this file
     # to hang up the call as part of a function call
     @function_tool()
-    async def end_call(context: RunContext):
+    @with_deadline(timeout=0)  # speaks and hangs up, never cut off
+    async def end_call(self, context: RunContext):
       """Use this tool when the task has been completed and the call should end."""
       logging.info("Tool called: end_call")
       
@@ -113,7 +191,7 @@ class Assistant(Agent):
           logging.info("Agent finished speaking")
           
           # 2. Optional: Say goodbye before ending
-          await context.session.say("Thank you for calling! Goodbye!", allow_interruptions=False)
+          await say_phrase(context.session, GOODBYE, self.tenant_id, VOICE, allow_interruptions=False)
           
           # 3. Get JobContext to access room information
           job_ctx = get_job_context()  # This is the correct way to access room
@@ -136,7 +214,15 @@ class Assistant(Agent):
               logging.error(f"Fallback session close failed: {close_error}")
               
     @function_tool()
+    @with_deadline(
+        timeout=4,
+        fallback=(
+            "The knowledge base did not answer within {timeout:g} seconds. Tell the caller you can't "
+            "look that up right now, and help with what you know or offer to have someone call back."
+        ),
+    )
     async def search_knowledge_base(
+        self,
         context: RunContext,
         query: str
     ) -> str:
@@ -153,29 +239,27 @@ class Assistant(Agent):
         logger.info(f"Searching knowledge base for: {query}")
         
         try:
-            # Get the assistant instance from context
-            # Note: In function_tool, we need to access self through the agent
-            job_ctx = get_job_context()
-            # Access the agent's RAG instance
-            # This is a workaround since function_tool doesn't pass self
-            # We'll store rag in a way that's accessible
-            
-            # For now, we'll create a new RAG instance with tenant_id from userdata
-            # This is not ideal but works with the function_tool pattern
-            session = context.session
-            tenant_id = session._userdata if hasattr(session, '_userdata') else 'default'
-            
-            # Initialize RAG for this search
-            rag = WeaviateRAG(tenant_id=str(tenant_id))
-            
-            # Perform search
-            results = await rag.retrieve_context(query, limit=3)
-            
-            # Clean up
-            rag.close()
+            if self.rag is None:
+                logger.warning("Knowledge base search requested but RAG is not configured")
+                return "I'm having trouble accessing the knowledge base right now. Let me help you with what I know."
+
+            results = None
+            started = time.perf_counter()
+            if self.prefetcher:
+                # Retrieval may already have started while the user was speaking
+                results = await self.prefetcher.take(query)
+
+            if results is None:
+                # The RAG client is borrowed from the worker's connection pool, so this
+                # reuses a warm Weaviate connection instead of opening a new one per call
+                results = await self.rag.retrieve_context(query, limit=3)
+            get_turn_metrics().observe("rag", time.perf_counter() - started)
             
             if results:
-                logger.info(f"Found knowledge base results for query: {query}")
+                logger.info(
+                    f"Found knowledge base results for query: {query} "
+                    f"({self.rag.last_context_tokens} context tokens)"
+                )
                 return f"Found relevant information:\n\n{results}"
             else:
                 logger.info(f"No knowledge base results for query: {query}")
@@ -186,46 +270,27 @@ class Assistant(Agent):
             return "I'm having trouble accessing the knowledge base right now. Let me help you with what I know."
     
     @function_tool()
+    @with_deadline()
     async def lookup_user(
+        self,
         context: RunContext,
     ) -> dict:
         """Look up a user's email and info to send an email."""
-        # FIX
-        try:
-          ph = context.room.split("-")
-        except Exception as e:
-          logging.error(f"Error looking up user: {e}")
-          return {"name": "John Doe", "email": "john.doe@example.com"}
-
-        if ph > 1:
-          user_data = get_user_data()
-          user = user_data[user_data['phone_number'] == ph[1]]
-          return user.to_dict()
-        else:
-          return {"name": "John Doe", "email": "john.doe@example.com"}
+        return self.caller or lookup_caller()
 
     @function_tool()
+    @with_deadline()
     async def update_email(
+        self,
         context: RunContext,
     ) -> dict:
         """Update the user's email by confirming the security pin."""
         # FIX
-        
-        try:
-            ph = context.room.split("-")
-        except Exception as e:
-          logging.error(f"Error looking up user: {e}")
-          return {"name": "John Doe", "email": "john.doe@example.com"}
-
-        if ph > 1:
-          user_data = get_user_data()
-          user = user_data[user_data['phone_number'] == ph[1]]
-          return user.to_dict()
-        else:
-          return {"name": "John Doe", "email": "john.doe@example.com"}
+        return lookup_caller()
 
 
     @function_tool()
+    @with_deadline(timeout=0)
     async def transfer_call(self, ctx: RunContext):
         """Transfer the call to a human agent, called after confirming with the user"""
 
@@ -253,13 +318,21 @@ class Assistant(Agent):
             return "could not transfer call"
 
 
+# Components the configured pipeline needs, plus the caller directory, knowledge base and MCP tools
+PREWARM_COMPONENTS = PIPELINE.prewarm_components(["callers", "rag", "mcp"])
+
+
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    prewarm_components(proc, resolve_components(PREWARM_COMPONENTS))
 
 
 async def entrypoint(ctx: JobContext):
-     # Join the room and connect to the user
-    await ctx.connect()
+    # Independent startup steps run concurrently below; time to first audio is measured from here
+    turn_metrics = get_turn_metrics()
+    startup = StartupOrchestrator(on_first_audio=lambda ms: turn_metrics.observe("startup_first_audio", ms / 1000))
+    # Opt-in memory snapshots of this job, see AGENT_MEMORY_PROFILE and AGENT_JOB_MEMORY_BUDGET_MB
+    memory = JobMemoryProfiler()
+    memory.start()
 
     # logger.debug(f"Job Context {vars(ctx)}")
 
@@ -272,76 +345,29 @@ async def entrypoint(ctx: JobContext):
     # user_name = "Jack"
     # Logging setup
     # Add any other context you want in all log entries here
+    # The job's room name is known before connecting, so nothing below waits for the connection
     ctx.log_context_fields = {
-        "room": ctx.room.name,
+        "room": ctx.job.room.name,
     }
 
-    users = get_user_data()
-    user = ctx.room.name.split("-")
+    user = ctx.job.room.name.split("-")
     
     # Extract tenant_id from metadata or room name for RAG
     tenant_id = metadata.get("tenant_id") or (user[1] if len(user) > 1 else 'default')
     logger.info(f"Extracted tenant_id: {tenant_id}")
+    set_labels(tenant_id, "assistant")
+
+    assistant = Assistant(tenant_id=tenant_id, caller_name=user_name)
+    mcp_server = get_mcp_server(MCP_SERVER_URL) if MCP_SERVER_URL else None
 
-    # Set up a voice AI pipeline using OpenAI, Cartesia, AssemblyAI, and the LiveKit turn detector
-    # session = AgentSession(
-    #     # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
-    #     # See all available models at https://docs.livekit.io/agents/models/stt/
-    #     stt=assemblyai.STT(
-    #             # model="assemblyai/universal-streaming:en",
-    #             end_of_turn_confidence_threshold=0.7,
-    #             min_end_of_turn_silence_when_confident=160,
-    #             max_turn_silence=2400,
-    #             ),
-    #     # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
-    #     # See all available models at https://docs.livekit.io/agents/models/llm/
-    #     llm="openai/gpt-4o-mini",
-    #     # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
-    #     # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
-    #     # tts="cartesia/sonic-2:9626c31c-bec5-4cca-baa8-f8ba9e84c8bc",
-    #     tts=cartesia.TTS(
-    #         model="cartesia/sonic-turbo",
-    #         language="en",
-    #     ),
-    #     # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
-    #     # See more at https://docs.livekit.io/agents/build/turns
-    #     turn_detection=MultilingualModel(),
-    #     vad=ctx.proc.userdata["vad"],
-    #     # allow the LLM to generate a response while waiting for the end of turn
-    #     # See more at https://docs.livekit.io/agents/build/audio/#preemptive-generation
-    #     preemptive_generation=True,
-    #     mcp_servers=[
-    #       mcp.MCPServerStdio(command="uvx", args="osm-mcp-server"),
-    #       mcp.MCPServerHTTP(url=MCP_SERVER_URL)
-    #     ]
-    # )
-
-    # To use a realtime model instead of a voice pipeline, use the following session setup instead.
-    # (Note: This is for the OpenAI Realtime API. For other providers, see https://docs.livekit.io/agents/models/realtime/))
-    # 1. Install livekit-agents[openai]
-    # 2. Set OPENAI_API_KEY in .env.local
-    # 3. Add `from livekit.plugins import openai` to the top of this file
-    # 4. Use the following session setup instead of the version above
+    # AGENT_PIPELINE selects the OpenAI Realtime model (default) or an AssemblyAI, OpenAI and Cartesia
+    # voice pipeline with the LiveKit turn detector, see https://docs.livekit.io/agents/models/realtime/
     session = AgentSession(
-        llm=openai.realtime.RealtimeModel(
-            model=MODEL,
-            voice=VOICE,
-            temperature=0.6,
-            turn_detection=TurnDetection(
-                    type="server_vad",  # Faster than semantic_vad
-                    threshold=0.6,        # Slightly higher for telephony
-                    prefix_padding_ms=200,  # Reduced from default 300ms
-                    silence_duration_ms=400,  # Reduced from default 500ms
-                    create_response=True,
-                    interrupt_response=True,
-                )
-        ),
+        **session_components(PIPELINE, ctx.proc, MODEL, VOICE),
+        # allow the LLM to generate a response while waiting for the end of turn
         preemptive_generation=True,
-        mcp_servers=[
-          mcp.MCPServerHTTP(
-              url=MCP_SERVER_URL
-          )
-        ],
+        # Shared per process: tool schemas come from the worker's cache, connections from a keep-alive pool
+        mcp_servers=[mcp_server] if mcp_server else [],
         userdata=user[1] if len(user) > 1 else 'guest'
     )
 
@@ -353,42 +379,65 @@ async def entrypoint(ctx: JobContext):
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        turn_metrics.record(ev.metrics)
+
+    startup.watch_first_audio(session)
+    turn_metrics.watch_session(session)
 
     async def log_usage():
         summary = usage_collector.get_summary()
         logger.info(f"Usage: {summary}")
+        logger.info(f"Prompt cache: {cached_prompt_ratio(summary):.0%} of {summary.llm_prompt_tokens} input tokens cached")
+        logger.info(f"Startup: {startup.timings()}")
+        turn_metrics.flush()
+        logger.info(f"RAG cache: {get_retrieval_cache().stats()}")
+        logger.info(f"RAG search queue: {get_search_limiter().stats()}")
 
     ctx.add_shutdown_callback(log_usage)
 
+    # The worker's load function reads this process' event-loop lag
+    loop_lag = LoopLagReporter()
+    loop_lag.start()
+    ctx.add_shutdown_callback(loop_lag.aclose)
+    memory.watch_session(session)
+    ctx.add_shutdown_callback(memory.shutdown)
+
+    async def load_caller():
+        assistant.caller = await asyncio.to_thread(lookup_caller)
+
     # Add a virtual avatar to the session
-    # For other providers, see https://docs.livekit.io/agents/models/avatar/
     # AVATAR_ID = "5c28ac9b-a90d-43d0-a820-9adfe0ba0c8d"
     DEFAULT_AVATAR_ID = "694c83e2-8895-4a98-bd16-56332ca3f449"
-    avatar = bey.AvatarSession(avatar_id=DEFAULT_AVATAR_ID,)
 
-    # Start the avatar and wait for it to join
-    # Replace https with wss in livekit url
-    livekit_url = os.getenv("LIVEKIT_URL")
-    livekit_url = livekit_url.replace("https", "wss")
-    await avatar.start(session, room=ctx.room, livekit_url=livekit_url, livekit_api_key=os.getenv("LIVEKIT_API_KEY"), livekit_api_secret=os.getenv("LIVEKIT_API_SECRET"))
-
-    # Start the session, which initializes the voice pipeline and warms up the models
-    await session.start(
-        agent=Assistant(tenant_id=tenant_id),
+    # Join the room and connect to the user
+    startup.add("connect", ctx.connect)
+    # The avatar's token is granted for the room name, which is only known once connected
+    startup.add("avatar", lambda: start_avatar(PIPELINE, session, ctx.room, DEFAULT_AVATAR_ID), after=["connect"])
+    startup.add("caller", load_caller, required=False)
+    if assistant.rag:
+        startup.add("rag", assistant.rag.warm_up, required=False)
+    if mcp_server:
+        startup.add("mcp", mcp_server.connect, required=False)
+    # Start the session, which initializes the voice pipeline and connects the realtime model.
+    # The avatar replaces the session's audio output, so it has to be in place first
+    startup.add("session", lambda: session.start(
+        agent=assistant,
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVCTelephony(),
+            noise_cancellation=noise_cancellation_filter(PIPELINE, ctx.proc),
         ),
-    )
-
-    await session.generate_reply(
+    ), after=["avatar"])
+    # The greeting plays from the phrase cache; until it is cached the model greets and it is cached for later calls
+    startup.add("greeting", lambda: say_phrase(session, GREETING, tenant_id, VOICE, fallback=lambda: session.generate_reply(
         instructions=f"""Greet the user and offer your assistance. You should start by speaking in English.
         Always respond in English. Welcome to {COMPANY_NAME}."""
-    )
+    )), after=["connect", "session"])
+    await startup.run()
 
     # TODO: Conditional end the call - maintain a state and monitor task completion and end the call
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    start_metrics_server()
+    # Load combines CPU, cost-weighted calls, memory headroom and loop lag, see worker_load.py
+    cli.run_app(worker_options(PIPELINE, entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -0,0 +1,606 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+from dotenv import load_dotenv
+from livekit import api
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from invoice_ledger import INVOICE_LEDGER_PATH, get_invoice_ledger
+
+logger = logging.getLogger("invoice_campaign")
+load_dotenv(".env.local")
+
+# Agent name the invoice reminder worker registers with, shared with invoice_reminder.py
+INVOICE_AGENT_NAME = os.getenv("INVOICE_AGENT_NAME", "")
+# Comma-separated outbound SIP trunk ids, calls are spread across them
+CAMPAIGN_SIP_TRUNK_IDS = [
+    t.strip() for t in os.getenv("CAMPAIGN_SIP_TRUNK_IDS", "").split(",") if t.strip()
+]
+# Calls in progress at once across all trunks, sized to the worker fleet
+CAMPAIGN_MAX_CONCURRENT_CALLS = int(os.getenv("CAMPAIGN_MAX_CONCURRENT_CALLS", "50"))
+# New calls started per minute on each trunk
+CAMPAIGN_TRUNK_CALLS_PER_MINUTE = float(
+    os.getenv("CAMPAIGN_TRUNK_CALLS_PER_MINUTE", "60")
+)
+CAMPAIGN_MAX_ATTEMPTS = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3"))
+# Delay before the first retry of an unanswered call, doubled on every further attempt
+CAMPAIGN_RETRY_BACKOFF = float(os.getenv("CAMPAIGN_RETRY_BACKOFF", "900"))
+# Weight of the amount against days overdue when ranking callers
+CAMPAIGN_AMOUNT_WEIGHT = float(os.getenv("CAMPAIGN_AMOUNT_WEIGHT", "0.6"))
+
+# SIP responses meaning the callee did not pick up: timeout, unavailable, busy, declined
+NO_ANSWER_SIP_CODES = {"408", "480", "486", "600", "603"}
+# SIP responses meaning the number will never work
+INVALID_NUMBER_SIP_CODES = {"404", "484", "604"}
+
+ANSWERED, NO_ANSWER, FAILED = "answered", "no_answer", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_calls (
+    campaign_id TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    score REAL NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    days_overdue INTEGER NOT NULL,
+    invoice_count INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign_id, phone)
+);
+CREATE INDEX IF NOT EXISTS idx_campaign_calls_queue ON campaign_calls(campaign_id, status, next_attempt_at);
+"""
+
+# Statuses still waiting for a call
+_QUEUED = ("pending", "retry")
+
+
+def score_overdue(
+    amounts: np.ndarray,
+    days_overdue: np.ndarray,
+    amount_weight: float = CAMPAIGN_AMOUNT_WEIGHT,
+    max_days: int = 90,
+) -> np.ndarray:
+    """
+    Rank callers by what they owe and for how long, in one vectorized pass.
+
+    The amount is log-scaled so a few large invoices do not crowd out
+    everyone else, and days overdue saturate at `max_days`. Both terms are
+    normalized to [0, 1].
+    """
+    amounts = np.log1p(np.maximum(np.asarray(amounts, dtype=np.float64), 0))
+    amount_score = (
+        amounts / amounts.max()
+        if amounts.size and amounts.max() > 0
+        else np.zeros_like(amounts)
+    )
+    days_score = (
+        np.clip(np.asarray(days_overdue, dtype=np.float64), 0, max_days) / max_days
+    )
+    return amount_weight * amount_score + (1 - amount_weight) * days_score
+
+
+class CampaignCall:
+    def __init__(
+        self,
+        phone: str,
+        amount_cents: int,
+        days_overdue: int,
+        invoice_count: int,
+        attempts: int,
+    ):
+        self.phone = phone
+        self.amount_cents = amount_cents
+        self.days_overdue = days_overdue
+        self.invoice_count = invoice_count
+        self.attempts = attempts
+
+
+class CampaignProgress:
+    """
+    Resumable campaign state, stored next to the invoices in the ledger database.
+
+    Every caller is one row whose status moves from pending to dialing and
+    in_call, and ends as completed, failed or exhausted; unanswered calls go to
+    retry with a next attempt time. A restarted runner picks up where the
+    previous one stopped.
+    """
+
+    def __init__(self, path: str = INVOICE_LEDGER_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def exists(self, campaign_id: str) -> bool:
+        with self._lock:
+            return (
+                self._conn.execute(
+                    "SELECT 1 FROM campaign_calls WHERE campaign_id = ? LIMIT 1",
+                    (campaign_id,),
+                ).fetchone()
+                is not None
+            )
+
+    def plan(self, campaign_id: str, rows: Sequence[tuple], as_of: date) -> int:
+        """
+        Rank overdue callers and queue them for the campaign.
+
+        Args:
+            campaign_id: Campaign identifier
+            rows: (phone, amount in cents, oldest due date, invoice count) tuples
+            as_of: Date days overdue are counted from
+
+        Returns:
+            Number of queued callers
+        """
+        if not rows:
+            return 0
+        phones, cents, oldest, counts = zip(*rows)
+        cents = np.asarray(cents, dtype=np.int64)
+        days = (
+            np.datetime64(as_of.isoformat(), "D")
+            - np.asarray(oldest, dtype="datetime64[D]")
+        ).astype(np.int64)
+        scores = score_overdue(cents / 100, days)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO campaign_calls (campaign_id, phone, score, amount_cents, days_overdue, "
+                "invoice_count, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)",
+                [
+                    (
+                        campaign_id,
+                        phone,
+                        float(score),
+                        int(amount),
+                        int(day),
+                        int(count),
+                        now,
+                    )
+                    for phone, score, amount, day, count in zip(
+                        phones, scores, cents, days, counts
+                    )
+                ],
+            )
+            self._conn.commit()
+        return len(phones)
+
+    def recover(self, campaign_id: str):
+        """Requeue calls left mid-dial by a runner that stopped"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE campaign_calls SET status = 'retry' WHERE campaign_id = ? AND status = 'dialing'",
+                (campaign_id,),
+            )
+            # The call was answered before the runner stopped, do not call again
+            self._conn.execute(
+                "UPDATE campaign_calls SET status = 'completed' WHERE campaign_id = ? AND status = 'in_call'",
+                (campaign_id,),
+            )
+            self._conn.commit()
+
+    def claim(self, campaign_id: str, now: float, limit: int) -> List[CampaignCall]:
+        """Mark up to `limit` due calls as dialing, highest score first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phone, amount_cents, days_overdue, invoice_count, attempts FROM campaign_calls "
+                "WHERE campaign_id = ? AND status IN (?, ?) AND next_attempt_at <= ? ORDER BY score DESC LIMIT ?",
+                (campaign_id, *_QUEUED, now, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE campaign_calls SET status = 'dialing', updated_at = ? WHERE campaign_id = ? AND phone = ?",
+                [(now, campaign_id, row[0]) for row in rows],
+            )
+            self._conn.commit()
+        return [CampaignCall(*row) for row in rows]
+
+    def next_attempt_at(self, campaign_id: str) -> Optional[float]:
+        """Earliest time a queued call becomes due, or None when the campaign is finished"""
+        with self._lock:
+            (value,) = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM campaign_calls WHERE campaign_id = ? AND status IN (?, ?)",
+                (campaign_id, *_QUEUED),
+            ).fetchone()
+        return value
+
+    def update(
+        self,
+        campaign_id: str,
+        phone: str,
+        status: str,
+        attempts: Optional[int] = None,
+        next_attempt_at: float = 0,
+        error: Optional[str] = None,
+    ):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE campaign_calls SET status = ?, attempts = COALESCE(?, attempts), next_attempt_at = ?, "
+                "last_error = COALESCE(?, last_error), updated_at = ? WHERE campaign_id = ? AND phone = ?",
+                (
+                    status,
+                    attempts,
+                    next_attempt_at,
+                    error,
+                    time.time(),
+                    campaign_id,
+                    phone,
+                ),
+            )
+            self._conn.commit()
+
+    def summary(self, campaign_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM campaign_calls WHERE campaign_id = ? GROUP BY status",
+                (campaign_id,),
+            ).fetchall()
+        return dict(rows)
+
+
+class TokenBucket:
+    """Allows `rate_per_minute` acquisitions per minute with bursts of up to `burst`"""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class LiveKitDialer:
+    """Places campaign calls by dispatching the invoice reminder agent and dialing out over SIP"""
+
+    def __init__(
+        self,
+        agent_name: str = INVOICE_AGENT_NAME,
+        lkapi: Optional[api.LiveKitAPI] = None,
+        poll_interval: float = 5.0,
+    ):
+        self.agent_name = agent_name
+        self._api = lkapi
+        self.poll_interval = poll_interval
+
+    @property
+    def api(self) -> api.LiveKitAPI:
+        if self._api is None:
+            self._api = api.LiveKitAPI()
+        return self._api
+
+    @staticmethod
+    def room_name(call: CampaignCall) -> str:
+        # InvoiceReminderAgent reads the caller's phone number from `Call-<phone>`
+        return f"Call-{call.phone}"
+
+    async def dial(self, campaign_id: str, call: CampaignCall, trunk_id: str) -> str:
+        """
+        Start the agent in a new room and call the customer into it.
+
+        Returns:
+            ANSWERED, NO_ANSWER or FAILED (number can never be reached)
+        """
+        room = self.room_name(call)
+        metadata = {
+            "campaign_id": campaign_id,
+            "phone": call.phone,
+            "total_overdue": call.amount_cents / 100,
+            "invoice_count": call.invoice_count,
+        }
+        await self.api.agent_dispatch.create_dispatch(
+            api.CreateAgentDispatchRequest(
+                agent_name=self.agent_name, room=room, metadata=json.dumps(metadata)
+            )
+        )
+        try:
+            await self.api.sip.create_sip_participant(
+                api.CreateSIPParticipantRequest(
+                    room_name=room,
+                    sip_trunk_id=trunk_id,
+                    sip_call_to=call.phone,
+                    participant_identity=call.phone,
+                    wait_until_answered=True,
+                )
+            )
+        except api.TwirpError as e:
+            await self._delete_room(room)
+            status = (e.metadata or {}).get("sip_status_code")
+            if status in NO_ANSWER_SIP_CODES:
+                return NO_ANSWER
+            if status in INVALID_NUMBER_SIP_CODES:
+                return FAILED
+            raise
+        return ANSWERED
+
+    async def wait_for_end(self, call: CampaignCall):
+        """Wait until the call's room is gone, i.e. the agent ended the call or the customer hung up"""
+        room = self.room_name(call)
+        while True:
+            response = await self.api.room.list_rooms(
+                api.ListRoomsRequest(names=[room])
+            )
+            if not response.rooms:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _delete_room(self, room: str):
+        try:
+            await self.api.room.delete_room(api.DeleteRoomRequest(room=room))
+        except Exception as e:
+            logger.debug(f"Could not delete room {room}: {e}")
+
+    async def aclose(self):
+        if self._api is not None:
+            await self._api.aclose()
+
+
+class CampaignRunner:
+    """
+    Works through a campaign's queue with bounded concurrency.
+
+    At most `max_concurrent` calls are in progress at once, each trunk starts
+    at most `calls_per_minute` calls per minute, and unanswered calls are
+    retried with exponential backoff up to `max_attempts` times. All state is
+    kept in `CampaignProgress`, so a stopped run can simply be started again.
+    """
+
+    def __init__(
+        self,
+        progress: CampaignProgress,
+        dialer,
+        trunk_ids: Sequence[str] = CAMPAIGN_SIP_TRUNK_IDS,
+        max_concurrent: int = CAMPAIGN_MAX_CONCURRENT_CALLS,
+        calls_per_minute: float = CAMPAIGN_TRUNK_CALLS_PER_MINUTE,
+        max_attempts: int = CAMPAIGN_MAX_ATTEMPTS,
+        retry_backoff: float = CAMPAIGN_RETRY_BACKOFF,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            progress: Campaign state store
+            dialer: Places calls, see `LiveKitDialer`
+            trunk_ids: Outbound SIP trunks to spread calls across
+            max_concurrent: Calls in progress at once
+            calls_per_minute: New calls per minute per trunk
+            max_attempts: Calls per customer before giving up
+            retry_backoff: Seconds before the first retry, doubled on each further attempt
+            poll_interval: Seconds between checks for newly due retries while calls are active
+        """
+        if not trunk_ids:
+            raise ValueError(
+                "At least one SIP trunk id is required (CAMPAIGN_SIP_TRUNK_IDS)"
+            )
+        self.progress = progress
+        self.dialer = dialer
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self._trunks = {
+            trunk_id: TokenBucket(calls_per_minute) for trunk_id in trunk_ids
+        }
+        self._trunk_lock = asyncio.Lock()
+        self.stats = {
+            "dialed": 0,
+            "answered": 0,
+            "no_answer": 0,
+            "failed": 0,
+            "errors": 0,
+        }
+
+    async def _acquire_trunk(self) -> str:
+        """Wait for the trunk that can start a call soonest"""
+        async with self._trunk_lock:
+            trunk_id, bucket = min(
+                self._trunks.items(), key=lambda item: item[1].delay()
+            )
+            delay = bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            bucket.take()
+            return trunk_id
+
+    def _retry_at(self, attempts: int) -> float:
+        return time.time() + self.retry_backoff * 2 ** (attempts - 1)
+
+    async def _call(self, campaign_id: str, call: CampaignCall):
+        attempts = call.attempts + 1
+        trunk_id = await self._acquire_trunk()
+        self.stats["dialed"] += 1
+        try:
+            outcome = await self.dialer.dial(campaign_id, call, trunk_id)
+        except Exception as e:
+            logger.warning(
+                f"Campaign {campaign_id}: call to {call.phone} failed on trunk {trunk_id}: {e}"
+            )
+            self.stats["errors"] += 1
+            outcome, error = NO_ANSWER, str(e)
+        else:
+            error = None
+
+        if outcome == ANSWERED:
+            self.stats["answered"] += 1
+            await asyncio.to_thread(
+                self.progress.update, campaign_id, call.phone, "in_call", attempts
+            )
+            try:
+                await self.dialer.wait_for_end(call)
+            finally:
+                await asyncio.to_thread(
+                    self.progress.update, campaign_id, call.phone, "completed"
+                )
+        elif outcome == FAILED:
+            self.stats["failed"] += 1
+            await asyncio.to_thread(
+                self.progress.update,
+                campaign_id,
+                call.phone,
+                "failed",
+                attempts,
+                0,
+                error or "invalid number",
+            )
+        else:
+            self.stats["no_answer"] += 1
+            if attempts >= self.max_attempts:
+                await asyncio.to_thread(
+                    self.progress.update,
+                    campaign_id,
+                    call.phone,
+                    "exhausted",
+                    attempts,
+                    0,
+                    error,
+                )
+            else:
+                await asyncio.to_thread(
+                    self.progress.update,
+                    campaign_id,
+                    call.phone,
+                    "retry",
+                    attempts,
+                    self._retry_at(attempts),
+                    error,
+                )
+
+    async def run(self, campaign_id: str) -> Dict[str, int]:
+        """
+        Call everyone queued for the campaign, returning when no calls remain.
+
+        Returns:
+            Number of callers per final status
+        """
+        await asyncio.to_thread(self.progress.recover, campaign_id)
+        active: Set[asyncio.Task] = set()
+        try:
+            while True:
+                free = self.max_concurrent - len(active)
+                if free > 0:
+                    for call in await asyncio.to_thread(
+                        self.progress.claim, campaign_id, time.time(), free
+                    ):
+                        active.add(asyncio.create_task(self._call(campaign_id, call)))
+
+                if not active:
+                    next_at = await asyncio.to_thread(
+                        self.progress.next_attempt_at, campaign_id
+                    )
+                    if next_at is None:
+                        break
+                    await asyncio.sleep(max(next_at - time.time(), 0))
+                    continue
+
+                done, _ = await asyncio.wait(
+                    active,
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                active -= done
+        finally:
+            for task in active:
+                task.cancel()
+            await asyncio.gather(*active, return_exceptions=True)
+
+        summary = await asyncio.to_thread(self.progress.summary, campaign_id)
+        logger.info(f"Campaign {campaign_id} finished: {summary}, {self.stats}")
+        return summary
+
+
+async def run_campaign(
+    campaign_id: str, as_of: Optional[date] = None, dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Plan (on first run) and run an invoice reminder campaign over the ledger's overdue invoices.
+
+    Args:
+        campaign_id: Campaign identifier, reuse it to resume a stopped campaign
+        as_of: Invoices due before this date are overdue, today if omitted
+        dry_run: Only plan the campaign, do not place calls
+    """
+    as_of = as_of or date.today()
+    progress = CampaignProgress()
+    try:
+        if not progress.exists(campaign_id):
+            rows = await asyncio.to_thread(
+                get_invoice_ledger().overdue_by_phone, as_of.isoformat()
+            )
+            queued = progress.plan(campaign_id, rows, as_of)
+            logger.info(
+                f"Campaign {campaign_id}: queued {queued} customers with overdue invoices"
+            )
+        else:
+            logger.info(f"Resuming campaign {campaign_id}")
+        if dry_run:
+            return progress.summary(campaign_id)
+        if not INVOICE_AGENT_NAME:
+            raise ValueError(
+                "INVOICE_AGENT_NAME must be set so the invoice reminder agent can be dispatched"
+            )
+
+        dialer = LiveKitDialer()
+        try:
+            return await CampaignRunner(progress, dialer).run(campaign_id)
+        finally:
+            await dialer.aclose()
+    finally:
+        progress.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Call customers with overdue invoices")
+    parser.add_argument(
+        "--campaign-id",
+        default=date.today().isoformat(),
+        help="Reuse to resume a campaign",
+    )
+    parser.add_argument(
+        "--as-of",
+        type=date.fromisoformat,
+        default=None,
+        help="Overdue cut-off date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Plan the campaign without calling"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    print(
+        json.dumps(
+            asyncio.run(run_campaign(args.campaign_id, args.as_of, args.dry_run))
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,7 @@
 import logging
 import json
 import os
-from openai.types.beta.realtime.session import TurnDetection
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import datetime
 
 from dotenv import load_dotenv
 from livekit.agents import (
@@ -13,20 +11,28 @@ from livekit.agents import (
     JobProcess,
     MetricsCollectedEvent,
     RoomInputOptions,
-    WorkerOptions,
     cli,
     metrics,
 )
-from livekit.plugins import noise_cancellation, silero, openai, assemblyai, cartesia
-from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents.llm import function_tool
-from livekit.agents import mcp, RunContext, get_job_context
+from livekit.agents import RunContext, get_job_context
 from livekit import api, rtc
 
 # Import db_utils for user data access
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from db_utils import get_user_data
+from caller_directory import get_caller_directory, lookup_caller
+from mcp_pool import get_mcp_server
+from invoice_ledger import INVOICE_STATUSES, get_invoice_ledger
+from phrase_cache import say_phrase
+from pipeline import PipelineConfig, load_plugins, noise_cancellation_filter, session_components
+from prompts import InstructionTemplate
+from startup import StartupOrchestrator
+from tool_deadlines import with_deadline
+from turn_metrics import cached_prompt_ratio, get_turn_metrics, set_labels, start_metrics_server
+from memory_profile import JobMemoryProfiler
+from worker_load import LoopLagReporter, worker_options
+from warmup import prewarm_components, resolve_components
 
 logger = logging.getLogger("invoice_reminder_agent")
 load_dotenv(".env.local")
@@ -36,8 +42,22 @@ COMPANY_NAME = "Jacks' Dental Practice"
 MODEL = "gpt-realtime-mini"
 VOICE = "marin"
 TIMEZONE = "Europe/Amsterdam or Central European Time"
+# Fixed phrases, played from the phrase audio cache instead of being generated
+GREETING = f"Hello, this is the {COMPANY_NAME} billing department. How can I help you with your invoices today?"
+GOODBYE = "Thank you for calling! Goodbye!"
+PHRASES = [GREETING, GOODBYE]
+# Phrase cache tenant, the billing line is shared by all callers
+PHRASE_TENANT = "billing"
 
-DEFAULT_INSTRUCTIONS = f"""Always respond in English. 
+# Realtime model without an avatar by default, see pipeline.py for the options
+PIPELINE = PipelineConfig.from_env()
+# Plugins register on the main thread at import time, so only the configured ones are imported here
+load_plugins(PIPELINE.plugins())
+# Set to register for explicit dispatch, e.g. by the outbound campaign in invoice_campaign.py
+INVOICE_AGENT_NAME = os.getenv("INVOICE_AGENT_NAME", "")
+
+# The time and caller are appended per session, keeping this prefix cacheable by the provider
+DEFAULT_INSTRUCTIONS = InstructionTemplate(f"""Always respond in English. 
 You are a helpful voice AI assistant for {COMPANY_NAME} with access to tools to manage invoice reminders and payment collections. 
 The user is interacting with you via voice, even if you perceive the conversation as text. 
 Always respond in English.
@@ -46,7 +66,6 @@ Say a few seconds to the user while checking invoice information and processing
 Always work in the timezone - {TIMEZONE}
 Pass in corresponding arguments to execute the tool. 
 You are a billing assistant with {COMPANY_NAME}. 
-Current date time: {datetime.now().strftime('%A, %B %d, %Y %H:%M:%S')}
 First check if there are any outstanding invoices for the user, then proceed with appropriate actions.
 Confirm payment details with the user before updating any payment status.
 After processing payment or sending reminders, confirm with the user and end the call.
@@ -57,16 +76,17 @@ subject: Payment confirmation - {COMPANY_NAME}
 As an intelligent AI Agent, I have processed your payment for invoice number ..
 Thank you for your payment.
 
-"""
+""")
 
 class InvoiceReminderAgent(Agent):
-    def __init__(self) -> None:
+    def __init__(self, caller_name: str = "Guest") -> None:
         super().__init__(
-            instructions=DEFAULT_INSTRUCTIONS,
+            instructions=DEFAULT_INSTRUCTIONS.render(caller_name),
         )
 
     @function_tool()
-    async def end_call(context: RunContext):
+    @with_deadline(timeout=0)  # speaks and hangs up, never cut off
+    async def end_call(self, context: RunContext):
         """Use this tool when the task has been completed and the call should end."""
         logging.info("Tool called: end_call")
         
@@ -76,7 +96,7 @@ class InvoiceReminderAgent(Agent):
             logging.info("Agent finished speaking")
             
             # 2. Optional: Say goodbye before ending
-            await context.session.say("Thank you for calling! Goodbye!", allow_interruptions=False)
+            await say_phrase(context.session, GOODBYE, PHRASE_TENANT, VOICE, allow_interruptions=False)
             
             # 3. Get JobContext to access room information
             job_ctx = get_job_context()
@@ -99,7 +119,9 @@ class InvoiceReminderAgent(Agent):
                 logging.error(f"Fallback session close failed: {close_error}")
 
     @function_tool()
+    @with_deadline()
     async def lookup_outstanding_invoices(
+        self,
         context: RunContext,
         customer_phone: str = None
     ) -> dict:
@@ -107,41 +129,21 @@ class InvoiceReminderAgent(Agent):
         try:
             # Extract phone number from room context if not provided
             if not customer_phone:
-                room_parts = context.room.split("Call-")
+                room_parts = get_job_context().room.name.split("Call-")
                 if len(room_parts) > 1:
                     customer_phone = room_parts[1]
                 else:
                     return {"error": "No phone number provided"}
             
-            # Get user data
-            user_data = get_user_data()
-            user = user_data[user_data['phone_number'] == customer_phone]
-            
-            if user.empty:
+            user = get_caller_directory().by_phone(customer_phone)
+            invoices = get_invoice_ledger().outstanding_for_phone(customer_phone)
+            if user is None and not invoices:
                 return {"error": "Customer not found", "phone": customer_phone}
             
-            # Mock invoice data - in real implementation, this would come from a database
-            mock_invoices = [
-                {
-                    "invoice_id": "INV-001",
-                    "amount": 150.00,
-                    "due_date": (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d'),
-                    "status": "overdue",
-                    "description": "Dental cleaning and checkup"
-                },
-                {
-                    "invoice_id": "INV-002", 
-                    "amount": 75.00,
-                    "due_date": (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d'),
-                    "status": "pending",
-                    "description": "X-ray services"
-                }
-            ]
-            
             return {
-                "customer": user.iloc[0].to_dict(),
-                "outstanding_invoices": mock_invoices,
-                "total_outstanding": sum(inv["amount"] for inv in mock_invoices)
+                "customer": user or {"phone_number": customer_phone},
+                "outstanding_invoices": invoices,
+                "total_outstanding": round(sum(inv["amount"] for inv in invoices), 2)
             }
             
         except Exception as e:
@@ -149,7 +151,9 @@ class InvoiceReminderAgent(Agent):
             return {"error": f"Failed to lookup invoices: {str(e)}"}
 
     @function_tool()
+    @with_deadline()
     async def send_payment_reminder(
+        self,
         context: RunContext,
         invoice_id: str,
         reminder_type: str = "gentle"
@@ -183,7 +187,16 @@ class InvoiceReminderAgent(Agent):
             return {"error": f"Failed to send reminder: {str(e)}"}
 
     @function_tool()
+    @with_deadline(
+        timeout=15,
+        fallback=(
+            "The payment could not be confirmed within {timeout:g} seconds. It may still go through, "
+            "so do not retry it. Tell the customer the payment is being confirmed and that they will "
+            "receive a confirmation, and do not say it failed."
+        ),
+    )
     async def process_payment(
+        self,
         context: RunContext,
         invoice_id: str,
         payment_amount: float,
@@ -191,21 +204,20 @@ class InvoiceReminderAgent(Agent):
     ) -> dict:
         """Process a payment for a specific invoice."""
         try:
-            # Mock payment processing - in real implementation, this would integrate with payment gateway
+            # Payment gateway integration still to come; the payment is recorded in the ledger
             if payment_amount <= 0:
                 return {"error": "Invalid payment amount"}
             
-            # Simulate payment processing
-            payment_id = f"PAY-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            payment = await get_invoice_ledger().arecord_payment(invoice_id, payment_amount, payment_method)
+            if payment is None:
+                return {"error": "Invoice not found", "invoice_id": invoice_id}
+            if "error" in payment:
+                return payment
             
             return {
                 "success": True,
-                "payment_id": payment_id,
-                "invoice_id": invoice_id,
-                "amount": payment_amount,
-                "method": payment_method,
-                "timestamp": datetime.now().isoformat(),
-                "confirmation_number": f"CONF-{payment_id}"
+                **payment,
+                "confirmation_number": f"CONF-{payment['payment_id']}"
             }
             
         except Exception as e:
@@ -213,22 +225,26 @@ class InvoiceReminderAgent(Agent):
             return {"error": f"Failed to process payment: {str(e)}"}
 
     @function_tool()
+    @with_deadline()
     async def update_invoice_status(
+        self,
         context: RunContext,
         invoice_id: str,
         new_status: str
     ) -> dict:
         """Update the status of an invoice."""
         try:
-            valid_statuses = ["pending", "paid", "overdue", "cancelled"]
-            if new_status not in valid_statuses:
-                return {"error": f"Invalid status. Must be one of: {valid_statuses}"}
+            if new_status not in INVOICE_STATUSES:
+                return {"error": f"Invalid status. Must be one of: {list(INVOICE_STATUSES)}"}
+            
+            old_status = await get_invoice_ledger().aupdate_status(invoice_id, new_status)
+            if old_status is None:
+                return {"error": "Invoice not found", "invoice_id": invoice_id}
             
-            # Mock status update - in real implementation, this would update the database
             return {
                 "success": True,
                 "invoice_id": invoice_id,
-                "old_status": "pending",  # Would get from database
+                "old_status": old_status,
                 "new_status": new_status,
                 "updated_at": datetime.now().isoformat()
             }
@@ -238,23 +254,16 @@ class InvoiceReminderAgent(Agent):
             return {"error": f"Failed to update status: {str(e)}"}
 
     @function_tool()
+    @with_deadline()
     async def lookup_user(
+        self,
         context: RunContext,
     ) -> dict:
         """Look up a user's email and info to send an email."""
-        try:
-            room_parts = context.room.split("-")
-            if len(room_parts) > 1:
-                user_data = get_user_data()
-                user = user_data[user_data['phone_number'] == room_parts[1]]
-                if not user.empty:
-                    return user.iloc[0].to_dict()
-            return {"name": "John Doe", "email": "john.doe@example.com"}
-        except Exception as e:
-            logging.error(f"Error looking up user: {e}")
-            return {"name": "John Doe", "email": "john.doe@example.com"}
+        return lookup_caller()
 
     @function_tool()
+    @with_deadline(timeout=0)
     async def transfer_call(self, ctx: RunContext):
         """Transfer the call to a human agent, called after confirming with the user"""
         transfer_to = "+15105550123"
@@ -281,13 +290,21 @@ class InvoiceReminderAgent(Agent):
             return "could not transfer call"
 
 
+# Components the configured pipeline needs, plus the caller directory, invoice ledger and MCP tools
+PREWARM_COMPONENTS = PIPELINE.prewarm_components(["callers", "invoices", "mcp"])
+
+
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    prewarm_components(proc, resolve_components(PREWARM_COMPONENTS))
 
 
 async def entrypoint(ctx: JobContext):
-    # Join the room and connect to the user
-    await ctx.connect()
+    # Independent startup steps run concurrently below; time to first audio is measured from here
+    turn_metrics = get_turn_metrics()
+    startup = StartupOrchestrator(on_first_audio=lambda ms: turn_metrics.observe("startup_first_audio", ms / 1000))
+    # Opt-in memory snapshots of this job, see AGENT_MEMORY_PROFILE and AGENT_JOB_MEMORY_BUDGET_MB
+    memory = JobMemoryProfiler()
+    memory.start()
 
     try:
         # Load user data from job metadata
@@ -297,35 +314,21 @@ async def entrypoint(ctx: JobContext):
     
     user_name = metadata.get("user_name", "Guest")
     
-    # Logging setup
+    # Logging setup, the job's room name is known before connecting
     ctx.log_context_fields = {
-        "room": ctx.room.name,
+        "room": ctx.job.room.name,
     }
 
-    users = get_user_data()
-    user = ctx.room.name.split("-")
+    user = ctx.job.room.name.split("-")
+    set_labels(metadata.get("tenant_id") or "default", "invoice_reminder")
+    mcp_server = get_mcp_server(MCP_SERVER_URL) if MCP_SERVER_URL else None
 
-    # Set up the voice AI pipeline using OpenAI Realtime API
+    # Set up the voice AI pipeline, the OpenAI Realtime API unless AGENT_PIPELINE says otherwise
     session = AgentSession(
-        llm=openai.realtime.RealtimeModel(
-            model=MODEL,
-            voice=VOICE,
-            temperature=0.6,
-            turn_detection=TurnDetection(
-                type="server_vad",  # Faster than semantic_vad
-                threshold=0.6,        # Slightly higher for telephony
-                prefix_padding_ms=200,  # Reduced from default 300ms
-                silence_duration_ms=400,  # Reduced from default 500ms
-                create_response=True,
-                interrupt_response=True,
-            )
-        ),
+        **session_components(PIPELINE, ctx.proc, MODEL, VOICE),
         preemptive_generation=True,
-        mcp_servers=[
-            mcp.MCPServerHTTP(
-                url=MCP_SERVER_URL
-            )
-        ],
+        # Shared per process: tool schemas come from the worker's cache, connections from a keep-alive pool
+        mcp_servers=[mcp_server] if mcp_server else [],
         userdata=user[1] if len(user) > 1 else 'guest'
     )
 
@@ -336,29 +339,53 @@ async def entrypoint(ctx: JobContext):
     def _on_metrics_collected(ev: MetricsCollectedEvent):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
+        turn_metrics.record(ev.metrics)
+
+    startup.watch_first_audio(session)
+    turn_metrics.watch_session(session)
 
     async def log_usage():
         summary = usage_collector.get_summary()
         logger.info(f"Usage: {summary}")
+        logger.info(f"Prompt cache: {cached_prompt_ratio(summary):.0%} of {summary.llm_prompt_tokens} input tokens cached")
+        logger.info(f"Startup: {startup.timings()}")
+        turn_metrics.flush()
 
     ctx.add_shutdown_callback(log_usage)
 
-    # Start the session, which initializes the voice pipeline and warms up the models
-    await session.start(
-        agent=InvoiceReminderAgent(),
+    # The worker's load function reads this process' event-loop lag
+    loop_lag = LoopLagReporter()
+    loop_lag.start()
+    ctx.add_shutdown_callback(loop_lag.aclose)
+    memory.watch_session(session)
+    ctx.add_shutdown_callback(memory.shutdown)
+
+    # Join the room and connect to the user
+    startup.add("connect", ctx.connect)
+    if mcp_server:
+        startup.add("mcp", mcp_server.connect, required=False)
+    # Start the session, which initializes the voice pipeline and connects the realtime model
+    startup.add("session", lambda: session.start(
+        agent=InvoiceReminderAgent(caller_name=user_name),
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVCTelephony(),
+            noise_cancellation=noise_cancellation_filter(PIPELINE, ctx.proc),
         ),
-    )
-
-    await session.generate_reply(
+    ))
+    greet_after = ["connect", "session"]
+    if metadata.get("campaign_id"):
+        # Outbound campaign call: the customer joins once they pick up
+        startup.add("participant", ctx.wait_for_participant, after=["connect"])
+        greet_after.append("participant")
+    # The greeting plays from the phrase cache; until it is cached the model greets and it is cached for later calls
+    startup.add("greeting", lambda: say_phrase(session, GREETING, PHRASE_TENANT, VOICE, fallback=lambda: session.generate_reply(
         instructions=f"""Greet the user and offer your assistance with invoice and payment matters. 
         You should start by speaking in English.
         Always respond in English. Welcome to {COMPANY_NAME} billing department."""
-    )
+    )), after=greet_after)
+    await startup.run()
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
+    start_metrics_server()
+    cli.run_app(worker_options(PIPELINE, entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, agent_name=INVOICE_AGENT_NAME))
\ No newline at end of file
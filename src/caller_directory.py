@@ -0,0 +1,183 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CALLER_DIRECTORY_PATH = os.getenv("CALLER_DIRECTORY_PATH", "src/data/user_data.csv")
+# Country calling code assumed for numbers stored without one, e.g. "31"
+CALLER_DEFAULT_COUNTRY_CODE = os.getenv("CALLER_DEFAULT_COUNTRY_CODE", "")
+# Seconds between checks of the file's mtime
+CALLER_DIRECTORY_RELOAD_INTERVAL = float(
+    os.getenv("CALLER_DIRECTORY_RELOAD_INTERVAL", "5")
+)
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(
+    raw: str, default_country_code: str = CALLER_DEFAULT_COUNTRY_CODE
+) -> str:
+    """
+    Normalize a phone number to E.164 (`+<country code><number>`).
+
+    Accepts formatting characters, `00` international prefixes and national
+    numbers with a leading trunk `0`, which get `default_country_code`.
+    Returns an empty string if there are no digits.
+    """
+    raw = (raw or "").strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return ""
+    if raw.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if default_country_code:
+        return (
+            f"+{default_country_code}{digits[1:] if digits.startswith('0') else digits}"
+        )
+    return f"+{digits}"
+
+
+class CallerDirectory:
+    """
+    In-memory caller directory loaded from the user data CSV.
+
+    Rows are kept as tuples sharing one column header, with hash indexes on
+    normalized phone number and on id, so a lookup is a dict access. The file
+    is re-read when its mtime changes, checked at most every `reload_interval`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = CALLER_DIRECTORY_PATH,
+        reload_interval: float = CALLER_DIRECTORY_RELOAD_INTERVAL,
+    ):
+        """
+        Args:
+            path: CSV file with at least `id` and `phone_number` columns
+            reload_interval: Seconds between mtime checks, 0 checks on every lookup
+        """
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        # (columns, rows, phone index, id index), swapped as a whole on reload
+        self._state: Tuple[
+            Tuple[str, ...], List[Tuple[str, ...]], Dict[str, int], Dict[str, int]
+        ] = ((), [], {}, {})
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def load(self) -> bool:
+        """(Re)load the CSV, keeping the previous contents if it cannot be read"""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                columns = tuple(next(reader, ()))
+                rows = [tuple(row) for row in reader if row]
+        except FileNotFoundError:
+            logger.error(f"File {self.path} not found")
+            return False
+        except Exception as e:
+            logger.error(f"Error loading user data: {e}")
+            return False
+
+        phone_column = (
+            columns.index("phone_number") if "phone_number" in columns else None
+        )
+        id_column = columns.index("id") if "id" in columns else None
+        by_phone: Dict[str, int] = {}
+        by_id: Dict[str, int] = {}
+        width = len(columns)
+        for i, row in enumerate(rows):
+            if len(row) != width:
+                rows[i] = row = (row + ("",) * width)[:width]
+            if phone_column is not None:
+                phone = normalize_phone(row[phone_column])
+                if phone:
+                    by_phone.setdefault(phone, i)
+            if id_column is not None:
+                by_id.setdefault(row[id_column], i)
+
+        self._state = (columns, rows, by_phone, by_id)
+        self._mtime = mtime
+        logger.info(f"Loaded {len(rows)} callers from {self.path}")
+        return True
+
+    def _reload_if_changed(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+    def by_phone(self, phone: str) -> Optional[Dict[str, str]]:
+        """Return the caller with this phone number in any common format, or None"""
+        self._reload_if_changed()
+        columns, rows, by_phone, _ = self._state
+        index = by_phone.get(normalize_phone(phone))
+        return None if index is None else dict(zip(columns, rows[index]))
+
+    def by_id(self, user_id: str) -> Optional[Dict[str, str]]:
+        """Return the caller with this id, or None"""
+        self._reload_if_changed()
+        columns, rows, _, by_id = self._state
+        index = by_id.get(str(user_id))
+        return None if index is None else dict(zip(columns, rows[index]))
+
+
+_caller_directory: Optional[CallerDirectory] = None
+
+
+def get_caller_directory() -> CallerDirectory:
+    """Return the worker process' caller directory, loading it on first use"""
+    global _caller_directory
+    if _caller_directory is None:
+        _caller_directory = CallerDirectory()
+    return _caller_directory
+
+
+# Returned for callers whose number is not in the directory
+UNKNOWN_CALLER = {"name": "John Doe", "email": "john.doe@example.com"}
+
+
+def lookup_caller(room_name: Optional[str] = None) -> dict:
+    """
+    Caller record for the phone number in a room name (`<prefix>-<phone>`).
+
+    Args:
+        room_name: Room to look up, the current job's room if None
+    """
+    try:
+        if room_name is None:
+            from livekit.agents import get_job_context
+
+            room_name = get_job_context().job.room.name
+        parts = room_name.split("-")
+        if len(parts) > 1:
+            user = get_caller_directory().by_phone(parts[1])
+            if user:
+                return user
+    except Exception as e:
+        logger.error(f"Error looking up user: {e}")
+    return dict(UNKNOWN_CALLER)
@@ -0,0 +1,63 @@
+import os
+import re
+from typing import Iterable, Iterator
+
+INGEST_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "400"))
+INGEST_CHUNK_OVERLAP_TOKENS = int(os.getenv("INGEST_CHUNK_OVERLAP_TOKENS", "60"))
+
+# Preferred split points, strongest first
+_BOUNDARIES = (re.compile(r"\n\s*\n"), re.compile(r"(?<=[.!?])\s+"), re.compile(r"\s+"))
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Last paragraph, sentence or word boundary in the second half of `text[:limit]`"""
+    window = text[:limit]
+    for boundary in _BOUNDARIES:
+        matches = [m.end() for m in boundary.finditer(window) if m.end() >= limit // 2]
+        if matches:
+            return matches[-1]
+    return limit
+
+
+def chunk_stream(
+    pieces: Iterable[str],
+    chunk_tokens: int = INGEST_CHUNK_TOKENS,
+    overlap_tokens: int = INGEST_CHUNK_OVERLAP_TOKENS,
+) -> Iterator[str]:
+    """
+    Split streamed text into overlapping chunks without holding the whole document.
+
+    Chunks end on paragraph, sentence or word boundaries where possible, and each
+    chunk repeats the tail of the previous one so facts spanning a boundary stay
+    retrievable.
+
+    Args:
+        pieces: Text blocks in document order, e.g. file reads or extracted pages
+        chunk_tokens: Target chunk size in tokens
+        overlap_tokens: Tokens repeated from the end of the previous chunk
+
+    Yields:
+        Chunk texts
+    """
+    chunk_chars = chunk_tokens * 4
+    overlap_chars = min(overlap_tokens * 4, chunk_chars // 2)
+    buffer = ""
+    emitted_upto = 0  # characters of `buffer` already covered by an emitted chunk
+
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= chunk_chars:
+            cut = _split_point(buffer, chunk_chars)
+            chunk = buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            # Start the next chunk on a word boundary inside the overlap
+            start = max(cut - overlap_chars, 0)
+            space = buffer.find(" ", start, cut)
+            start = space + 1 if space != -1 else cut
+            buffer = buffer[start:]
+            emitted_upto = cut - start
+
+    # Emit the remainder unless it is only the overlap of the last chunk
+    if buffer[emitted_upto:].strip():
+        yield buffer.strip()
@@ -0,0 +1,171 @@
+import logging
+import math
+import os
+import re
+from typing import List, Optional, Set, Tuple
+
+from rag_cache import content_words
+
+logger = logging.getLogger(__name__)
+
+# Tokens of knowledge base context handed to the model per tool call, 0 disables packing
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "600"))
+RAG_CONTEXT_PASSAGE_TOKENS = int(os.getenv("RAG_CONTEXT_PASSAGE_TOKENS", "120"))
+# Passages sharing more than this share of word shingles with a kept passage are dropped
+RAG_CONTEXT_DEDUP_THRESHOLD = float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", "0.6"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORDS = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+class Hit:
+    """One search result in the shape the packer needs"""
+
+    def __init__(
+        self, title: str, filename: str, content: str, relevance: Optional[float]
+    ):
+        self.title = title
+        self.filename = filename
+        self.content = content
+        self.relevance = relevance
+
+
+class _Passage:
+    def __init__(self, hit_rank: int, order: int, text: str, score: float):
+        self.hit_rank = hit_rank
+        self.order = order
+        self.text = text
+        self.score = score
+        self.tokens = estimate_tokens(text)
+        words = [w.lower() for w in _WORDS.findall(text)]
+        self.shingles: Set[Tuple[str, ...]] = {
+            tuple(words[i : i + 3]) for i in range(max(len(words) - 2, 1))
+        }
+
+
+class PackedContext:
+    def __init__(self, text: str, tokens: int, passages: int, dropped: int):
+        self.text = text
+        self.tokens = tokens
+        self.passages = passages
+        self.dropped = dropped
+
+
+class ContextPacker:
+    """
+    Packs search hits into a token budget for the realtime model.
+
+    Each hit is split into sentence-aligned passages, passages are ranked by the
+    hit's relevance and their overlap with the query, near-duplicate passages
+    across hits are dropped, and the best ones are kept until the budget is spent.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = RAG_CONTEXT_TOKEN_BUDGET,
+        passage_tokens: int = RAG_CONTEXT_PASSAGE_TOKENS,
+        dedup_threshold: float = RAG_CONTEXT_DEDUP_THRESHOLD,
+    ):
+        """
+        Args:
+            token_budget: Maximum tokens of context returned per call
+            passage_tokens: Target passage size in tokens
+            dedup_threshold: Shingle overlap above which a passage counts as duplicate
+        """
+        self.token_budget = token_budget
+        self.passage_tokens = passage_tokens
+        self.dedup_threshold = dedup_threshold
+
+    def _split(self, content: str) -> List[str]:
+        """Group sentences into passages of roughly `passage_tokens`"""
+        passages, current, size = [], [], 0
+        for sentence in _SENTENCE_END.split(content):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = estimate_tokens(sentence)
+            if current and size + tokens > self.passage_tokens:
+                passages.append(" ".join(current))
+                current, size = [], 0
+            current.append(sentence)
+            size += tokens
+        if current:
+            passages.append(" ".join(current))
+        return passages
+
+    def _is_duplicate(self, passage: _Passage, kept: List[_Passage]) -> bool:
+        for other in kept:
+            overlap = len(passage.shingles & other.shingles) / max(
+                min(len(passage.shingles), len(other.shingles)), 1
+            )
+            if overlap > self.dedup_threshold:
+                return True
+        return False
+
+    def pack(self, query: str, hits: List[Hit]) -> PackedContext:
+        """
+        Select and render the most relevant passages within the token budget.
+
+        Args:
+            query: Search query, used to rank passages inside a hit
+            hits: Search results, best first
+
+        Returns:
+            Rendered context with its token count
+        """
+        query_words = content_words(query)
+        candidates: List[_Passage] = []
+        for rank, hit in enumerate(hits):
+            relevance = hit.relevance if hit.relevance is not None else 1.0 / (rank + 1)
+            for order, text in enumerate(self._split(hit.content)):
+                overlap = (
+                    len(query_words & content_words(text)) / len(query_words)
+                    if query_words
+                    else 0.0
+                )
+                # The hit's relevance dominates, query overlap picks the right passage within it
+                candidates.append(
+                    _Passage(rank, order, text, relevance * (0.5 + 0.5 * overlap))
+                )
+
+        candidates.sort(key=lambda p: p.score, reverse=True)
+        kept: List[_Passage] = []
+        used = 0
+        for passage in candidates:
+            if self._is_duplicate(passage, kept):
+                continue
+            if used + passage.tokens > self.token_budget:
+                if kept:
+                    continue
+                # Always return something for the best passage, truncated to the budget
+                passage.text = passage.text[: self.token_budget * 4]
+                passage.tokens = estimate_tokens(passage.text)
+            kept.append(passage)
+            used += passage.tokens
+
+        sections = []
+        for rank, hit in enumerate(hits):
+            passages = sorted(
+                (p for p in kept if p.hit_rank == rank), key=lambda p: p.order
+            )
+            if not passages:
+                continue
+            relevance_info = (
+                f" (relevance: {hit.relevance:.2f})"
+                if hit.relevance is not None
+                else ""
+            )
+            sections.append(
+                f"Document: {hit.title} ({hit.filename}){relevance_info}\n"
+                f"Content: {' ... '.join(p.text for p in passages)}"
+            )
+
+        text = "\n\n---\n\n".join(sections)
+        return PackedContext(
+            text, estimate_tokens(text), len(kept), len(candidates) - len(kept)
+        )
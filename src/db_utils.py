@@ -1,56 +1,528 @@
 import weaviate
 from weaviate.classes.query import MetadataQuery
 import asyncio
-from typing import List, Optional
+import atexit
+import threading
+import time
+import weakref
+from typing import ClassVar, Dict, List, Optional, Tuple
 import os
-import pandas as pd
 import logging
 
+from context_packer import RAG_CONTEXT_TOKEN_BUDGET, ContextPacker, Hit, estimate_tokens
+from embeddings import RAG_CLIENT_EMBEDDING, QueryEmbedder, get_query_embedder
+from local_index import RAG_LOCAL_INDEX, LocalVectorIndex, get_local_index
+from rag_cache import RetrievalCache, get_retrieval_cache
+
 logger = logging.getLogger(__name__)
 
 # TODO: Future enhancement - Support additional document types (.pdf, .docx, .csv)
-# TODO: Future enhancement - Implement document chunking for large files
 # TODO: Future enhancement - Implement hybrid search (vector + keyword)
 
+# Pool tuning, overridable per deployment
+WEAVIATE_POOL_IDLE_TIMEOUT = float(os.getenv("WEAVIATE_POOL_IDLE_TIMEOUT", "300"))
+WEAVIATE_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("WEAVIATE_POOL_HEALTH_CHECK_INTERVAL", "30"))
+# Async retrieval path
+RAG_MAX_CONCURRENT_SEARCHES = int(os.getenv("RAG_MAX_CONCURRENT_SEARCHES", "16"))
+RAG_COLLECTION_EXISTS_TTL = float(os.getenv("RAG_COLLECTION_EXISTS_TTL", "300"))
+
+
+class _PooledClient:
+    """Book-keeping for one shared Weaviate client inside the pool"""
+
+    def __init__(self, client):
+        self.client = client
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.last_health_check = time.monotonic()
+
+
+class WeaviateClientPool:
+    """
+    Process-wide pool of Weaviate Cloud clients.
+
+    Every job running in a worker process shares one warm client per cluster, so
+    knowledge base searches skip the connection handshake. Tenants living on the
+    same cluster share a client because their data is already isolated by the
+    `Documents_{tenant_id}` collection name.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = WEAVIATE_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = WEAVIATE_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        """
+        Args:
+            idle_timeout: Seconds an unused client is kept open before it is closed
+            health_check_interval: Minimum seconds between readiness probes of a client
+        """
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._entries: Dict[Tuple[str, str], _PooledClient] = {}
+        # Guards the entries only, never held across network calls. Reentrant because
+        # `WeaviateRAG.__del__` can release a client from inside a locked section
+        self._lock = threading.RLock()
+        # One lock per cluster, serializing its connects and health probes
+        self._connect_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        # Invalidated or unhealthy clients that are still held, closed once released
+        self._retired: List[_PooledClient] = []
+
+    def _cluster_config(self, tenant_id: str) -> Tuple[str, str, str]:
+        """Resolve the cluster URL and credentials serving a tenant"""
+        weaviate_url = os.getenv("WEAVIATE_URL")
+        weaviate_key = os.getenv("WEAVIATE_API_KEY")
+        openai_key = os.getenv("OPENAI_API_KEY")
+
+        if not all([weaviate_url, weaviate_key, openai_key]):
+            raise ValueError("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
+
+        return weaviate_url, weaviate_key, openai_key
+
+    def _connect(self, weaviate_url: str, weaviate_key: str, openai_key: str):
+        """Open a new Weaviate Cloud connection"""
+        return weaviate.connect_to_weaviate_cloud(
+            cluster_url=weaviate_url,
+            auth_credentials=weaviate.auth.AuthApiKey(weaviate_key),
+            headers={
+                "X-OpenAI-Api-Key": openai_key
+            }
+        )
+
+    def _is_healthy(self, entry: _PooledClient) -> bool:
+        """Probe a client if its last health check is older than the check interval"""
+        now = time.monotonic()
+        if now - entry.last_health_check < self.health_check_interval:
+            return True
+
+        entry.last_health_check = now
+        try:
+            return entry.client.is_connected() and entry.client.is_ready()
+        except Exception as e:
+            logger.warning(f"Weaviate health check failed: {e}")
+            return False
+
+    def _close_client(self, client):
+        try:
+            client.close()
+        except Exception as e:
+            logger.error(f"Error closing Weaviate client: {e}")
+
+    def acquire(self, tenant_id: str):
+        """
+        Get a warm client for the tenant's cluster, connecting on first use.
+
+        Every call must be paired with `release` once the caller is done with the client.
+
+        Args:
+            tenant_id: Unique identifier for the tenant
+
+        Returns:
+            A connected `weaviate.WeaviateClient`
+        """
+        weaviate_url, weaviate_key, openai_key = self._cluster_config(tenant_id)
+        key = (weaviate_url, weaviate_key)
+
+        with self._lock:
+            connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+
+        # A slow or unreachable cluster only holds up callers of that same cluster
+        with connect_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    # Held from here on, so idle eviction cannot close it during the probe
+                    entry.refs += 1
+
+            if entry is not None and not self._is_healthy(entry):
+                logger.warning(f"Dropping unhealthy Weaviate client for {weaviate_url}")
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        self._entries.pop(key)
+                        self._retired.append(entry)
+                    entry.refs -= 1
+                self._close_retired()
+                entry = None
+
+            if entry is None:
+                entry = _PooledClient(self._connect(weaviate_url, weaviate_key, openai_key))
+                entry.refs = 1
+                with self._lock:
+                    self._entries[key] = entry
+                logger.info(f"Opened pooled Weaviate connection to {weaviate_url}")
+
+            entry.last_used = time.monotonic()
+            return entry.client
+
+    def release(self, client):
+        """Hand a client back to the pool and close clients that have been idle too long"""
+        with self._lock:
+            for entry in [*self._entries.values(), *self._retired]:
+                if entry.client is client:
+                    entry.refs = max(entry.refs - 1, 0)
+                    entry.last_used = time.monotonic()
+                    pooled = True
+                    break
+            else:
+                pooled = False
+        if not pooled:
+            # Closed by `close_all` while still in use
+            self._close_client(client)
+        self._close_retired()
+        self.evict_idle()
+
+    def invalidate(self, client):
+        """
+        Force the next `acquire` for this client's cluster to reconnect.
+
+        Other holders keep using the client; it is closed once the last one releases it.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.client is client:
+                    self._entries.pop(key)
+                    self._retired.append(entry)
+                    break
+        self._close_retired()
+
+    def _close_retired(self):
+        """Close retired clients that nobody holds any more"""
+        with self._lock:
+            unused = [entry for entry in self._retired if entry.refs == 0]
+            self._retired = [entry for entry in self._retired if entry.refs > 0]
+        for entry in unused:
+            self._close_client(entry.client)
+
+    def evict_idle(self):
+        """Close clients that nobody holds and that have been idle longer than `idle_timeout`"""
+        now = time.monotonic()
+        idle = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.refs == 0 and now - entry.last_used > self.idle_timeout:
+                    self._entries.pop(key)
+                    idle.append((key, entry))
+        for key, entry in idle:
+            self._close_client(entry.client)
+            logger.info(f"Closed idle Weaviate connection to {key[0]}")
+
+    def close_all(self):
+        """Close every pooled client, used on worker shutdown"""
+        with self._lock:
+            entries = [*self._entries.values(), *self._retired]
+            self._entries.clear()
+            self._retired.clear()
+        for entry in entries:
+            self._close_client(entry.client)
+
+
+_client_pool: Optional[WeaviateClientPool] = None
+# Keeps fire-and-forget tasks (e.g. local index syncs) alive until they finish
+_background_tasks: set = set()
+
+
+def get_client_pool() -> WeaviateClientPool:
+    """Return the worker process' shared Weaviate client pool"""
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = WeaviateClientPool()
+        atexit.register(_client_pool.close_all)
+    return _client_pool
+
+
+class AsyncWeaviateClientPool(WeaviateClientPool):
+    """
+    Pool of Weaviate async clients, one per cluster and event loop.
+
+    Async clients are bound to the loop they connected on, so jobs sharing a loop
+    share a client while a second loop in the same process gets its own.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = WEAVIATE_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = WEAVIATE_POOL_HEALTH_CHECK_INTERVAL,
+    ):
+        super().__init__(idle_timeout=idle_timeout, health_check_interval=health_check_interval)
+        self._async_entries: Dict[Tuple[str, str, int], _PooledClient] = {}
+        # Invalidated or unhealthy async clients still held, closed on their loop once released
+        self._async_retired: List[Tuple[Tuple[str, str, int], _PooledClient]] = []
+        self._loop_locks: Dict[int, asyncio.Lock] = {}
+
+    def _loop_lock(self) -> asyncio.Lock:
+        loop_id = id(asyncio.get_running_loop())
+        lock = self._loop_locks.get(loop_id)
+        if lock is None:
+            lock = self._loop_locks[loop_id] = asyncio.Lock()
+        return lock
+
+    async def _aconnect(self, weaviate_url: str, weaviate_key: str, openai_key: str):
+        """Open a new async Weaviate Cloud connection"""
+        client = weaviate.use_async_with_weaviate_cloud(
+            cluster_url=weaviate_url,
+            auth_credentials=weaviate.auth.AuthApiKey(weaviate_key),
+            headers={
+                "X-OpenAI-Api-Key": openai_key
+            }
+        )
+        await client.connect()
+        return client
+
+    async def _ais_healthy(self, entry: _PooledClient) -> bool:
+        now = time.monotonic()
+        if now - entry.last_health_check < self.health_check_interval:
+            return True
+
+        entry.last_health_check = now
+        try:
+            return entry.client.is_connected() and await entry.client.is_ready()
+        except Exception as e:
+            logger.warning(f"Weaviate health check failed: {e}")
+            return False
+
+    async def _aclose_client(self, client):
+        try:
+            await client.close()
+        except Exception as e:
+            logger.error(f"Error closing Weaviate async client: {e}")
+
+    async def aacquire(self, tenant_id: str):
+        """
+        Get a warm async client for the tenant's cluster on the running loop.
+
+        Args:
+            tenant_id: Unique identifier for the tenant
+
+        Returns:
+            A connected `weaviate.WeaviateAsyncClient`
+        """
+        weaviate_url, weaviate_key, openai_key = self._cluster_config(tenant_id)
+        key = (weaviate_url, weaviate_key, id(asyncio.get_running_loop()))
+
+        async with self._loop_lock():
+            entry = self._async_entries.get(key)
+            if entry is not None and not await self._ais_healthy(entry):
+                logger.warning(f"Dropping unhealthy Weaviate async client for {weaviate_url}")
+                self._async_entries.pop(key, None)
+                self._async_retired.append((key, entry))
+                await self._aclose_retired()
+                entry = None
+
+            if entry is None:
+                entry = _PooledClient(await self._aconnect(weaviate_url, weaviate_key, openai_key))
+                self._async_entries[key] = entry
+                logger.info(f"Opened pooled Weaviate async connection to {weaviate_url}")
+
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+            return entry.client
+
+    def release_nowait(self, client) -> bool:
+        """Drop a reference without closing anything, returns False if the client is no longer pooled"""
+        for entry in [*self._async_entries.values(), *(e for _, e in self._async_retired)]:
+            if entry.client is client:
+                entry.refs = max(entry.refs - 1, 0)
+                entry.last_used = time.monotonic()
+                return True
+        return False
+
+    async def arelease(self, client):
+        """Hand an async client back and close clients that have been idle too long"""
+        if not self.release_nowait(client):
+            # Closed by `aclose_all` while still in use
+            await self._aclose_client(client)
+        await self._aclose_retired()
+        await self.aevict_idle()
+
+    def ainvalidate(self, client):
+        """
+        Force the next `aacquire` for this client's cluster to reconnect.
+
+        Other holders keep using the client; `arelease` closes it once the last one is done.
+        """
+        for key, entry in list(self._async_entries.items()):
+            if entry.client is client:
+                self._async_entries.pop(key)
+                self._async_retired.append((key, entry))
+                break
+
+    async def _aclose_retired(self):
+        """Close retired clients of the running loop that nobody holds any more"""
+        loop_id = id(asyncio.get_running_loop())
+        unused = [(k, e) for k, e in self._async_retired if k[2] == loop_id and e.refs == 0]
+        self._async_retired = [item for item in self._async_retired if item not in unused]
+        for _, entry in unused:
+            await self._aclose_client(entry.client)
+
+    async def aevict_idle(self):
+        """Close idle async clients that belong to the running loop"""
+        now = time.monotonic()
+        loop_id = id(asyncio.get_running_loop())
+        for key, entry in list(self._async_entries.items()):
+            if key[2] == loop_id and entry.refs == 0 and now - entry.last_used > self.idle_timeout:
+                self._async_entries.pop(key)
+                await self._aclose_client(entry.client)
+                logger.info(f"Closed idle Weaviate async connection to {key[0]}")
+
+    async def aclose_all(self):
+        """Close every async client of the running loop, call before the loop shuts down"""
+        loop_id = id(asyncio.get_running_loop())
+        for key, entry in list(self._async_entries.items()):
+            if key[2] == loop_id:
+                self._async_entries.pop(key)
+                await self._aclose_client(entry.client)
+        retired = [(k, e) for k, e in self._async_retired if k[2] == loop_id]
+        self._async_retired = [item for item in self._async_retired if item not in retired]
+        for _, entry in retired:
+            await self._aclose_client(entry.client)
+
+
+class SearchLimiter:
+    """
+    Bounds concurrent knowledge base searches per worker process and tracks queueing.
+
+    Searches beyond the limit wait their turn instead of piling onto Weaviate, and
+    the queue depth shows when a worker is running more sessions than it can serve.
+    """
+
+    def __init__(self, max_concurrent: int = RAG_MAX_CONCURRENT_SEARCHES):
+        self.max_concurrent = max_concurrent
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.total_wait = 0.0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop_id = id(asyncio.get_running_loop())
+        semaphore = self._semaphores.get(loop_id)
+        if semaphore is None:
+            semaphore = self._semaphores[loop_id] = asyncio.Semaphore(self.max_concurrent)
+        return semaphore
+
+    async def run(self, coro_fn):
+        """Run `coro_fn()` once a search slot is free"""
+        semaphore = self._semaphore()
+        start = time.monotonic()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.total_wait += time.monotonic() - start
+
+        self.in_flight += 1
+        try:
+            return await coro_fn()
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and wait time counters"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+_async_client_pool: Optional[AsyncWeaviateClientPool] = None
+_search_limiter: Optional[SearchLimiter] = None
+
+
+def get_async_client_pool() -> AsyncWeaviateClientPool:
+    """Return the worker process' shared async Weaviate client pool"""
+    global _async_client_pool
+    if _async_client_pool is None:
+        _async_client_pool = AsyncWeaviateClientPool()
+    return _async_client_pool
+
+
+def get_search_limiter() -> SearchLimiter:
+    """Return the worker process' shared search concurrency limiter"""
+    global _search_limiter
+    if _search_limiter is None:
+        _search_limiter = SearchLimiter()
+    return _search_limiter
+
+
+# Every WeaviateRAG alive in the process, and how many were only released by garbage collection
+_live_rags: "weakref.WeakSet[WeaviateRAG]" = weakref.WeakSet()
+_rag_lifecycle = {"released_by_gc": 0}
+
+
+def rag_client_stats() -> Dict:
+    """Tenants of RAG clients still holding a pooled connection, and clients that were never closed"""
+    return {
+        "open": sorted(rag.tenant_id for rag in list(_live_rags) if rag.client is not None),
+        "released_by_gc": _rag_lifecycle["released_by_gc"],
+    }
+
+
 class WeaviateRAG:
     """
     Weaviate RAG client for tenant-specific knowledge base searches.
     Uses Weaviate Cloud with OpenAI text-embedding-3-small vectorizer.
     """
     
-    def __init__(self, tenant_id: str):
+    def __init__(
+        self,
+        tenant_id: str,
+        pool: Optional[WeaviateClientPool] = None,
+        cache: Optional[RetrievalCache] = None,
+        local_index: Optional[LocalVectorIndex] = None,
+        embedder: Optional[QueryEmbedder] = None,
+    ):
         """
         Initialize Weaviate RAG client for a specific tenant.
         
         Args:
             tenant_id: Unique identifier for the tenant
+            pool: Client pool to borrow connections from, defaults to the process-wide pool
+            cache: Result cache, defaults to the process-wide cache (disable with RAG_CACHE_ENABLED=false)
+            local_index: In-process mirror of the collection, defaults to the tenant's mirror when RAG_LOCAL_INDEX=true
+            embedder: Query embedder for local search, defaults to the process-wide embedder
         """
         self.tenant_id = tenant_id
         self.collection_name = f"Documents_{tenant_id}"
+        self.pool = pool if pool is not None else get_client_pool()
+        if cache is None and os.getenv("RAG_CACHE_ENABLED", "true").lower() == "true":
+            cache = get_retrieval_cache()
+        self.cache = cache
+        if local_index is None and RAG_LOCAL_INDEX:
+            local_index = get_local_index(tenant_id)
+        self.local_index = local_index
+        self.embedder = embedder if embedder is not None else get_query_embedder()
+        self.packer = ContextPacker() if RAG_CONTEXT_TOKEN_BUDGET > 0 else None
+        # Estimated tokens of context returned by the last retrieval
+        self.last_context_tokens = 0
         self.client = None
         self._initialize_client()
+        _live_rags.add(self)
         
     def _initialize_client(self):
-        """Initialize Weaviate Cloud client with proper error handling"""
+        """Borrow a Weaviate Cloud client from the pool with proper error handling"""
         try:
-            weaviate_url = os.getenv("WEAVIATE_URL")
-            weaviate_key = os.getenv("WEAVIATE_API_KEY")
-            openai_key = os.getenv("OPENAI_API_KEY")
-            
-            if not all([weaviate_url, weaviate_key, openai_key]):
-                raise ValueError("Missing required environment variables: WEAVIATE_URL, WEAVIATE_API_KEY, or OPENAI_API_KEY")
-            
-            self.client = weaviate.connect_to_weaviate_cloud(
-                cluster_url=weaviate_url,
-                auth_credentials=weaviate.auth.AuthApiKey(weaviate_key),
-                headers={
-                    "X-OpenAI-Api-Key": openai_key
-                }
-            )
+            self.client = self.pool.acquire(self.tenant_id)
             logger.info(f"Connected to Weaviate Cloud for tenant: {self.tenant_id}")
         except Exception as e:
             logger.error(f"Failed to initialize Weaviate client: {e}")
             raise
+
+    def _reconnect(self):
+        """Replace a broken pooled client with a fresh one"""
+        if self.client:
+            self.pool.invalidate(self.client)
+            self.pool.release(self.client)
+            self.client = None
+        self._initialize_client()
     
     async def retrieve_context(self, query: str, limit: int = 3) -> str:
         """
@@ -67,37 +539,122 @@ class WeaviateRAG:
             if not self.client:
                 logger.error("Weaviate client not initialized")
                 return ""
-            
-            # Check if collection exists
-            collection_exists = await asyncio.to_thread(
-                lambda: self.client.collections.exists(self.collection_name)
-            )
-            
-            if not collection_exists:
-                logger.warning(f"Collection {self.collection_name} does not exist for tenant {self.tenant_id}")
-                return ""
-            
-            # Perform search
-            result = await asyncio.to_thread(
-                self._sync_search, query, limit
-            )
-            
-            return self._format_results(result)
+
+            if self.cache is None:
+                context = await self._retrieve_uncached(query, limit)
+            else:
+                context = await self.cache.get_or_fetch(
+                    self.tenant_id, query, limit, lambda: self._retrieve_uncached(query, limit)
+                )
+
+            # Count cache hits too, this is what the model actually receives
+            self.last_context_tokens = estimate_tokens(context)
+            return context
             
         except Exception as e:
             logger.error(f"RAG retrieval error: {e}", exc_info=True)
             return ""
+
+    async def _retrieve_uncached(self, query: str, limit: int) -> str:
+        """Search the local mirror or Weaviate and format the hits, raising on failure so errors are never cached"""
+        if self.local_index is not None:
+            result = await self._local_search(query, limit)
+            if result is not None:
+                return self._format_results(result, query)
+
+        return self._format_results(await self._remote_search(query, limit), query)
+
+    async def _remote_search(self, query: str, limit: int):
+        """Search Weaviate, reconnecting once if the pooled connection went away"""
+        try:
+            return await self._search(query, limit)
+        except weaviate.exceptions.WeaviateConnectionError as e:
+            # The pooled connection went away, retry once on a fresh one
+            logger.warning(f"Weaviate connection lost, reconnecting: {e}")
+            await asyncio.to_thread(self._reconnect)
+            return await self._search(query, limit)
+
+    async def _local_search(self, query: str, limit: int):
+        """
+        Search the in-process mirror of the collection.
+
+        Returns:
+            Response with `.objects`, or None when the caller should search Weaviate instead
+        """
+        index = self.local_index
+        if not index.is_usable():
+            # Another worker process may have synced it; loading its metadata is a full JSON parse
+            await asyncio.to_thread(index.reload_if_changed)
+        usable = index.is_usable()
+        if index.sync_due():
+            task = asyncio.create_task(asyncio.to_thread(self._sync_local_index))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        if not usable:
+            return None
+
+        try:
+            vector = await self.embedder.embed(query)
+            if index.needs_thread():
+                return await asyncio.to_thread(index.search, vector, limit)
+            return index.search(vector, limit)
+        except Exception as e:
+            logger.warning(f"Local index search failed, falling back to Weaviate: {e}")
+            return None
+
+    def _sync_local_index(self):
+        """Refresh the local mirror on a pooled synchronous client"""
+        client = None
+        try:
+            client = get_client_pool().acquire(self.tenant_id)
+            self.local_index.sync(client)
+        except Exception as e:
+            logger.error(f"Local index sync failed for tenant {self.tenant_id}: {e}")
+        finally:
+            if client is not None:
+                get_client_pool().release(client)
     
-    def _sync_search(self, query: str, limit: int):
+    async def _search(self, query: str, limit: int):
+        """Run the existence check and vector search off the event loop"""
+        # Embed the query on the client while the existence check runs
+        embedding = asyncio.ensure_future(self.embedder.embed(query)) if RAG_CLIENT_EMBEDDING else None
+
+        # Check if collection exists
+        collection_exists = await asyncio.to_thread(
+            lambda: self.client.collections.exists(self.collection_name)
+        )
+
+        if not collection_exists:
+            if embedding is not None:
+                embedding.cancel()
+            logger.warning(f"Collection {self.collection_name} does not exist for tenant {self.tenant_id}")
+            return None
+
+        vector = await embedding if embedding is not None else None
+
+        # Perform search
+        return await asyncio.to_thread(
+            self._sync_search, query, limit, vector
+        )
+
+    def _sync_search(self, query: str, limit: int, vector: Optional[List[float]] = None):
         """Synchronous search operation to be run in thread"""
         try:
             collection = self.client.collections.get(self.collection_name)
             
-            response = collection.query.near_text(
-                query=query,
-                limit=limit,
-                return_metadata=MetadataQuery(distance=True)
-            )
+            if vector is not None:
+                # Query embedded on the client, Weaviate skips its own OpenAI call
+                response = collection.query.near_vector(
+                    near_vector=vector,
+                    limit=limit,
+                    return_metadata=MetadataQuery(distance=True)
+                )
+            else:
+                response = collection.query.near_text(
+                    query=query,
+                    limit=limit,
+                    return_metadata=MetadataQuery(distance=True)
+                )
             
             return response
             
@@ -105,12 +662,16 @@ class WeaviateRAG:
             logger.error(f"Error in sync search: {e}")
             raise
     
-    def _format_results(self, response) -> str:
+    def _format_results(self, response, query: str = "") -> str:
         """
         Format search results into readable context string.
+
+        With a token budget configured, only the most relevant, non-overlapping
+        passages of each hit are kept (see `ContextPacker`).
         
         Args:
             response: Weaviate query response object
+            query: Search query, used to pick the relevant passages
             
         Returns:
             Formatted string with document contexts
@@ -118,53 +679,189 @@ class WeaviateRAG:
         if not response or not response.objects:
             return ""
         
-        contexts = []
+        hits = []
         for obj in response.objects:
             properties = obj.properties
-            title = properties.get('title', 'N/A')
-            content = properties.get('content', '')
-            filename = properties.get('filename', '')
             
             # Include distance/certainty if available
-            distance_info = ""
+            relevance = None
             if hasattr(obj.metadata, 'distance') and obj.metadata.distance is not None:
-                distance_info = f" (relevance: {1 - obj.metadata.distance:.2f})"
-            
-            contexts.append(
-                f"Document: {title} ({filename}){distance_info}\n"
-                f"Content: {content}"
+                relevance = 1 - obj.metadata.distance
+
+            hits.append(Hit(
+                title=properties.get('title', 'N/A'),
+                filename=properties.get('filename', ''),
+                content=properties.get('content', ''),
+                relevance=relevance,
+            ))
+
+        if self.packer is not None:
+            packed = self.packer.pack(query, hits)
+            text = packed.text
+            logger.info(
+                f"Packed knowledge base context for tenant {self.tenant_id}: {packed.tokens} tokens, "
+                f"{packed.passages} passages kept, {packed.dropped} dropped"
             )
-        
-        return "\n\n---\n\n".join(contexts)
+        else:
+            contexts = []
+            for hit in hits:
+                distance_info = f" (relevance: {hit.relevance:.2f})" if hit.relevance is not None else ""
+                contexts.append(
+                    f"Document: {hit.title} ({hit.filename}){distance_info}\n"
+                    f"Content: {hit.content}"
+                )
+            text = "\n\n---\n\n".join(contexts)
+
+        return text
     
+    async def warm_up(self):
+        """Nothing to do, the threaded client connects in `__init__`"""
+        return None
+
     def close(self):
-        """Close the Weaviate client connection"""
+        """Return the Weaviate client to the pool, the connection itself stays warm"""
         if self.client:
             try:
-                self.client.close()
-                logger.info(f"Closed Weaviate connection for tenant: {self.tenant_id}")
+                self.pool.release(self.client)
+                logger.info(f"Released Weaviate connection for tenant: {self.tenant_id}")
             except Exception as e:
-                logger.error(f"Error closing Weaviate client: {e}")
+                logger.error(f"Error releasing Weaviate client: {e}")
+            finally:
+                self.client = None
     
     def __del__(self):
-        """Cleanup on object deletion"""
+        """Release a client that was never closed; relying on this is a leak, see `rag_client_stats`"""
+        if getattr(self, "client", None) is not None:
+            _rag_lifecycle["released_by_gc"] += 1
+            logger.warning(f"WeaviateRAG for tenant {self.tenant_id} was not closed, released by garbage collection")
         self.close()
 
-def get_user_data(file_path="src/data/user_data.csv"):
+class AsyncWeaviateRAG(WeaviateRAG):
     """
-    Load user data from CSV into a pandas DataFrame.
+    Fully async Weaviate RAG client built on the Weaviate async client.
+
+    Searches run on the event loop instead of the default thread pool, collection
+    existence is cached per tenant, and concurrency is bounded by a shared
+    `SearchLimiter` so latency stays flat as the number of sessions grows.
     """
 
-    try:
-        # Get the current file directory and read from there
-        df = pd.read_csv(file_path, dtype=str)
-        # Make sure 'id' is str
-        df['id'] = df['id'].astype(str)
-    except FileNotFoundError:
-        logger.error(f"File {file_path} not found")
-        return pd.DataFrame()
-    except Exception as e:
-        logger.error(f"Error loading user data: {e}")
-        return pd.DataFrame()
-    
-    return df
+    # Collection existence per tenant: tenant_id -> (exists, checked_at)
+    _collection_exists: ClassVar[Dict[str, Tuple[bool, float]]] = {}
+
+    def __init__(
+        self,
+        tenant_id: str,
+        pool: Optional[AsyncWeaviateClientPool] = None,
+        cache: Optional[RetrievalCache] = None,
+        limiter: Optional[SearchLimiter] = None,
+    ):
+        """
+        Initialize the async RAG client, the connection is opened on first search.
+
+        Args:
+            tenant_id: Unique identifier for the tenant
+            pool: Async client pool, defaults to the process-wide pool
+            cache: Result cache, defaults to the process-wide cache
+            limiter: Concurrency limiter, defaults to the process-wide limiter
+        """
+        self.limiter = limiter if limiter is not None else get_search_limiter()
+        super().__init__(
+            tenant_id,
+            pool=pool if pool is not None else get_async_client_pool(),
+            cache=cache,
+        )
+
+    def _initialize_client(self):
+        # Async clients must connect on the event loop, see `_ainitialize_client`
+        self.pool._cluster_config(self.tenant_id)
+
+    async def _ainitialize_client(self):
+        try:
+            client = await self.pool.aacquire(self.tenant_id)
+            if self.client is not None:
+                # A concurrent search initialized the client first
+                self.pool.release_nowait(client)
+                return
+            self.client = client
+        except Exception as e:
+            logger.error(f"Failed to initialize Weaviate async client: {e}")
+            raise
+
+    async def warm_up(self):
+        """Connect and check the tenant's collection ahead of the first search, e.g. during call setup"""
+        if not self.client:
+            await self._ainitialize_client()
+        await self._collection_ready()
+
+    async def retrieve_context(self, query: str, limit: int = 3) -> str:
+        if not self.client:
+            try:
+                await self._ainitialize_client()
+            except Exception:
+                return ""
+        return await super().retrieve_context(query, limit)
+
+    async def _remote_search(self, query: str, limit: int):
+        try:
+            return await self.limiter.run(lambda: self._search(query, limit))
+        except weaviate.exceptions.WeaviateConnectionError as e:
+            logger.warning(f"Weaviate connection lost, reconnecting: {e}")
+            self.pool.ainvalidate(self.client)
+            await self.pool.arelease(self.client)
+            self.client = None
+            await self._ainitialize_client()
+            return await self.limiter.run(lambda: self._search(query, limit))
+
+    async def _collection_ready(self) -> bool:
+        """Check collection existence, caching the answer per tenant"""
+        cached = self._collection_exists.get(self.tenant_id)
+        if cached is not None:
+            # Re-check missing collections sooner, the first ingestion creates them
+            ttl = RAG_COLLECTION_EXISTS_TTL if cached[0] else min(RAG_COLLECTION_EXISTS_TTL, 10.0)
+            if time.monotonic() - cached[1] < ttl:
+                return cached[0]
+
+        exists = await self.client.collections.exists(self.collection_name)
+        self._collection_exists[self.tenant_id] = (exists, time.monotonic())
+        return exists
+
+    async def _search(self, query: str, limit: int):
+        """Run the existence check and vector search natively on the event loop"""
+        if RAG_CLIENT_EMBEDDING:
+            exists, vector = await asyncio.gather(self._collection_ready(), self.embedder.embed(query))
+        else:
+            exists, vector = await self._collection_ready(), None
+
+        if not exists:
+            logger.warning(f"Collection {self.collection_name} does not exist for tenant {self.tenant_id}")
+            return None
+
+        collection = self.client.collections.get(self.collection_name)
+        if vector is not None:
+            return await collection.query.near_vector(
+                near_vector=vector,
+                limit=limit,
+                return_metadata=MetadataQuery(distance=True)
+            )
+        return await collection.query.near_text(
+            query=query,
+            limit=limit,
+            return_metadata=MetadataQuery(distance=True)
+        )
+
+    async def aclose(self):
+        """Return the async client to the pool"""
+        if self.client:
+            try:
+                await self.pool.arelease(self.client)
+                logger.info(f"Released Weaviate async connection for tenant: {self.tenant_id}")
+            except Exception as e:
+                logger.error(f"Error releasing Weaviate async client: {e}")
+            finally:
+                self.client = None
+
+    def close(self):
+        """Drop the pool reference without awaiting, prefer `aclose` on the event loop"""
+        if self.client:
+            self.pool.release_nowait(self.client)
+            self.client = None
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rag_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Must match the vectorizer of the `Documents_{tenant_id}` collections
+RAG_EMBEDDING_MODEL = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
+# Embed queries in the worker and search with near_vector instead of near_text
+RAG_CLIENT_EMBEDDING = os.getenv("RAG_CLIENT_EMBEDDING", "false").lower() == "true"
+RAG_EMBEDDING_CACHE_PATH = os.getenv(
+    "RAG_EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3"
+)
+RAG_EMBEDDING_BATCH_SIZE = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "256"))
+
+# Hot entries are also kept in memory to skip SQLite entirely
+_MEMORY_ENTRIES = 2048
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model, normalized text).
+
+    Backed by a single SQLite file in WAL mode, so every worker process on a host
+    shares it and cached phrasings survive restarts and deploys.
+    """
+
+    def __init__(self, path: str = RAG_EMBEDDING_CACHE_PATH):
+        """
+        Args:
+            path: SQLite file location, created on first use
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Lookups run in worker threads, the in-memory tier has its own lock so hits never wait on SQLite
+        self._memory_lock = threading.Lock()
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: tuple, vector: np.ndarray):
+        with self._memory_lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > _MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Look up normalized texts, returning only the ones that are cached; blocks on SQLite, call from a thread"""
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+        with self._memory_lock:
+            for text in texts:
+                vector = self._memory.get((model, text))
+                if vector is not None:
+                    self._memory.move_to_end((model, text))
+                    found[text] = vector
+                else:
+                    missing.append(text)
+
+        if missing:
+            with self._lock:
+                placeholders = ",".join("?" * len(missing))
+                rows = (
+                    self._connection()
+                    .execute(
+                        f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({placeholders})",
+                        [model, *missing],
+                    )
+                    .fetchall()
+                )
+            for text, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember((model, text), vector)
+                found[text] = vector
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]):
+        """Store embeddings for normalized texts; blocks on SQLite, call from a thread"""
+        now = time.time()
+        for text, vector in vectors.items():
+            self._remember((model, text), vector)
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector, created) VALUES (?, ?, ?, ?)",
+                [
+                    (model, text, vector.astype(np.float32).tobytes(), now)
+                    for text, vector in vectors.items()
+                ],
+            )
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class QueryEmbedder:
+    """
+    Embeds search queries on the client with the same OpenAI model Weaviate uses
+    to vectorize documents, so vectors can be cached, compared locally and sent
+    to Weaviate with `near_vector`.
+    """
+
+    def __init__(
+        self,
+        model: str = RAG_EMBEDDING_MODEL,
+        client=None,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = RAG_EMBEDDING_BATCH_SIZE,
+    ):
+        """
+        Args:
+            model: OpenAI embedding model name
+            client: Optional `openai.AsyncOpenAI` instance, created on first use otherwise
+            cache: Persistent embedding cache, pass None to always call the API
+            batch_size: Maximum texts per embeddings request
+        """
+        self.model = model
+        self._client = client
+        self.cache = cache
+        self.batch_size = batch_size
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"cache_hits": 0, "embedded": 0, "requests": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+
+            self._client = openai.AsyncOpenAI()
+        return self._client
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Embed several queries with as few API requests as possible.
+
+        Texts are normalized first; cached ones never reach the API, identical
+        texts already being embedded are awaited rather than requested again, and
+        the rest go out in batches of `batch_size`.
+        """
+        keys = [normalize_query(text) or text for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        if self.cache is not None:
+            try:
+                # SQLite can wait up to its busy timeout while other workers write, keep it off the loop
+                vectors.update(
+                    await asyncio.to_thread(
+                        self.cache.get_many, self.model, list(dict.fromkeys(keys))
+                    )
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+            self.stats["cache_hits"] += sum(1 for key in keys if key in vectors)
+
+        waiting = {
+            key: self._inflight[key]
+            for key in keys
+            if key not in vectors and key in self._inflight
+        }
+        to_embed = [
+            key
+            for key in dict.fromkeys(keys)
+            if key not in vectors and key not in waiting
+        ]
+
+        if to_embed:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_embed}
+            self._inflight.update(futures)
+            try:
+                embedded = await self._request(to_embed)
+                for key, future in futures.items():
+                    future.set_result(embedded[key])
+                vectors.update(embedded)
+                if self.cache is not None:
+                    try:
+                        await asyncio.to_thread(
+                            self.cache.put_many, self.model, embedded
+                        )
+                    except sqlite3.Error as e:
+                        logger.warning(f"Could not persist query embeddings: {e}")
+            except BaseException as e:
+                for future in futures.values():
+                    if future.done():
+                        continue
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+                        future.exception()
+                raise
+            finally:
+                for key in to_embed:
+                    self._inflight.pop(key, None)
+
+        for key, future in waiting.items():
+            vectors[key] = await asyncio.shield(future)
+
+        return [vectors[key].tolist() for key in keys]
+
+    async def _request(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        embedded: Dict[str, np.ndarray] = {}
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i : i + self.batch_size]
+            response = await self.client.embeddings.create(
+                model=self.model, input=batch
+            )
+            self.stats["requests"] += 1
+            for item in response.data:
+                embedded[batch[item.index]] = np.asarray(
+                    item.embedding, dtype=np.float32
+                )
+        self.stats["embedded"] += len(texts)
+        return embedded
+
+
+_query_embedder: Optional[QueryEmbedder] = None
+
+
+def get_query_embedder() -> QueryEmbedder:
+    """Return the worker process' shared query embedder"""
+    global _query_embedder
+    if _query_embedder is None:
+        cache = EmbeddingCache() if RAG_EMBEDDING_CACHE_PATH else None
+        _query_embedder = QueryEmbedder(cache=cache)
+    return _query_embedder
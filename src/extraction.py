@@ -0,0 +1,201 @@
+import atexit
+import csv
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Worker processes parsing PDFs and DOCX files, shared by every upload in the process
+EXTRACTION_WORKERS = int(
+    os.getenv("EXTRACTION_WORKERS", str(max((os.cpu_count() or 2) - 1, 1)))
+)
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "16"))
+# Page batches of one file parsed ahead of the chunker, bounding memory per upload
+EXTRACTION_MAX_INFLIGHT = int(os.getenv("EXTRACTION_MAX_INFLIGHT", "4"))
+CSV_ROWS_PER_PIECE = 50
+
+TEXT_EXTENSIONS = (".txt", ".md")
+SUPPORTED_EXTENSIONS = (*TEXT_EXTENSIONS, ".pdf", ".docx", ".csv")
+
+_READ_BLOCK_SIZE = 64 * 1024
+
+
+def read_text_stream(path: Path, block_size: int = _READ_BLOCK_SIZE) -> Iterator[str]:
+    """Read a text file in blocks so large files never sit in memory whole"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def read_csv_stream(
+    path: Path, rows_per_piece: int = CSV_ROWS_PER_PIECE
+) -> Iterator[str]:
+    """
+    Render CSV rows as `column: value` lines, e.g. for price lists.
+
+    Each row becomes its own paragraph, so the chunker never splits a row.
+    """
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        reader = csv.DictReader(f)
+        lines: List[str] = []
+        for row in reader:
+            fields = [
+                f"{key}: {value}"
+                for key, value in row.items()
+                if key and value not in (None, "")
+            ]
+            if fields:
+                lines.append("; ".join(fields))
+            if len(lines) >= rows_per_piece:
+                yield "\n\n".join(lines) + "\n\n"
+                lines = []
+        if lines:
+            yield "\n\n".join(lines) + "\n\n"
+
+
+# Runs in the pool workers; keeps the last opened PDF so consecutive page
+# batches of the same file do not re-parse its cross-reference table.
+# Thread-local because PdfReader is not thread-safe when a thread pool is passed in.
+_open_pdf = threading.local()
+
+
+def _pdf_reader(path: str, mtime: float):
+    from pypdf import PdfReader
+
+    key = f"{path}:{mtime}"
+    if getattr(_open_pdf, "key", None) != key:
+        _open_pdf.reader = PdfReader(path)
+        _open_pdf.key = key
+    return _open_pdf.reader
+
+
+def _pdf_page_count(path: str) -> int:
+    return len(_pdf_reader(path, os.path.getmtime(path)).pages)
+
+
+def _extract_pdf_pages(path: str, mtime: float, start: int, end: int) -> str:
+    reader = _pdf_reader(path, mtime)
+    pages = []
+    for number in range(start, end):
+        text = (reader.pages[number].extract_text() or "").strip()
+        if text:
+            pages.append(text)
+    return "\n\n".join(pages) + "\n\n" if pages else ""
+
+
+def _extract_docx(path: str) -> str:
+    import docx
+
+    document = docx.Document(path)
+    blocks = [p.text.strip() for p in document.paragraphs if p.text.strip()]
+    for table in document.tables:
+        for row in table.rows:
+            cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if cells:
+                blocks.append(" | ".join(cells))
+    return "\n\n".join(blocks)
+
+
+def ordered_map(
+    executor: Executor,
+    fn: Callable[..., str],
+    tasks: Iterable[Tuple],
+    max_inflight: int,
+) -> Iterator[str]:
+    """
+    Run tasks on an executor and yield their results in submission order.
+
+    At most `max_inflight` tasks are pending at once, so a long document is
+    parsed only slightly ahead of the consumer and other uploads sharing the
+    executor get their turn between batches.
+    """
+    pending: Deque = deque()
+    try:
+        for args in tasks:
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= max_inflight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Return the process' shared extraction pool, started on first use"""
+    global _extraction_pool
+    if _extraction_pool is None:
+        # Spawned rather than forked, so workers never inherit client threads or sockets
+        _extraction_pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        atexit.register(_extraction_pool.shutdown, cancel_futures=True)
+    return _extraction_pool
+
+
+def extract_pieces(
+    path: Path,
+    executor: Optional[Executor] = None,
+    pages_per_task: int = EXTRACTION_PAGES_PER_TASK,
+    max_inflight: int = EXTRACTION_MAX_INFLIGHT,
+) -> Iterator[str]:
+    """
+    Stream a document's text in order, ready for `chunking.chunk_stream`.
+
+    Plain text and CSV are read in-process block by block. PDFs are parsed in
+    page batches and DOCX files as a whole in the extraction pool, so parsing
+    uses every core without blocking the caller.
+
+    Args:
+        path: Document to extract
+        executor: Pool to parse in, the shared extraction pool if omitted
+        pages_per_task: PDF pages parsed per task
+        max_inflight: PDF page batches parsed ahead of the consumer
+
+    Yields:
+        Text pieces in document order
+
+    Raises:
+        ValueError: If the file type is not supported
+        ImportError: If the optional parser for the file type is not installed
+    """
+    suffix = path.suffix.lower()
+    if suffix in TEXT_EXTENSIONS:
+        yield from read_text_stream(path)
+    elif suffix == ".csv":
+        yield from read_csv_stream(path)
+    elif suffix == ".pdf":
+        import pypdf  # noqa: F401 - fail here rather than inside a worker
+
+        executor = executor or get_extraction_pool()
+        name = str(path)
+        mtime = os.path.getmtime(name)
+        page_count = executor.submit(_pdf_page_count, name).result()
+        tasks = (
+            (name, mtime, start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        )
+        for text in ordered_map(executor, _extract_pdf_pages, tasks, max_inflight):
+            if text:
+                yield text
+    elif suffix == ".docx":
+        import docx  # noqa: F401 - fail here rather than inside a worker
+
+        executor = executor or get_extraction_pool()
+        yield executor.submit(_extract_docx, str(path)).result()
+    else:
+        raise ValueError(f"Unsupported file type: {path.suffix}")
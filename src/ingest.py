@@ -1,76 +1,379 @@
-import weaviate
-import openai
-from pathlib import Path
+import argparse
+import hashlib
 import json
+import logging
 import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from weaviate.classes.config import Configure, DataType, Property
+from weaviate.classes.query import Filter
+from weaviate.util import generate_uuid5
+
+from chunking import INGEST_CHUNK_OVERLAP_TOKENS, INGEST_CHUNK_TOKENS, chunk_stream
+from db_utils import AsyncWeaviateRAG, get_client_pool
+from extraction import SUPPORTED_EXTENSIONS, extract_pieces
+from rag_cache import get_retrieval_cache, touch_invalidation_marker
+
+logger = logging.getLogger(__name__)
 
-# TODO: Future enhancement - Support additional document types (.pdf, .docx, .csv)
-# TODO: This script is deprecated. Use the NextJS API endpoint at /api/ingest instead
-# TODO: Migrate this to use Weaviate v4 client API
+# 0 keeps Weaviate's dynamic batching, a positive value switches to fixed-size
+# batches sent with that many concurrent requests
+INGEST_CONCURRENT_REQUESTS = int(os.getenv("INGEST_CONCURRENT_REQUESTS", "0"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+# Per-tenant record of ingested chunks, used to skip unchanged content on re-ingestion
+INGEST_MANIFEST_DIR = os.getenv("INGEST_MANIFEST_DIR", ".cache/ingest_manifests")
+_READ_BLOCK_SIZE = 64 * 1024
 
-def ingest_documents(documents_path: str, tenant_id: str):
+
+def ensure_collection(client, tenant_id: str):
     """
-    DEPRECATED: Use NextJS /api/ingest endpoint instead.
-    
-    Ingest documents into Weaviate. Create one collection for each tenant.
-    Use openAI text-embedding-3-small for the vectorizer.
+    Get or create the tenant's collection.
+
+    Uses the same `Documents_{tenant_id}` schema as the Next.js `/api/ingest` route:
+    text2vec-openai with text-embedding-3-small over content, title, filename and metadata.
     """
-    client = weaviate.Client(
-        url=os.getenv("WEAVIATE_URL"),
-        auth_client_secret=weaviate.AuthApiKey(api_key=os.getenv("WEAVIATE_API_KEY")),
-        additional_headers={
-            "X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY")
-        }
-    )
-    
-    # Create schema if not exists
-    schema = {
-        "class": "Document",
-        "description": "A document for RAG",
-        "vectorizer": "text2vec-openai",
-        "moduleConfig": {
-            "text2vec-openai": {
-                "model": "text-embedding-3-small",
-                "dimensions": 1536
-            }
-        },
-        "properties": [
-            {
-                "name": "content",
-                "dataType": ["text"],
-                "description": "Document content"
-            },
-            {
-                "name": "title", 
-                "dataType": ["string"],
-                "description": "Document title"
-            },
-            {
-                "name": "metadata",
-                "dataType": ["text"],
-                "description": "Additional metadata"
-            }
-        ]
-    }
-    
-    # Create class if not exists
-    if not client.schema.exists("Document"):
-        client.schema.create_class(schema)
-    
-    # Ingest documents
-    for doc_path in Path(documents_path).glob("*.txt"):
-        with open(doc_path, 'r') as f:
-            content = f.read()
-        
-        client.data_object.create(
-            data_object={
-                "content": content,
-                "title": doc_path.stem,
-                "metadata": f"source: {doc_path.name}"
+    collection_name = f"Documents_{tenant_id}"
+    if not client.collections.exists(collection_name):
+        client.collections.create(
+            name=collection_name,
+            vectorizer_config=Configure.Vectorizer.text2vec_openai(model="text-embedding-3-small"),
+            properties=[
+                Property(name="content", data_type=DataType.TEXT, description="Document content"),
+                Property(name="title", data_type=DataType.TEXT, description="Document title or heading"),
+                Property(name="filename", data_type=DataType.TEXT, description="Original filename"),
+                Property(name="metadata", data_type=DataType.TEXT, description="Additional metadata as JSON string"),
+            ],
+        )
+        logger.info(f"Created collection: {collection_name}")
+    return client.collections.get(collection_name)
+
+
+def iter_documents(documents_path: str) -> Iterator[Tuple[Path, str]]:
+    """
+    Supported files under a directory (recursively) or a single file.
+
+    Yields:
+        File paths with their source name, the path relative to `documents_path`
+    """
+    root = Path(documents_path)
+    if root.is_file():
+        paths, base = [root], root.parent
+    else:
+        paths, base = sorted(p for p in root.rglob("*") if p.is_file()), root
+    for path in paths:
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            yield path, path.relative_to(base).as_posix()
+        else:
+            logger.warning(f"Skipping unsupported file type: {path.name}")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_uuid(tenant_id: str, source: str, index: int) -> str:
+    """Deterministic object UUID, so re-ingesting a chunk overwrites it instead of duplicating it"""
+    return generate_uuid5(f"{source}#{index}", tenant_id)
+
+
+class IngestManifest:
+    """
+    Per-tenant record of what has been written to `Documents_{tenant_id}`.
+
+    Maps each source file to its file hash and the UUID and content hash of
+    every chunk, so re-ingestion can skip unchanged files, write only new or
+    changed chunks and delete chunks that no longer exist. If the manifest file
+    is missing it is rebuilt from the `hash` stored in each object's metadata.
+    """
+
+    def __init__(self, tenant_id: str, base_dir: str = INGEST_MANIFEST_DIR):
+        """
+        Args:
+            tenant_id: Unique identifier for the tenant
+            base_dir: Directory holding one `<tenant_id>.json` manifest per tenant
+        """
+        self.tenant_id = tenant_id
+        self.path = Path(base_dir) / f"{tenant_id}.json"
+        self.chunking: Optional[Dict[str, int]] = None
+        self.files: Dict[str, Dict] = {}
+
+    def load(self) -> bool:
+        """Read the manifest from disk, returning False if there is none"""
+        try:
+            data = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ingest manifest for tenant {self.tenant_id}: {e}")
+            return False
+        self.chunking = data.get("chunking")
+        self.files = data.get("files", {})
+        return True
+
+    def rebuild(self, collection):
+        """Reconstruct chunk hashes from the objects already in the collection"""
+        self.files = {}
+        for obj in collection.iterator(return_properties=["filename", "metadata"]):
+            try:
+                metadata = json.loads(obj.properties.get("metadata") or "{}")
+            except ValueError:
+                continue
+            if not isinstance(metadata, dict) or "hash" not in metadata:
+                # Uploaded by the Next.js route, not tracked here
+                continue
+            source = metadata.get("source") or obj.properties.get("filename")
+            entry = self.files.setdefault(source, {"sha256": None, "chunks": {}})
+            entry["chunks"][str(obj.uuid)] = metadata["hash"]
+        logger.info(f"Rebuilt ingest manifest for tenant {self.tenant_id} from {len(self.files)} files")
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        tmp.write_text(json.dumps({"tenant_id": self.tenant_id, "chunking": self.chunking, "files": self.files}))
+        os.replace(tmp, self.path)
+
+
+def _document_chunks(
+    tenant_id: str, path: Path, source: str, chunk_tokens: int, overlap_tokens: int
+) -> Iterator[Dict]:
+    uploaded_at = datetime.now(timezone.utc).isoformat()
+    for index, chunk in enumerate(chunk_stream(extract_pieces(path), chunk_tokens, overlap_tokens)):
+        digest = content_hash(chunk)
+        yield {
+            "uuid": chunk_uuid(tenant_id, source, index),
+            "hash": digest,
+            "properties": {
+                "content": chunk,
+                "title": path.stem,
+                "filename": path.name,
+                "metadata": json.dumps({"uploadedAt": uploaded_at, "source": source, "chunk": index, "hash": digest}),
             },
-            class_name="Document"
+        }
+
+
+def _batch(collection, concurrent_requests: int, batch_size: int):
+    if concurrent_requests > 0:
+        return collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests)
+    return collection.batch.dynamic()
+
+
+def write_objects(
+    collection,
+    objects: Iterator[Dict],
+    concurrent_requests: int = INGEST_CONCURRENT_REQUESTS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    max_retries: int = INGEST_MAX_RETRIES,
+) -> Tuple[int, Set[str]]:
+    """
+    Stream objects into a collection with the v4 batch API, retrying failures.
+
+    Args:
+        collection: Target Weaviate collection
+        objects: Dicts with `properties` and optional `uuid`
+        concurrent_requests: 0 for dynamic batching, otherwise concurrent fixed-size batches
+        batch_size: Objects per request for fixed-size batching
+        max_retries: Retry rounds for objects Weaviate rejected
+
+    Returns:
+        Number of objects written and the UUIDs of objects that still failed
+    """
+    written = 0
+    with _batch(collection, concurrent_requests, batch_size) as batch:
+        for obj in objects:
+            batch.add_object(properties=obj["properties"], uuid=obj.get("uuid"))
+            written += 1
+    failed = list(collection.batch.failed_objects)
+
+    for attempt in range(1, max_retries + 1):
+        if not failed:
+            break
+        delay = 2 ** (attempt - 1)
+        logger.warning(f"Retrying {len(failed)} failed objects in {delay}s (attempt {attempt}/{max_retries})")
+        time.sleep(delay)
+        with _batch(collection, concurrent_requests, batch_size) as batch:
+            for error in failed:
+                batch.add_object(properties=error.object_.properties, uuid=error.object_.uuid)
+        failed = list(collection.batch.failed_objects)
+
+    for error in failed[:10]:
+        logger.error(f"Failed to ingest object {error.object_.uuid}: {error.message}")
+    return written - len(failed), {str(error.object_.uuid) for error in failed}
+
+
+def delete_objects(collection, uuids: List[str], batch_size: int = 100) -> int:
+    """Delete objects by UUID, returning how many were removed"""
+    deleted = 0
+    for i in range(0, len(uuids), batch_size):
+        result = collection.data.delete_many(where=Filter.by_id().contains_any(uuids[i:i + batch_size]))
+        deleted += result.successful
+    return deleted
+
+
+def invalidate_tenant(tenant_id: str):
+    """Drop cached retrieval results for the tenant in this and other worker processes"""
+    get_retrieval_cache().invalidate(tenant_id)
+    AsyncWeaviateRAG._collection_exists.pop(tenant_id, None)
+    touch_invalidation_marker(tenant_id)
+
+
+def ingest_documents(
+    documents_path: str,
+    tenant_id: str,
+    chunk_tokens: int = INGEST_CHUNK_TOKENS,
+    overlap_tokens: int = INGEST_CHUNK_OVERLAP_TOKENS,
+    concurrent_requests: int = INGEST_CONCURRENT_REQUESTS,
+    max_retries: int = INGEST_MAX_RETRIES,
+    prune: bool = True,
+    rebuild_manifest: bool = False,
+    manifest_dir: str = INGEST_MANIFEST_DIR,
+    client=None,
+) -> Dict[str, int]:
+    """
+    Ingest documents into the tenant's Weaviate collection.
+
+    Files are streamed, split into overlapping chunks and written through the
+    batch API. Ingestion is incremental and idempotent: every chunk has a
+    deterministic UUID and a content hash recorded in the tenant's manifest, so
+    only new or changed chunks are vectorized and written, and chunks that no
+    longer exist are deleted.
+
+    Args:
+        documents_path: Directory (searched recursively) or single file
+        tenant_id: Unique identifier for the tenant
+        chunk_tokens: Target chunk size in tokens
+        overlap_tokens: Tokens shared between consecutive chunks
+        concurrent_requests: 0 for dynamic batching, otherwise concurrent fixed-size batches
+        max_retries: Retry rounds for objects Weaviate rejected
+        prune: When ingesting a directory, delete chunks of files no longer in it
+        rebuild_manifest: Rebuild the manifest from the collection instead of trusting the local file
+        manifest_dir: Directory holding the per-tenant manifests
+        client: Connected Weaviate client, borrowed from the pool if omitted
+
+    Returns:
+        Counts of files, written, unchanged, deleted and failed chunks
+    """
+    start = time.perf_counter()
+    pool = get_client_pool() if client is None else None
+    if pool is not None:
+        client = pool.acquire(tenant_id)
+
+    chunking = {"chunk_tokens": chunk_tokens, "overlap_tokens": overlap_tokens}
+    stats = {"files": 0, "written": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+    try:
+        collection = ensure_collection(client, tenant_id)
+        manifest = IngestManifest(tenant_id, manifest_dir)
+        if rebuild_manifest or not manifest.load():
+            manifest.rebuild(collection)
+        if manifest.chunking is not None and manifest.chunking != chunking:
+            # Chunk boundaries moved, so stored hashes say nothing about the new chunks
+            for entry in manifest.files.values():
+                entry["sha256"] = None
+        manifest.chunking = chunking
+
+        seen: Dict[str, Dict] = {}
+        stale: List[str] = []
+
+        def objects() -> Iterator[Dict]:
+            for path, source in iter_documents(documents_path):
+                stats["files"] += 1
+                previous = manifest.files.get(source, {"sha256": None, "chunks": {}})
+                sha256 = file_hash(path)
+                if previous["sha256"] == sha256:
+                    seen[source] = previous
+                    stats["unchanged"] += len(previous["chunks"])
+                    continue
+
+                chunks: Dict[str, str] = {}
+                try:
+                    for obj in _document_chunks(tenant_id, path, source, chunk_tokens, overlap_tokens):
+                        chunks[obj["uuid"]] = obj["hash"]
+                        if previous["chunks"].get(obj["uuid"]) == obj["hash"]:
+                            stats["unchanged"] += 1
+                        else:
+                            yield obj
+                except ImportError as e:
+                    logger.warning(f"Skipping {source}, install the `documents` extra to ingest it: {e}")
+                    seen[source] = previous
+                    continue
+                except Exception as e:
+                    logger.error(f"Failed to extract {source}: {e}")
+                    seen[source] = previous
+                    continue
+                stale.extend(u for u in previous["chunks"] if u not in chunks)
+                seen[source] = {"sha256": sha256, "chunks": chunks}
+
+        written, failed = write_objects(
+            collection, objects(), concurrent_requests=concurrent_requests, max_retries=max_retries
         )
-        print(f"Ingested: {doc_path.name}")
+        stats["written"], stats["failed"] = written, len(failed)
+
+        if prune and Path(documents_path).is_dir():
+            for source in manifest.files.keys() - seen.keys():
+                stale.extend(manifest.files[source]["chunks"])
+                del manifest.files[source]
+        if stale:
+            stats["deleted"] = delete_objects(collection, stale)
+
+        for source, entry in seen.items():
+            if failed & entry["chunks"].keys():
+                # Forget failed chunks so the next run writes them again
+                entry = {"sha256": None, "chunks": {u: h for u, h in entry["chunks"].items() if u not in failed}}
+            manifest.files[source] = entry
+        manifest.save()
+    finally:
+        if pool is not None:
+            pool.release(client)
+
+    if stats["written"] or stats["deleted"]:
+        invalidate_tenant(tenant_id)
+    logger.info(
+        f"Ingested {stats['files']} files for tenant {tenant_id}: {stats['written']} chunks written, "
+        f"{stats['unchanged']} unchanged, {stats['deleted']} deleted, {stats['failed']} failed "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest documents into a tenant's Weaviate collection")
+    parser.add_argument("documents_path", help="Directory or file to ingest")
+    parser.add_argument("tenant_id", help="Tenant identifier, documents go to Documents_{tenant_id}")
+    parser.add_argument("--chunk-tokens", type=int, default=INGEST_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=INGEST_CHUNK_OVERLAP_TOKENS)
+    parser.add_argument("--concurrent-requests", type=int, default=INGEST_CONCURRENT_REQUESTS)
+    parser.add_argument("--max-retries", type=int, default=INGEST_MAX_RETRIES)
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks of files missing from the directory")
+    parser.add_argument("--rebuild-manifest", action="store_true", help="Rebuild the manifest from Weaviate first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    stats = ingest_documents(
+        args.documents_path,
+        args.tenant_id,
+        chunk_tokens=args.chunk_tokens,
+        overlap_tokens=args.overlap_tokens,
+        concurrent_requests=args.concurrent_requests,
+        max_retries=args.max_retries,
+        prune=not args.no_prune,
+        rebuild_manifest=args.rebuild_manifest,
+    )
+    print(json.dumps(stats))
+
 
 if __name__ == "__main__":
-    ingest_documents("./documents")
+    from dotenv import load_dotenv
+
+    load_dotenv(".env.local")
+    main()
@@ -0,0 +1,372 @@
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from caller_directory import normalize_phone
+
+logger = logging.getLogger(__name__)
+
+INVOICE_LEDGER_PATH = os.getenv("INVOICE_LEDGER_PATH", "src/data/invoices.sqlite3")
+INVOICE_IMPORT_BATCH_SIZE = int(os.getenv("INVOICE_IMPORT_BATCH_SIZE", "50000"))
+
+INVOICE_STATUSES = ("pending", "paid", "overdue", "cancelled")
+OUTSTANDING_STATUSES = ("pending", "overdue")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_id TEXT PRIMARY KEY,
+    customer_id TEXT,
+    phone TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    due_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    description TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    invoice_id TEXT NOT NULL REFERENCES invoices(invoice_id),
+    amount_cents INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_payments_invoice ON payments(invoice_id);
+"""
+
+_INVOICE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_invoices_phone_status ON invoices(phone, status)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_status_due ON invoices(status, due_date)",
+)
+
+_INVOICE_COLUMNS = "invoice_id, customer_id, phone, amount_cents, due_date, status, description, updated_at"
+
+
+def _to_cents(amount) -> int:
+    return round(float(amount) * 100)
+
+
+def _invoice(row: Tuple) -> Dict:
+    (
+        invoice_id,
+        customer_id,
+        phone,
+        amount_cents,
+        due_date,
+        status,
+        description,
+        updated_at,
+    ) = row
+    if status == "pending" and due_date < date.today().isoformat():
+        status = "overdue"
+    return {
+        "invoice_id": invoice_id,
+        "customer_id": customer_id,
+        "phone": phone,
+        "amount": amount_cents / 100,
+        "due_date": due_date,
+        "status": status,
+        "description": description,
+        "updated_at": updated_at,
+    }
+
+
+class InvoiceLedger:
+    """
+    Local SQLite ledger of invoices and payments.
+
+    One process-wide reader and one writer connection share the database file
+    in WAL mode, so lookups never wait for writes. Lookups go through indexes
+    on (phone, status) and (status, due_date) and are fast enough to
+    run on the event loop; writes have `a`-prefixed variants that run in a
+    thread.
+    """
+
+    def __init__(self, path: str = INVOICE_LEDGER_PATH):
+        """
+        Args:
+            path: SQLite file location, created with the schema on first use
+        """
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        for statement in _INVOICE_INDEXES:
+            self._writer.execute(statement)
+        self._writer.commit()
+        self._reader = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")
+        return conn
+
+    def close(self):
+        with self._write_lock, self._read_lock:
+            self._writer.close()
+            self._reader.close()
+
+    # Reads
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def get(self, invoice_id: str) -> Optional[Dict]:
+        rows = self._query(
+            f"SELECT {_INVOICE_COLUMNS} FROM invoices WHERE invoice_id = ?",
+            (invoice_id,),
+        )
+        return _invoice(rows[0]) if rows else None
+
+    def outstanding_for_phone(self, phone: str) -> List[Dict]:
+        """Pending and overdue invoices of a caller, oldest due date first"""
+        rows = self._query(
+            f"SELECT {_INVOICE_COLUMNS} FROM invoices WHERE phone = ? AND status IN (?, ?) ORDER BY due_date",
+            (normalize_phone(phone), *OUTSTANDING_STATUSES),
+        )
+        return [_invoice(row) for row in rows]
+
+    def overdue_by_phone(self, as_of: str) -> List[Tuple[str, int, str, int]]:
+        """
+        Outstanding invoices due before `as_of` (ISO date), grouped per caller.
+
+        Returns:
+            (phone, total amount in cents, oldest due date, invoice count) tuples
+        """
+        return self._query(
+            "SELECT phone, SUM(amount_cents), MIN(due_date), COUNT(*) FROM invoices "
+            "WHERE status IN (?, ?) AND due_date < ? GROUP BY phone",
+            (*OUTSTANDING_STATUSES, as_of),
+        )
+
+    # Writes
+
+    def update_status(self, invoice_id: str, new_status: str) -> Optional[str]:
+        """
+        Set an invoice's status.
+
+        Returns:
+            The previous status, or None if the invoice does not exist
+
+        Raises:
+            ValueError: If `new_status` is not a valid status
+        """
+        if new_status not in INVOICE_STATUSES:
+            raise ValueError(
+                f"Invalid status. Must be one of: {list(INVOICE_STATUSES)}"
+            )
+        with self._write_lock:
+            row = self._writer.execute(
+                "SELECT status FROM invoices WHERE invoice_id = ?", (invoice_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._writer.execute(
+                "UPDATE invoices SET status = ?, updated_at = ? WHERE invoice_id = ?",
+                (new_status, datetime.now().isoformat(), invoice_id),
+            )
+            self._writer.commit()
+        return row[0]
+
+    def record_payment(
+        self, invoice_id: str, amount: float, method: str
+    ) -> Optional[Dict]:
+        """
+        Record a payment and mark the invoice paid once it is covered.
+
+        Only pending and overdue invoices accept payments, up to their remaining balance.
+
+        Returns:
+            Payment details with the remaining balance, a dict with an `error` if the
+            payment was refused, or None if the invoice does not exist
+        """
+        now = datetime.now()
+        payment_id = f"PAY-{now.strftime('%Y%m%d%H%M%S%f')}"
+        cents = _to_cents(amount)
+        with self._write_lock:
+            row = self._writer.execute(
+                "SELECT amount_cents, status FROM invoices WHERE invoice_id = ?",
+                (invoice_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            total, status = row
+            if status not in OUTSTANDING_STATUSES:
+                return {
+                    "error": f"Invoice is {status}, only pending or overdue invoices accept payments",
+                    "invoice_id": invoice_id,
+                    "status": status,
+                }
+            (paid,) = self._writer.execute(
+                "SELECT COALESCE(SUM(amount_cents), 0) FROM payments WHERE invoice_id = ?",
+                (invoice_id,),
+            ).fetchone()
+            balance = max(total - paid, 0)
+            if cents > balance:
+                return {
+                    "error": "Payment exceeds the remaining balance",
+                    "invoice_id": invoice_id,
+                    "balance": balance / 100,
+                }
+            paid += cents
+            status = "paid" if paid >= total else status
+            self._writer.execute(
+                "INSERT INTO payments (payment_id, invoice_id, amount_cents, method, created_at) VALUES (?, ?, ?, ?, ?)",
+                (payment_id, invoice_id, cents, method, now.isoformat()),
+            )
+            self._writer.execute(
+                "UPDATE invoices SET status = ?, updated_at = ? WHERE invoice_id = ?",
+                (status, now.isoformat(), invoice_id),
+            )
+            self._writer.commit()
+        return {
+            "payment_id": payment_id,
+            "invoice_id": invoice_id,
+            "amount": cents / 100,
+            "method": method,
+            "status": status,
+            "balance": (total - paid) / 100,
+            "timestamp": now.isoformat(),
+        }
+
+    async def aupdate_status(self, invoice_id: str, new_status: str) -> Optional[str]:
+        return await asyncio.to_thread(self.update_status, invoice_id, new_status)
+
+    async def arecord_payment(
+        self, invoice_id: str, amount: float, method: str
+    ) -> Optional[Dict]:
+        return await asyncio.to_thread(self.record_payment, invoice_id, amount, method)
+
+    # Bulk import
+
+    def import_csv(
+        self,
+        csv_path: str,
+        replace: bool = False,
+        batch_size: int = INVOICE_IMPORT_BATCH_SIZE,
+    ) -> int:
+        """
+        Load an invoice export into the ledger in one transaction.
+
+        Expects `invoice_id`, `phone_number`, `amount`, `due_date` and `status`
+        columns, with optional `customer_id` and `description`. Rows are
+        upserted by invoice_id. With `replace`, invoices missing from the export
+        are removed and the indexes are rebuilt after loading, which is much
+        faster for a full nightly export. Readers keep seeing the previous data
+        until the import commits.
+
+        Returns:
+            Number of imported rows
+        """
+        start = time.perf_counter()
+        imported = 0
+        with self._write_lock:
+            conn = self._writer
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if replace:
+                    for name in (
+                        "idx_invoices_phone_status",
+                        "idx_invoices_status_due",
+                    ):
+                        conn.execute(f"DROP INDEX IF EXISTS {name}")
+                    conn.execute("DELETE FROM invoices")
+                for batch in self._read_export(csv_path, batch_size):
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO invoices ({_INVOICE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                    imported += len(batch)
+                if replace:
+                    conn.execute(
+                        "DELETE FROM payments WHERE invoice_id NOT IN (SELECT invoice_id FROM invoices)"
+                    )
+                for statement in _INVOICE_INDEXES:
+                    conn.execute(statement)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        logger.info(
+            f"Imported {imported} invoices from {csv_path} in {time.perf_counter() - start:.1f}s"
+        )
+        return imported
+
+    @staticmethod
+    def _read_export(csv_path: str, batch_size: int) -> Iterator[List[Tuple]]:
+        now = datetime.now().isoformat()
+        with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            batch: List[Tuple] = []
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    status = (row.get("status") or "pending").strip().lower()
+                    batch.append(
+                        (
+                            row["invoice_id"].strip(),
+                            (row.get("customer_id") or "").strip() or None,
+                            normalize_phone(row["phone_number"]),
+                            _to_cents(row["amount"]),
+                            row["due_date"].strip()[:10],
+                            status if status in INVOICE_STATUSES else "pending",
+                            row.get("description"),
+                            now,
+                        )
+                    )
+                except (KeyError, ValueError, AttributeError) as e:
+                    logger.warning(
+                        f"Skipping invalid invoice row {line} in {csv_path}: {e}"
+                    )
+                    continue
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+
+_invoice_ledger: Optional[InvoiceLedger] = None
+
+
+def get_invoice_ledger() -> InvoiceLedger:
+    """Return the worker process' invoice ledger, opening it on first use"""
+    global _invoice_ledger
+    if _invoice_ledger is None:
+        _invoice_ledger = InvoiceLedger()
+    return _invoice_ledger
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Import an invoice export into the local ledger"
+    )
+    parser.add_argument("csv_path", help="Invoice export CSV")
+    parser.add_argument(
+        "--ledger", default=INVOICE_LEDGER_PATH, help="SQLite ledger file"
+    )
+    parser.add_argument(
+        "--replace", action="store_true", help="Replace all invoices with the export"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    ledger = InvoiceLedger(args.ledger)
+    try:
+        print(ledger.import_csv(args.csv_path, replace=args.replace))
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
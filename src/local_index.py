@@ -0,0 +1,376 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from weaviate.classes.query import MetadataQuery
+
+logger = logging.getLogger(__name__)
+
+RAG_LOCAL_INDEX = os.getenv("RAG_LOCAL_INDEX", "false").lower() == "true"
+RAG_LOCAL_INDEX_DIR = os.getenv("RAG_LOCAL_INDEX_DIR", ".cache/local_index")
+RAG_LOCAL_INDEX_MAX_OBJECTS = int(os.getenv("RAG_LOCAL_INDEX_MAX_OBJECTS", "50000"))
+RAG_LOCAL_INDEX_MAX_STALENESS = float(os.getenv("RAG_LOCAL_INDEX_MAX_STALENESS", "300"))
+RAG_LOCAL_INDEX_QUANTIZE = (
+    os.getenv("RAG_LOCAL_INDEX_QUANTIZE", "false").lower() == "true"
+)
+
+# Above this many rows the dot product is moved off the event loop
+_INLINE_SEARCH_ROWS = 2000
+
+
+class _LocalMetadata:
+    def __init__(self, distance: float):
+        self.distance = distance
+
+
+class _LocalObject:
+    """Search hit shaped like a Weaviate query object so `_format_results` can render it"""
+
+    def __init__(self, uuid: str, properties: Dict[str, Any], distance: float):
+        self.uuid = uuid
+        self.properties = properties
+        self.metadata = _LocalMetadata(distance)
+
+
+class _LocalResponse:
+    def __init__(self, objects: List[_LocalObject]):
+        self.objects = objects
+
+
+def _object_vector(obj) -> Optional[List[float]]:
+    """Extract the collection's (single, default) vector from a Weaviate object"""
+    vector = obj.vector
+    if isinstance(vector, dict):
+        vector = vector.get("default") or next(iter(vector.values()), None)
+    return vector
+
+
+class LocalVectorIndex:
+    """
+    In-process mirror of a tenant's `Documents_{tenant_id}` collection.
+
+    Vectors live in a memory-mapped `.npy` file per tenant, so every worker
+    process on a host shares the same pages, and a search is a single vectorized
+    dot product instead of a network round trip. The mirror syncs incrementally
+    from Weaviate by object UUID and last update time; callers fall back to the
+    remote search whenever `is_usable()` is False.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        base_dir: str = RAG_LOCAL_INDEX_DIR,
+        max_objects: int = RAG_LOCAL_INDEX_MAX_OBJECTS,
+        max_staleness: float = RAG_LOCAL_INDEX_MAX_STALENESS,
+        quantize: bool = RAG_LOCAL_INDEX_QUANTIZE,
+    ):
+        """
+        Args:
+            tenant_id: Unique identifier for the tenant
+            base_dir: Directory holding one sub-directory per tenant
+            max_objects: Collections larger than this are not mirrored
+            max_staleness: Seconds after the last sync before the mirror is considered stale
+            quantize: Store vectors as int8 with a per-row scale (4x smaller, slightly less exact)
+        """
+        self.tenant_id = tenant_id
+        self.collection_name = f"Documents_{tenant_id}"
+        self.dir = Path(base_dir) / tenant_id
+        self.max_objects = max_objects
+        self.max_staleness = max_staleness
+        self.quantize = quantize
+
+        self.too_large = False
+        self.last_sync_attempt = 0.0
+        self._meta_mtime = 0.0
+        self._meta: Optional[Dict[str, Any]] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._sync_lock = threading.Lock()
+        self._load()
+
+    @property
+    def size(self) -> int:
+        return len(self._meta["uuids"]) if self._meta else 0
+
+    def _load(self):
+        """Map the latest synced version from disk, if any"""
+        meta_path = self.dir / "meta.json"
+        try:
+            self._meta_mtime = meta_path.stat().st_mtime
+            meta = json.loads(meta_path.read_text())
+            vectors = np.load(self.dir / meta["vectors_file"], mmap_mode="r")
+            scales = (
+                np.load(self.dir / meta["scales_file"], mmap_mode="r")
+                if meta.get("scales_file")
+                else None
+            )
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(
+                f"Ignoring unreadable local index for tenant {self.tenant_id}: {e}"
+            )
+            return
+        self._meta, self._vectors, self._scales = meta, vectors, scales
+
+    def reload_if_changed(self):
+        """
+        Pick up a sync done by another worker process.
+
+        Parses meta.json, which holds every object's properties, so call it off the event loop.
+        """
+        try:
+            mtime = (self.dir / "meta.json").stat().st_mtime
+        except OSError:
+            return
+        if mtime != self._meta_mtime:
+            self._load()
+
+    def is_usable(self) -> bool:
+        """True if the mirror is populated, recent enough and within the size limit; never touches disk"""
+        if self.too_large or self._meta is None or self._vectors is None:
+            return False
+        return time.time() - self._meta["synced_at"] <= self.max_staleness
+
+    def sync_due(self) -> bool:
+        """True if a background sync should start, refreshing well before the mirror goes stale"""
+        if self._sync_lock.locked():
+            return False
+        synced_at = self._meta["synced_at"] if self._meta else 0.0
+        interval = self.max_staleness / 2
+        now = time.time()
+        return now - synced_at > interval and now - self.last_sync_attempt > interval
+
+    def search(self, query_vector: List[float], limit: int = 3) -> _LocalResponse:
+        """
+        Cosine search over the mirrored vectors.
+
+        Args:
+            query_vector: Query embedding from the collection's embedding model
+            limit: Maximum number of results to return
+
+        Returns:
+            Response object with `.objects` in Weaviate's shape, best match first
+        """
+        if not self.size:
+            return _LocalResponse([])
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = (
+            self._vectors @ query
+            if self._scales is None
+            else (self._vectors @ query) * self._scales
+        )
+        limit = min(limit, scores.shape[0])
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        objects = [
+            _LocalObject(
+                self._meta["uuids"][i],
+                self._meta["properties"][i],
+                float(1.0 - scores[i]),
+            )
+            for i in top
+        ]
+        return _LocalResponse(objects)
+
+    def needs_thread(self) -> bool:
+        """Whether a search is large enough to run off the event loop"""
+        return self.size > _INLINE_SEARCH_ROWS
+
+    def sync(self, client) -> bool:
+        """
+        Bring the mirror up to date with Weaviate.
+
+        Only objects whose UUID is new or whose last update time changed are
+        fetched with their vectors; deleted objects are dropped.
+
+        Args:
+            client: Connected synchronous `weaviate.WeaviateClient`
+
+        Returns:
+            True if the mirror is usable after syncing
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            # Another job in this process is already syncing the tenant
+            return self.is_usable()
+        self.last_sync_attempt = time.time()
+        try:
+            return self._sync(client)
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self, client) -> bool:
+        start = time.perf_counter()
+        # Diff against the newest version on disk, another worker may have synced meanwhile
+        self.reload_if_changed()
+        if not client.collections.exists(self.collection_name):
+            return False
+        collection = client.collections.get(self.collection_name)
+
+        # Pass 1: list UUIDs and update times only
+        remote: Dict[str, int] = {}
+        for obj in collection.iterator(
+            return_metadata=MetadataQuery(last_update_time=True),
+            return_properties=["filename"],
+        ):
+            remote[str(obj.uuid)] = int(
+                obj.metadata.last_update_time.timestamp() * 1000
+            )
+            if len(remote) > self.max_objects:
+                self.too_large = True
+                logger.info(
+                    f"Collection {self.collection_name} exceeds {self.max_objects} objects, using remote search"
+                )
+                return False
+        self.too_large = False
+
+        old = self._meta or {"uuids": [], "updated": [], "properties": []}
+        old_rows = {u: i for i, u in enumerate(old["uuids"])}
+        changed = [
+            u
+            for u, ts in remote.items()
+            if u not in old_rows or old["updated"][old_rows[u]] != ts
+        ]
+        removed = len(old_rows.keys() - remote.keys())
+
+        if not changed and not removed and self._meta is not None:
+            self._touch_synced_at()
+            return True
+
+        # Pass 2: fetch vectors and properties of new or changed objects only
+        fetched: Dict[str, Any] = {}
+        for i in range(0, len(changed), 100):
+            batch = [uuid.UUID(u) for u in changed[i : i + 100]]
+            response = collection.query.fetch_objects_by_ids(
+                batch, include_vector=True, limit=len(batch)
+            )
+            for obj in response.objects:
+                fetched[str(obj.uuid)] = obj
+
+        uuids, updated, properties, rows = [], [], [], []
+        for u, ts in remote.items():
+            if u in fetched:
+                obj = fetched[u]
+                vector = _object_vector(obj)
+                if vector is None:
+                    continue
+                rows.append(np.asarray(vector, dtype=np.float32))
+                properties.append(
+                    {
+                        k: v
+                        for k, v in obj.properties.items()
+                        if isinstance(v, (str, int, float))
+                    }
+                )
+            elif u in old_rows:
+                i = old_rows[u]
+                row = np.asarray(self._vectors[i], dtype=np.float32)
+                if self._scales is not None:
+                    row = row * float(self._scales[i])
+                rows.append(row)
+                properties.append(old["properties"][i])
+            else:
+                continue
+            uuids.append(u)
+            updated.append(ts)
+
+        self._write(uuids, updated, properties, rows)
+        logger.info(
+            f"Synced local index for tenant {self.tenant_id}: {len(uuids)} objects, "
+            f"{len(changed)} changed, {removed} removed in {time.perf_counter() - start:.2f}s"
+        )
+        return self.is_usable()
+
+    def _write(
+        self,
+        uuids: List[str],
+        updated: List[int],
+        properties: List[Dict[str, Any]],
+        rows: List[np.ndarray],
+    ):
+        """Write a new version and atomically point meta.json at it"""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        version = f"{int(time.time() * 1000)}-{os.getpid()}"
+
+        matrix = np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+
+        scales_file = None
+        if self.quantize and matrix.size:
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            matrix = np.round(matrix / scales[:, None]).astype(np.int8)
+            scales_file = f"scales-{version}.npy"
+            np.save(self.dir / scales_file, scales.astype(np.float32))
+
+        vectors_file = f"vectors-{version}.npy"
+        np.save(
+            self.dir / vectors_file,
+            matrix.astype(np.int8 if scales_file else np.float32),
+        )
+
+        meta = {
+            "tenant_id": self.tenant_id,
+            "vectors_file": vectors_file,
+            "scales_file": scales_file,
+            "uuids": uuids,
+            "updated": updated,
+            "properties": properties,
+            "synced_at": time.time(),
+        }
+        tmp = self.dir / f"meta.json.{version}"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.dir / "meta.json")
+
+        previous = self._meta
+        self._load()
+        if previous:
+            # Unlinking is safe even while other processes still have the old file mapped
+            for name in (previous["vectors_file"], previous.get("scales_file")):
+                if name:
+                    (self.dir / name).unlink(missing_ok=True)
+
+    def _touch_synced_at(self):
+        """Mark the current version as fresh, unless another worker has written a newer one"""
+        meta_path = self.dir / "meta.json"
+        try:
+            on_disk = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            on_disk = None
+        if (
+            on_disk is not None
+            and on_disk["vectors_file"] != self._meta["vectors_file"]
+        ):
+            self._load()
+            return
+        meta = on_disk or self._meta
+        meta["synced_at"] = time.time()
+        tmp = self.dir / f"meta.json.{os.getpid()}"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, meta_path)
+        self._meta, self._meta_mtime = meta, meta_path.stat().st_mtime
+
+
+_local_indexes: Dict[str, LocalVectorIndex] = {}
+
+
+def get_local_index(tenant_id: str) -> LocalVectorIndex:
+    """Return the worker process' mirror of a tenant's collection"""
+    index = _local_indexes.get(tenant_id)
+    if index is None:
+        index = _local_indexes[tenant_id] = LocalVectorIndex(tenant_id)
+    return index
@@ -0,0 +1,459 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from livekit.agents import mcp
+from livekit.agents.llm import function_tool
+from livekit.agents.llm.tool_context import get_raw_function_info
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+from tool_deadlines import NO_RETRY_FALLBACK, run_with_deadline, tool_timeout
+
+logger = logging.getLogger(__name__)
+
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL")
+# Seconds cached tool schemas are served without revalidating them against the server
+MCP_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "300"))
+# Schemas are persisted here so every job process of the worker shares them; empty keeps them in memory only
+MCP_TOOLS_CACHE_DIR = os.getenv("MCP_TOOLS_CACHE_DIR", ".cache/mcp_tools")
+# Seconds an idle pooled connection to the MCP server is kept open
+MCP_KEEPALIVE_EXPIRY = float(os.getenv("MCP_KEEPALIVE_EXPIRY", "60"))
+
+
+def tool_fingerprint(tools: List[Dict[str, Any]]) -> str:
+    """Validator of a tool listing, the MCP equivalent of an ETag"""
+    return hashlib.sha256(
+        json.dumps(tools, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class ToolSchemaCache:
+    """
+    Tool schemas per MCP server URL, with TTL-based revalidation.
+
+    A fresh entry is served as is. A stale entry is still served, so the call
+    never waits on the server, and is revalidated once the connection is up:
+    an unchanged fingerprint only renews it, a changed one replaces it.
+    """
+
+    def __init__(
+        self, ttl: float = MCP_TOOLS_TTL, cache_dir: str = MCP_TOOLS_CACHE_DIR
+    ):
+        """
+        Args:
+            ttl: Seconds an entry is served without revalidation
+            cache_dir: Directory entries are persisted to, empty for memory only
+        """
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "changed": 0,
+            "saved_ms": 0.0,
+        }
+
+    def _path(self, url: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:16]}.json"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for a server, from memory or the cache directory"""
+        with self._lock:
+            entry = self._entries.get(url)
+        path = self._path(url)
+        # Another job process may have revalidated since this one loaded the entry
+        if (
+            path is not None
+            and path.exists()
+            and (entry is None or path.stat().st_mtime > entry["fetched_at"])
+        ):
+            try:
+                entry = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable MCP tool cache {path}: {e}")
+                return entry
+            with self._lock:
+                self._entries[url] = entry
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    def record_hit(self, url: str, entry: Dict[str, Any]) -> bool:
+        """Count a listing served from the cache; returns whether the entry is fresh"""
+        fresh = self.is_fresh(entry)
+        with self._lock:
+            self._stats["hits" if fresh else "stale_hits"] += 1
+            self._stats["saved_ms"] += entry["list_ms"]
+        logger.info(
+            f"MCP tools for {url} served from cache ({time.time() - entry['fetched_at']:.0f}s old), "
+            f"saved ~{entry['list_ms']:.0f}ms"
+        )
+        return fresh
+
+    def store(
+        self,
+        url: str,
+        tools: List[Dict[str, Any]],
+        list_ms: float,
+        revalidation: bool = False,
+    ) -> bool:
+        """
+        Cache a tool listing.
+
+        Args:
+            url: MCP server URL
+            tools: Tool schemas with name, description, inputSchema and meta
+            list_ms: Time the uncached connect and listing took
+            revalidation: Whether this listing revalidates an entry that was served
+
+        Returns:
+            Whether the schemas differ from the cached ones
+        """
+        fingerprint = tool_fingerprint(tools)
+        previous = self.get(url)
+        changed = previous is None or previous["fingerprint"] != fingerprint
+        entry = {
+            "url": url,
+            "fingerprint": fingerprint,
+            "fetched_at": time.time(),
+            "list_ms": list_ms,
+            "tools": tools,
+        }
+        with self._lock:
+            self._entries[url] = entry
+            if revalidation:
+                self._stats["changed" if changed else "revalidated"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        path = self._path(url)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(entry))
+            tmp.replace(path)
+        return changed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+
+class _BorrowedClient:
+    """Hands a pooled client to the MCP transports without closing it when they exit"""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self._client = client
+
+    async def __aenter__(self) -> httpx.AsyncClient:
+        return self._client
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+# Keep-alive clients per server URL, each bound to the event loop that created it
+_http_clients: Dict[
+    Tuple[str, Tuple], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]
+] = {}
+
+
+def pooled_http_client(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[httpx.Timeout] = None,
+    auth: Optional[httpx.Auth] = None,
+) -> _BorrowedClient:
+    """`httpx_client_factory` for the MCP transports that reuses one client per server and event loop"""
+    loop = asyncio.get_running_loop()
+    key = (url, tuple(sorted((headers or {}).items())))
+    pooled = _http_clients.get(key)
+    if pooled is None or pooled[0] is not loop or pooled[1].is_closed:
+        client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout or httpx.Timeout(30.0),
+            auth=auth,
+            follow_redirects=True,
+            limits=httpx.Limits(keepalive_expiry=MCP_KEEPALIVE_EXPIRY),
+        )
+        _http_clients[key] = pooled = (loop, client)
+    return _BorrowedClient(pooled[1])
+
+
+async def close_http_clients():
+    """Close the pooled clients of the running event loop"""
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, client) in list(_http_clients.items()):
+        if client_loop is loop:
+            del _http_clients[key]
+            await client.aclose()
+
+
+class PooledMCPServerHTTP(mcp.MCPServerHTTP):
+    """
+    `MCPServerHTTP` that serves tool schemas from the worker's `ToolSchemaCache`.
+
+    With cached schemas the session gets its tools without connecting; the
+    connection is opened in the background (revalidating stale schemas) and
+    awaited by the first tool call. HTTP connections come from a keep-alive
+    pool shared by every session on the same event loop.
+
+    The MCP transports run in anyio task groups, which have to be exited by
+    the task that entered them, so one connection task opens the session,
+    holds it while it is in use and closes it on `aclose`.
+    """
+
+    def __init__(self, url: str, cache: Optional["ToolSchemaCache"] = None, **kwargs):
+        super().__init__(url, **kwargs)
+        self._schema_cache = cache or get_tool_schema_cache()
+        self._connect_task: Optional[asyncio.Task] = None
+        self._connected: Optional[asyncio.Future] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._revalidate_task: Optional[asyncio.Task] = None
+        self._connect_ms = 0.0
+
+    @property
+    def initialized(self) -> bool:
+        # Cached schemas let the session list tools before the connection is up
+        return self._client is not None or self._schema_cache.get(self.url) is not None
+
+    def client_streams(self):
+        factory = lambda **kwargs: pooled_http_client(self.url, **kwargs)  # noqa: E731
+        if self._use_streamable_http:
+            return streamablehttp_client(
+                url=self.url,
+                headers=self.headers,
+                timeout=self._timeout,
+                sse_read_timeout=self._sse_read_timeout,
+                httpx_client_factory=factory,
+            )
+        return sse_client(
+            url=self.url,
+            headers=self.headers,
+            timeout=self._timeout,
+            sse_read_timeout=self._sse_read_timeout,
+            httpx_client_factory=factory,
+        )
+
+    async def _open(self) -> None:
+        start = time.perf_counter()
+        await super().initialize()
+        self._connect_ms = (time.perf_counter() - start) * 1000
+
+    async def initialize(self) -> None:
+        await self.connect()
+
+    async def _hold_connection(
+        self, connected: asyncio.Future, closing: asyncio.Event
+    ) -> None:
+        """Open the session, keep it open until `closing` is set and close it, all in this task"""
+        try:
+            try:
+                await self._open()
+            except Exception as e:
+                connected.set_exception(e)
+                return
+            connected.set_result(None)
+            await closing.wait()
+        finally:
+            if not connected.done():
+                connected.cancel()
+            await super().aclose()
+
+    async def connect(self) -> None:
+        """Open the MCP session if it is not open yet; concurrent callers share one attempt"""
+        if self._client is not None:
+            return
+        if self._connect_task is None:
+            self._connected = asyncio.get_running_loop().create_future()
+            self._closing = asyncio.Event()
+            self._connect_task = asyncio.create_task(
+                self._hold_connection(self._connected, self._closing)
+            )
+        connected = self._connected
+        try:
+            await asyncio.shield(connected)
+        finally:
+            failed = connected.done() and (
+                connected.cancelled() or connected.exception() is not None
+            )
+            if failed and self._connected is connected:
+                # Let the next tool call try again
+                self._connect_task = self._connected = self._closing = None
+
+    async def _fetch_schemas(self) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        result = await self._client.list_tools()
+        list_ms = self._connect_ms + (time.perf_counter() - start) * 1000
+        tools = [
+            {
+                "name": t.name,
+                "description": t.description,
+                "inputSchema": t.inputSchema,
+                "meta": t.meta,
+            }
+            for t in result.tools
+        ]
+        return tools, list_ms
+
+    def _build_tools(self, tools: List[Dict[str, Any]]) -> List[mcp.MCPTool]:
+        return [
+            self._make_function_tool(
+                t["name"], t["description"], t["inputSchema"], t["meta"]
+            )
+            for t in tools
+        ]
+
+    async def _revalidate(self, stale: bool):
+        try:
+            await self.connect()
+            if not stale:
+                return
+            tools, list_ms = await self._fetch_schemas()
+            if self._schema_cache.store(self.url, tools, list_ms, revalidation=True):
+                logger.info(
+                    f"MCP tools for {self.url} changed, new schemas apply from the next session"
+                )
+        except Exception as e:
+            logger.warning(f"Background connect to MCP server {self.url} failed: {e}")
+
+    async def list_tools(self) -> List[mcp.MCPTool]:
+        if not self._cache_dirty and self._lk_tools is not None:
+            return self._lk_tools
+
+        entry = self._schema_cache.get(self.url)
+        if entry is not None and (
+            self._client is None or self._schema_cache.is_fresh(entry)
+        ):
+            fresh = self._schema_cache.record_hit(self.url, entry)
+            if self._client is None:
+                self._revalidate_task = asyncio.create_task(
+                    self._revalidate(stale=not fresh)
+                )
+            tools = entry["tools"]
+        else:
+            await self.connect()
+            tools, list_ms = await self._fetch_schemas()
+            self._schema_cache.store(self.url, tools, list_ms)
+
+        self._lk_tools = self._build_tools(tools)
+        self._cache_dirty = False
+        return self._lk_tools
+
+    def _make_function_tool(self, name, description, input_schema, meta) -> mcp.MCPTool:
+        tool = super()._make_function_tool(name, description, input_schema, meta)
+
+        async def call(raw_arguments: Dict[str, Any]) -> Any:
+            await self.connect()
+            return await tool(raw_arguments)
+
+        async def _tool_called(raw_arguments: Dict[str, Any]) -> Any:
+            # MCP tools may write (calendar and booking inserts), a cancelled call is never retried
+            return await run_with_deadline(
+                name,
+                lambda: call(raw_arguments),
+                tool_timeout(name),
+                NO_RETRY_FALLBACK,
+            )
+
+        return function_tool(
+            _tool_called, raw_schema=get_raw_function_info(tool).raw_schema
+        )
+
+    async def aclose(self) -> None:
+        task = self._connect_task
+        if task is None or task is asyncio.current_task():
+            # Never connected, or a failed open cleaning up in the connection task
+            await super().aclose()
+            return
+        if self._revalidate_task is not None and not self._revalidate_task.done():
+            self._revalidate_task.cancel()
+        if self._connected.done():
+            self._closing.set()
+        else:
+            task.cancel()
+        self._connect_task = self._connected = self._closing = None
+        # The connection task closes the session itself
+        await asyncio.gather(task, return_exceptions=True)
+
+
+_tool_schema_cache: Optional[ToolSchemaCache] = None
+_servers: Dict[str, Tuple[asyncio.AbstractEventLoop, PooledMCPServerHTTP]] = {}
+
+
+def get_tool_schema_cache() -> ToolSchemaCache:
+    """Return the worker process' shared tool schema cache"""
+    global _tool_schema_cache
+    if _tool_schema_cache is None:
+        _tool_schema_cache = ToolSchemaCache()
+    return _tool_schema_cache
+
+
+def get_mcp_server(url: str) -> PooledMCPServerHTTP:
+    """
+    Return the process' MCP server for a URL, shared by every session on the running event loop.
+
+    Agent handoffs and later sessions in the same job reuse its open MCP session and tools.
+    """
+    loop = asyncio.get_running_loop()
+    shared = _servers.get(url)
+    if shared is None or shared[0] is not loop:
+        _servers[url] = shared = (loop, PooledMCPServerHTTP(url))
+    return shared[1]
+
+
+async def _list_once(url: str, cache: ToolSchemaCache):
+    server = PooledMCPServerHTTP(url, cache=cache)
+    try:
+        await server.initialize()
+        tools, list_ms = await server._fetch_schemas()
+        cache.store(url, tools, list_ms)
+    finally:
+        await server.aclose()
+        await close_http_clients()
+
+
+def prefetch_tool_schemas(
+    url: Optional[str] = MCP_SERVER_URL, timeout: float = 5.0
+) -> Optional[ToolSchemaCache]:
+    """
+    Fill the schema cache for a server before a job starts, e.g. in `prewarm`.
+
+    Runs on a throwaway event loop, since the job's loop does not exist yet;
+    does nothing if the cached schemas are still fresh.
+    """
+    if not url:
+        return None
+    cache = get_tool_schema_cache()
+    entry = cache.get(url)
+    if entry is not None and cache.is_fresh(entry):
+        return cache
+
+    async def fetch():
+        await asyncio.wait_for(_list_once(url, cache), timeout)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(fetch())
+    else:
+        # Called from inside a loop (thread job executor), list on a loop of its own
+        thread = threading.Thread(target=asyncio.run, args=(fetch(),), daemon=True)
+        thread.start()
+        thread.join(timeout + 1)
+    return cache
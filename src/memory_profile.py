@@ -0,0 +1,242 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from db_utils import rag_client_stats
+
+logger = logging.getLogger(__name__)
+
+# Trace allocations per job and log them per component at start, per turn and at shutdown.
+# Costs CPU and memory while on; for investigating RSS growth, not for regular traffic
+AGENT_MEMORY_PROFILE = os.getenv("AGENT_MEMORY_PROFILE", "false").lower() == "true"
+# Stack frames kept per allocation; more frames attribute allocations better but cost more
+AGENT_MEMORY_PROFILE_FRAMES = int(os.getenv("AGENT_MEMORY_PROFILE_FRAMES", "12"))
+# Job process RSS above which a warning is logged, 0 disables; checked per turn, also without profiling
+AGENT_JOB_MEMORY_BUDGET_MB = float(os.getenv("AGENT_JOB_MEMORY_BUDGET_MB", "0"))
+
+# Component -> path fragments of the code allocating for it. The most recent frame
+# of an allocation matching a fragment decides, so libraries attribute before the
+# modules calling them.
+COMPONENTS = {
+    "caller_data": ("/caller_directory.py", "/invoice_ledger.py", "/pandas/"),
+    "weaviate": ("/db_utils.py", "/weaviate/", "/grpc/"),
+    "rag": (
+        "/rag_cache.py",
+        "/prefetch.py",
+        "/context_packer.py",
+        "/embeddings.py",
+        "/local_index.py",
+    ),
+    "mcp": ("/mcp_pool.py", "/mcp/"),
+    "avatar": ("/livekit/plugins/bey/",),
+    "noise_cancellation": ("/livekit/plugins/noise_cancellation/",),
+    "model": ("/livekit/plugins/openai/", "/openai/", "/livekit/plugins/"),
+    "phrases": ("/phrase_cache.py",),
+    "metrics": ("/turn_metrics.py", "/prometheus_client/"),
+    "session": ("/livekit/agents/", "/livekit/rtc/"),
+}
+# Consecutive growing turn snapshots after which a component is flagged as leaking
+GROWTH_TURNS = 3
+
+
+@functools.lru_cache(maxsize=4096)
+def _file_component(filename: str) -> Optional[str]:
+    filename = filename.replace("\\", "/")
+    for component, fragments in COMPONENTS.items():
+        if any(fragment in filename for fragment in fragments):
+            return component
+    return None
+
+
+def component_of(frames: Sequence) -> str:
+    """Component of an allocation, from its traceback frames (oldest first)"""
+    for frame in reversed(frames):
+        component = _file_component(frame.filename)
+        if component is not None:
+            return component
+    return "other"
+
+
+def rss_mb() -> float:
+    import psutil
+
+    return psutil.Process().memory_info().rss / 2**20
+
+
+class JobMemoryProfiler:
+    """
+    Memory of one job: process RSS against a budget and, in profiling mode,
+    traced allocations per component.
+
+    Snapshots are taken at start, after every agent turn and at shutdown.
+    At shutdown, components that grew over the last turns and RAG clients
+    that were never closed are reported as leaks.
+    """
+
+    def __init__(
+        self,
+        profile: bool = AGENT_MEMORY_PROFILE,
+        budget_mb: float = AGENT_JOB_MEMORY_BUDGET_MB,
+        frames: int = AGENT_MEMORY_PROFILE_FRAMES,
+        rss: Callable[[], float] = rss_mb,
+    ):
+        """
+        Args:
+            profile: Trace allocations with tracemalloc
+            budget_mb: RSS above which a warning is logged, 0 disables
+            frames: Stack frames kept per traced allocation
+            rss: Returns the job's resident memory in MB
+        """
+        self.profile = profile
+        self.budget_mb = budget_mb
+        self.frames = frames
+        self._rss = rss
+        self.snapshots: List[Dict] = []
+        self.turns = 0
+        self._over_budget = False
+        self._started_tracing = False
+        self._rag_gc_at_start = 0
+        # Profiled snapshots run one at a time off the event loop, in turn order
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.profile or self.budget_mb > 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self.profile and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._rag_gc_at_start = rag_client_stats()["released_by_gc"]
+        self.snapshot("start")
+
+    def _by_component(self) -> Dict[str, float]:
+        sizes: Dict[str, float] = {}
+        for stat in tracemalloc.take_snapshot().statistics("traceback"):
+            component = component_of(stat.traceback)
+            sizes[component] = sizes.get(component, 0.0) + stat.size / 2**20
+        return sizes
+
+    def snapshot(self, label: str) -> Dict:
+        """Record RSS, and traced memory per component in profiling mode, and check the budget"""
+        started = time.perf_counter()
+        snapshot: Dict = {"label": label, "rss_mb": self._rss()}
+        if self.profile and tracemalloc.is_tracing():
+            snapshot["components_mb"] = self._by_component()
+        self.snapshots.append(snapshot)
+
+        if "components_mb" in snapshot:
+            start = self.snapshots[0].get("components_mb", {})
+            growth = {
+                name: size - start.get(name, 0.0)
+                for name, size in snapshot["components_mb"].items()
+            }
+            top = sorted(growth.items(), key=lambda item: -abs(item[1]))[:5]
+            logger.info(
+                f"Job memory at {label}: RSS {snapshot['rss_mb']:.0f}MB, growth since start "
+                + ", ".join(f"{name} {mb:+.2f}MB" for name, mb in top)
+                + f" (snapshot took {(time.perf_counter() - started) * 1000:.0f}ms)"
+            )
+        self._check_budget(snapshot)
+        return snapshot
+
+    def _check_budget(self, snapshot: Dict):
+        if not self.budget_mb:
+            return
+        over = snapshot["rss_mb"] > self.budget_mb
+        if over and not self._over_budget:
+            largest = ""
+            if "components_mb" in snapshot:
+                top = sorted(
+                    snapshot["components_mb"].items(), key=lambda item: -item[1]
+                )[:3]
+                largest = ", largest traced: " + ", ".join(
+                    f"{name} {mb:.1f}MB" for name, mb in top
+                )
+            logger.warning(
+                f"Job memory over budget at {snapshot['label']}: RSS {snapshot['rss_mb']:.0f}MB "
+                f"> {self.budget_mb:.0f}MB{largest}"
+            )
+        self._over_budget = over
+
+    def watch_session(self, session):
+        """Snapshot after every agent turn, when the agent goes back to listening"""
+        if not self.enabled:
+            return
+
+        def on_agent_state_changed(ev):
+            if ev.old_state == "speaking" and ev.new_state == "listening":
+                self.turns += 1
+                label = f"turn {self.turns}"
+                if not self.profile:
+                    self.snapshot(label)
+                    return
+                # Attributing a traced snapshot takes a fraction of a second, keep it off the event loop
+                self._run_in_executor(label)
+
+        session.on("agent_state_changed", on_agent_state_changed)
+
+    def _run_in_executor(self, label: str) -> asyncio.Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="memory_profile"
+            )
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, self.snapshot, label
+        )
+
+    def growing_components(self, turns: int = GROWTH_TURNS) -> List[str]:
+        """Components whose traced memory grew in each of the last `turns` turn snapshots"""
+        series = [
+            s["components_mb"]
+            for s in self.snapshots
+            if s["label"].startswith("turn") and "components_mb" in s
+        ]
+        if len(series) < turns + 1:
+            return []
+        recent = series[-(turns + 1) :]
+        return sorted(
+            name
+            for name in recent[-1]
+            if all(
+                later.get(name, 0.0) > earlier.get(name, 0.0)
+                for earlier, later in zip(recent, recent[1:])
+            )
+        )
+
+    def leaks(self) -> Dict:
+        """Suspected leaks: growing components, open and garbage-collected RAG clients"""
+        rag = rag_client_stats()
+        return {
+            "growing_components": self.growing_components(),
+            "open_rag_clients": rag["open"],
+            "rag_clients_released_by_gc": rag["released_by_gc"] - self._rag_gc_at_start,
+        }
+
+    async def shutdown(self, reason: str = ""):
+        """Final snapshot and leak report, as a job shutdown callback"""
+        if not self.enabled:
+            return
+        if self.profile:
+            await self._run_in_executor("shutdown")
+            self._executor.shutdown()
+            self._executor = None
+        else:
+            self.snapshot("shutdown")
+        leaks = self.leaks()
+        if any(leaks.values()):
+            logger.warning(
+                f"Job memory leak suspects after {self.turns} turns: {leaks}"
+            )
+        else:
+            logger.info(f"Job memory after {self.turns} turns: no leak suspects")
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
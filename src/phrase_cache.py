@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from livekit import rtc
+
+logger = logging.getLogger(__name__)
+
+PHRASE_CACHE_ENABLED = os.getenv("PHRASE_CACHE_ENABLED", "true").lower() == "true"
+# Raw PCM per (tenant, voice, text); fill it at deploy time with `python src/phrase_cache.py`
+PHRASE_CACHE_DIR = os.getenv("PHRASE_CACHE_DIR", ".cache/phrases")
+# Speech model the cached phrases are synthesized with; entries of another model are re-synthesized
+PHRASE_TTS_MODEL = os.getenv("PHRASE_TTS_MODEL", "gpt-4o-mini-tts")
+PHRASE_FRAME_MS = 20
+_MAX_MEMORY_ENTRIES = 64
+
+SynthesizeFn = Callable[[str, str], Awaitable[Tuple[bytes, int, int]]]
+
+
+class CachedPhrase:
+    """Synthesized 16-bit PCM of one phrase"""
+
+    def __init__(self, text: str, pcm: bytes, sample_rate: int, num_channels: int):
+        self.text = text
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (2 * self.num_channels * self.sample_rate)
+
+    async def frames(
+        self, frame_ms: int = PHRASE_FRAME_MS
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """The phrase as audio frames for `AgentSession.say(audio=...)`"""
+        samples = self.sample_rate * frame_ms // 1000
+        step = samples * self.num_channels * 2
+        for offset in range(0, len(self.pcm), step):
+            data = self.pcm[offset : offset + step]
+            yield rtc.AudioFrame(
+                data=data,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(data) // (2 * self.num_channels),
+            )
+
+
+async def synthesize_openai(
+    text: str, voice: str, model: str = PHRASE_TTS_MODEL
+) -> Tuple[bytes, int, int]:
+    """
+    Synthesize a phrase with OpenAI TTS.
+
+    Returns:
+        PCM bytes, sample rate and channel count
+    """
+    from pipeline import plugin
+
+    tts = plugin("openai").TTS(model=model, voice=voice)
+    chunks: List[bytes] = []
+    sample_rate, num_channels = tts.sample_rate, tts.num_channels
+    try:
+        async with tts.synthesize(text) as stream:
+            async for audio in stream:
+                chunks.append(bytes(audio.frame.data))
+                sample_rate, num_channels = (
+                    audio.frame.sample_rate,
+                    audio.frame.num_channels,
+                )
+    finally:
+        await tts.aclose()
+    return b"".join(chunks), sample_rate, num_channels
+
+
+def phrase_key(tenant_id: str, voice: str, text: str) -> str:
+    return hashlib.sha256(f"{tenant_id}\n{voice}\n{text.strip()}".encode()).hexdigest()[
+        :24
+    ]
+
+
+class PhraseAudioCache:
+    """
+    Synthesized audio of fixed phrases, keyed by (tenant, voice, text).
+
+    Phrases are stored as raw PCM with a small JSON header next to it, so
+    playback is a file read instead of a model round trip. Recently played
+    phrases are also kept in memory.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = PHRASE_CACHE_DIR,
+        model: str = PHRASE_TTS_MODEL,
+        synthesize: Optional[SynthesizeFn] = None,
+    ):
+        """
+        Args:
+            cache_dir: Directory the phrases are stored in
+            model: Speech model the phrases are synthesized with
+            synthesize: Coroutine `(text, voice) -> (pcm, sample_rate, num_channels)`, OpenAI TTS by default
+        """
+        self.cache_dir = Path(cache_dir)
+        self.model = model
+        self._synthesize = synthesize or (
+            lambda text, voice: synthesize_openai(text, voice, model)
+        )
+        self._memory: "OrderedDict[str, CachedPhrase]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _paths(self, tenant_id: str, voice: str, text: str) -> Tuple[Path, Path]:
+        base = self.cache_dir / tenant_id / phrase_key(tenant_id, voice, text)
+        return base.with_suffix(".pcm"), base.with_suffix(".json")
+
+    def _remember(self, key: str, phrase: CachedPhrase):
+        self._memory[key] = phrase
+        self._memory.move_to_end(key)
+        while len(self._memory) > _MAX_MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def load(self, tenant_id: str, voice: str, text: str) -> Optional[CachedPhrase]:
+        """Cached audio of a phrase, None if it was not synthesized yet"""
+        key = phrase_key(tenant_id, voice, text)
+        phrase = self._memory.get(key)
+        if phrase is not None:
+            self._memory.move_to_end(key)
+            return phrase
+
+        pcm_path, meta_path = self._paths(tenant_id, voice, text)
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta.get("model") != self.model:
+                return None
+            phrase = CachedPhrase(
+                text, pcm_path.read_bytes(), meta["sample_rate"], meta["num_channels"]
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable cached phrase {meta_path}: {e}")
+            return None
+        self._remember(key, phrase)
+        return phrase
+
+    def store(
+        self,
+        tenant_id: str,
+        voice: str,
+        text: str,
+        pcm: bytes,
+        sample_rate: int,
+        num_channels: int,
+    ) -> CachedPhrase:
+        pcm_path, meta_path = self._paths(tenant_id, voice, text)
+        pcm_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "tenant_id": tenant_id,
+            "voice": voice,
+            "text": text.strip(),
+            "model": self.model,
+            "sample_rate": sample_rate,
+            "num_channels": num_channels,
+        }
+        # PCM first, the header is what marks the entry complete
+        for path, data in ((pcm_path, pcm), (meta_path, json.dumps(meta).encode())):
+            tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+        phrase = CachedPhrase(text, pcm, sample_rate, num_channels)
+        self._remember(phrase_key(tenant_id, voice, text), phrase)
+        return phrase
+
+    async def get_or_synthesize(
+        self, tenant_id: str, voice: str, text: str
+    ) -> CachedPhrase:
+        """Cached audio of a phrase, synthesizing it first on a miss; concurrent misses share one request"""
+        phrase = self.load(tenant_id, voice, text)
+        if phrase is not None:
+            return phrase
+
+        key = phrase_key(tenant_id, voice, text)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            pcm, sample_rate, num_channels = await self._synthesize(text.strip(), voice)
+            phrase = self.store(tenant_id, voice, text, pcm, sample_rate, num_channels)
+            logger.info(
+                f"Cached phrase {text!r} for {tenant_id}/{voice}: {phrase.duration:.1f}s of audio"
+            )
+            future.set_result(phrase)
+            return phrase
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark retrieved so an unshared failure is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def fill_in_background(self, tenant_id: str, voice: str, text: str):
+        """Synthesize a phrase for later calls without waiting for it"""
+
+        async def fill():
+            try:
+                await self.get_or_synthesize(tenant_id, voice, text)
+            except Exception as e:
+                logger.warning(f"Could not cache phrase {text!r}: {e}")
+
+        task = asyncio.create_task(fill())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+
+async def say_phrase(
+    session,
+    text: str,
+    tenant_id: str,
+    voice: str,
+    fallback: Optional[Callable[[], Awaitable]] = None,
+    **say_kwargs,
+):
+    """
+    Speak a fixed phrase from the phrase cache, bypassing generation.
+
+    On a miss the phrase is synthesized first, unless a `fallback` is given:
+    then the fallback speaks this time (e.g. the model's own greeting) and the
+    phrase is cached in the background for the next call. Without the cache or
+    synthesis, the session speaks the text with its own TTS or model.
+
+    Args:
+        session: Agent session to speak in
+        text: Phrase to speak
+        tenant_id: Tenant the phrase belongs to
+        voice: Voice to synthesize with, part of the cache key
+        fallback: Coroutine function speaking instead on a cache miss
+        say_kwargs: Passed to `AgentSession.say`
+    """
+    if PHRASE_CACHE_ENABLED:
+        cache = get_phrase_cache()
+        phrase = cache.load(tenant_id, voice, text)
+        if phrase is None and fallback is not None:
+            cache.fill_in_background(tenant_id, voice, text)
+            return await fallback()
+        if phrase is None:
+            try:
+                phrase = await cache.get_or_synthesize(tenant_id, voice, text)
+            except Exception as e:
+                logger.warning(
+                    f"Could not synthesize phrase {text!r}, generating it instead: {e}"
+                )
+        if phrase is not None:
+            return await session.say(text, audio=phrase.frames(), **say_kwargs)
+
+    if fallback is not None:
+        return await fallback()
+    if session.tts is not None:
+        return await session.say(text, **say_kwargs)
+    # Realtime models have no TTS to speak text with
+    return await session.generate_reply(instructions=f'Say exactly: "{text}"')
+
+
+_phrase_cache: Optional[PhraseAudioCache] = None
+
+
+def get_phrase_cache() -> PhraseAudioCache:
+    """Return the worker process' shared phrase cache"""
+    global _phrase_cache
+    if _phrase_cache is None:
+        _phrase_cache = PhraseAudioCache()
+    return _phrase_cache
+
+
+async def _fill(tenants: Sequence[str], voice: str, phrases: Sequence[str]):
+    cache = get_phrase_cache()
+    for tenant_id in tenants:
+        for text in phrases:
+            phrase = await cache.get_or_synthesize(tenant_id, voice, text)
+            print(f"{tenant_id}/{voice}: {text!r} ({phrase.duration:.1f}s)")
+
+
+def main():
+    """
+    Fill the cache at deploy time, e.g. with an agent's fixed phrases:
+
+        python src/phrase_cache.py --agent agent --tenant default --tenant acme
+        python src/phrase_cache.py --agent agents.invoice_reminder
+        python src/phrase_cache.py --voice marin "Please hold while I transfer you."
+    """
+    import importlib
+
+    from dotenv import load_dotenv
+
+    load_dotenv(".env.local")
+    parser = argparse.ArgumentParser(
+        description="Pre-synthesize fixed phrases into the phrase audio cache"
+    )
+    parser.add_argument(
+        "phrases",
+        nargs="*",
+        help="Phrases to synthesize, exactly as the agent says them",
+    )
+    parser.add_argument(
+        "--agent", help="Agent module whose PHRASES and VOICE to use, e.g. agent"
+    )
+    parser.add_argument(
+        "--tenant", action="append", dest="tenants", help="Tenant id, repeatable"
+    )
+    parser.add_argument("--voice", help="Voice the agent speaks with, e.g. marin")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    phrases, voice, tenants = list(args.phrases), args.voice, args.tenants
+    if args.agent:
+        module = importlib.import_module(args.agent)
+        phrases += module.PHRASES
+        voice = voice or module.VOICE
+        tenants = tenants or [getattr(module, "PHRASE_TENANT", "default")]
+    if not phrases or not voice:
+        parser.error("give phrases and --voice, or --agent")
+    asyncio.run(_fill(tenants or ["default"], voice, phrases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import importlib
+import logging
+import os
+import time
+from types import ModuleType
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from warmup import get_prewarmed
+
+logger = logging.getLogger(__name__)
+
+# realtime: OpenAI Realtime speech-to-speech, cascade: separate STT, LLM and TTS
+AGENT_PIPELINE = os.getenv("AGENT_PIPELINE", "realtime")
+# Avatar provider joining the room, "none" to disable; unset uses the agent's default
+AGENT_AVATAR = os.getenv("AGENT_AVATAR")
+AGENT_NOISE_CANCELLATION = (
+    os.getenv("AGENT_NOISE_CANCELLATION", "true").lower() == "true"
+)
+
+# Provider plugins by name, imported only when a configuration references them
+PLUGIN_MODULES = {
+    "openai": "livekit.plugins.openai",
+    "assemblyai": "livekit.plugins.assemblyai",
+    "cartesia": "livekit.plugins.cartesia",
+    "silero": "livekit.plugins.silero",
+    "turn_detector": "livekit.plugins.turn_detector.multilingual",
+    "noise_cancellation": "livekit.plugins.noise_cancellation",
+    "bey": "livekit.plugins.bey",
+}
+
+PIPELINE_PLUGINS = {
+    "realtime": ("openai",),
+    "cascade": ("assemblyai", "openai", "cartesia", "silero", "turn_detector"),
+}
+
+_loaded: Dict[str, ModuleType] = {}
+
+
+class PipelineConfig:
+    """Which voice pipeline, avatar and audio filters an agent runs with"""
+
+    def __init__(
+        self,
+        mode: str = "realtime",
+        avatar: Optional[str] = None,
+        noise_cancellation: bool = True,
+    ):
+        """
+        Args:
+            mode: "realtime" or "cascade"
+            avatar: Avatar plugin name, e.g. "bey", or None
+            noise_cancellation: Apply BVC telephony noise cancellation to caller audio
+        """
+        if mode not in PIPELINE_PLUGINS:
+            raise ValueError(
+                f"Unknown pipeline {mode!r}, expected one of {sorted(PIPELINE_PLUGINS)}"
+            )
+        if avatar is not None and avatar not in PLUGIN_MODULES:
+            raise ValueError(f"Unknown avatar plugin {avatar!r}")
+        self.mode = mode
+        self.avatar = avatar
+        self.noise_cancellation = noise_cancellation
+
+    @classmethod
+    def from_env(cls, avatar: Optional[str] = None) -> "PipelineConfig":
+        """
+        Build the configuration from AGENT_PIPELINE, AGENT_AVATAR and AGENT_NOISE_CANCELLATION.
+
+        Args:
+            avatar: The agent's avatar when AGENT_AVATAR is not set
+        """
+        if AGENT_AVATAR is not None:
+            avatar = (
+                None if AGENT_AVATAR.lower() in ("", "none") else AGENT_AVATAR.lower()
+            )
+        return cls(AGENT_PIPELINE.lower(), avatar, AGENT_NOISE_CANCELLATION)
+
+    def plugins(self) -> List[str]:
+        """Plugins this configuration uses"""
+        names = list(PIPELINE_PLUGINS[self.mode])
+        if self.noise_cancellation:
+            names.append("noise_cancellation")
+        if self.avatar:
+            names.append(self.avatar)
+        return names
+
+    def prewarm_components(self, extra: Iterable[str] = ()) -> List[str]:
+        """`warmup` components this configuration needs, plus the agent's own"""
+        components = []
+        if self.mode == "cascade":
+            components += ["vad", "turn_detector"]
+        if self.noise_cancellation:
+            components.append("noise_cancellation")
+        return components + list(extra)
+
+
+def load_plugins(names: Sequence[str]) -> Dict[str, float]:
+    """
+    Import provider plugins, logging the import time of each.
+
+    LiveKit plugins register themselves on import and must do so on the main
+    thread before the worker starts, so call this at module import time.
+
+    Returns:
+        Import time in milliseconds per newly loaded plugin
+    """
+    timings: Dict[str, float] = {}
+    for name in names:
+        if name in _loaded:
+            continue
+        start = time.perf_counter()
+        _loaded[name] = importlib.import_module(PLUGIN_MODULES[name])
+        timings[name] = (time.perf_counter() - start) * 1000
+    if timings:
+        logger.debug(
+            f"Loaded plugins: {', '.join(f'{n} {ms:.0f}ms' for n, ms in timings.items())}"
+        )
+    return timings
+
+
+def plugin(name: str) -> ModuleType:
+    """Return a plugin module, importing it if no configuration loaded it yet"""
+    module = _loaded.get(name)
+    if module is None:
+        load_plugins([name])
+        module = _loaded[name]
+    return module
+
+
+def session_components(
+    config: PipelineConfig, proc, model: str, voice: str, temperature: float = 0.6
+) -> Dict:
+    """
+    Speech and language components for `AgentSession`, per the configured pipeline.
+
+    Args:
+        config: Pipeline configuration
+        proc: Job process, for components loaded in `prewarm`
+        model: Realtime model name
+        voice: Realtime model voice
+        temperature: Sampling temperature of the realtime model
+    """
+    if config.mode == "realtime":
+        from openai.types.beta.realtime.session import TurnDetection
+
+        return {
+            "llm": plugin("openai").realtime.RealtimeModel(
+                model=model,
+                voice=voice,
+                temperature=temperature,
+                turn_detection=TurnDetection(
+                    type="server_vad",  # Faster than semantic_vad
+                    threshold=0.6,  # Slightly higher for telephony
+                    prefix_padding_ms=200,  # Reduced from default 300ms
+                    silence_duration_ms=400,  # Reduced from default 500ms
+                    create_response=True,
+                    interrupt_response=True,
+                ),
+            )
+        }
+
+    # See https://docs.livekit.io/agents/models/ for the available STT, LLM and TTS models
+    return {
+        "stt": plugin("assemblyai").STT(
+            end_of_turn_confidence_threshold=0.7,
+            min_end_of_turn_silence_when_confident=160,
+            max_turn_silence=2400,
+        ),
+        "llm": "openai/gpt-4o-mini",
+        "tts": plugin("cartesia").TTS(model="sonic-turbo", language="en"),
+        "turn_detection": plugin("turn_detector").MultilingualModel(),
+        "vad": get_prewarmed(proc, "vad", lambda: plugin("silero").VAD.load()),
+    }
+
+
+def noise_cancellation_filter(config: PipelineConfig, proc):
+    """Noise cancellation for caller audio, None when disabled"""
+    if not config.noise_cancellation:
+        return None
+    # For telephony applications, use `BVCTelephony` for best results
+    return get_prewarmed(
+        proc, "noise_cancellation", lambda: plugin("noise_cancellation").BVCTelephony()
+    )
+
+
+async def start_avatar(config: PipelineConfig, session, room, avatar_id: str):
+    """Start the configured avatar and wait for it to join, if there is one"""
+    if config.avatar != "bey":
+        return None
+    # For other providers, see https://docs.livekit.io/agents/models/avatar/
+    avatar = plugin("bey").AvatarSession(avatar_id=avatar_id)
+    # Replace https with wss in livekit url
+    livekit_url = os.getenv("LIVEKIT_URL").replace("https", "wss")
+    await avatar.start(
+        session,
+        room=room,
+        livekit_url=livekit_url,
+        livekit_api_key=os.getenv("LIVEKIT_API_KEY"),
+        livekit_api_secret=os.getenv("LIVEKIT_API_SECRET"),
+    )
+    return avatar
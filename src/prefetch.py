@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from rag_cache import content_words
+
+logger = logging.getLogger(__name__)
+
+# off: disabled, tool: hand results to search_knowledge_base, inject: add them to the turn context
+RAG_PREFETCH = os.getenv("RAG_PREFETCH", "off").lower()
+RAG_PREFETCH_MIN_WORDS = int(os.getenv("RAG_PREFETCH_MIN_WORDS", "3"))
+RAG_PREFETCH_DEBOUNCE = float(os.getenv("RAG_PREFETCH_DEBOUNCE", "0.25"))
+RAG_PREFETCH_MATCH_THRESHOLD = float(os.getenv("RAG_PREFETCH_MATCH_THRESHOLD", "0.6"))
+RAG_PREFETCH_MAX_AGE = float(os.getenv("RAG_PREFETCH_MAX_AGE", "30"))
+
+
+class _Prefetch:
+    def __init__(self, transcript: str, task: asyncio.Task):
+        self.transcript = transcript
+        self.words = content_words(transcript)
+        self.task = task
+        self.started = time.monotonic()
+
+
+class KnowledgePrefetcher:
+    """
+    Starts knowledge base retrieval from user transcripts while the caller is still speaking.
+
+    Each new transcript replaces the running lookup, cancelling it if it has not
+    finished. When the model later calls `search_knowledge_base`, a prefetch whose
+    transcript covers the tool query is handed over instead of searching again.
+    """
+
+    def __init__(
+        self,
+        rag,
+        min_words: int = RAG_PREFETCH_MIN_WORDS,
+        debounce: float = RAG_PREFETCH_DEBOUNCE,
+        match_threshold: float = RAG_PREFETCH_MATCH_THRESHOLD,
+        max_age: float = RAG_PREFETCH_MAX_AGE,
+    ):
+        """
+        Args:
+            rag: WeaviateRAG (or AsyncWeaviateRAG) used for the lookups
+            min_words: Content words a transcript needs before it is worth a lookup
+            debounce: Seconds to wait on interim transcripts before searching
+            match_threshold: Share of tool query words the transcript must contain
+            max_age: Seconds after which a prefetched result is no longer handed out
+        """
+        self.rag = rag
+        self.min_words = min_words
+        self.debounce = debounce
+        self.match_threshold = match_threshold
+        self.max_age = max_age
+        self._current: Optional[_Prefetch] = None
+        self.stats = {"started": 0, "cancelled": 0, "used": 0, "unused": 0}
+
+    def on_transcript(self, transcript: str, is_final: bool):
+        """Feed an interim or final user transcript, restarting the lookup if it changed"""
+        words = content_words(transcript)
+        if len(words) < self.min_words:
+            return
+
+        current = self._current
+        if current is not None and current.words == words:
+            return
+
+        self._cancel_current()
+        delay = 0.0 if is_final else self.debounce
+        task = asyncio.create_task(self._retrieve(transcript, delay))
+        self._current = _Prefetch(transcript, task)
+        self.stats["started"] += 1
+
+    async def _retrieve(self, transcript: str, delay: float) -> str:
+        if delay:
+            await asyncio.sleep(delay)
+        return await self.rag.retrieve_context(transcript, limit=3)
+
+    def _cancel_current(self):
+        current = self._current
+        self._current = None
+        if current is None:
+            return
+        if not current.task.done():
+            current.task.cancel()
+            self.stats["cancelled"] += 1
+        else:
+            self.stats["unused"] += 1
+
+    def _matches(self, prefetch: _Prefetch, query: str) -> bool:
+        if time.monotonic() - prefetch.started > self.max_age:
+            return False
+        query_words = content_words(query)
+        if not query_words:
+            return False
+        return (
+            len(query_words & prefetch.words) / len(query_words) >= self.match_threshold
+        )
+
+    async def take(self, query: str, timeout: float = 2.0) -> Optional[str]:
+        """
+        Hand over the prefetched result if it answers `query`.
+
+        Args:
+            query: Query the model passed to `search_knowledge_base`
+            timeout: Longest wait for a lookup that is still running
+
+        Returns:
+            The prefetched context, or None when the caller should search itself
+        """
+        prefetch = self._current
+        if prefetch is None or not self._matches(prefetch, query):
+            return None
+        return await self._await(prefetch, timeout)
+
+    async def result_for(self, transcript: str, timeout: float = 2.0) -> Optional[str]:
+        """Prefetched result for a completed user turn, used when injecting context"""
+        self.on_transcript(transcript, is_final=True)
+        prefetch = self._current
+        if prefetch is None:
+            return None
+        return await self._await(prefetch, timeout)
+
+    async def _await(self, prefetch: _Prefetch, timeout: float) -> Optional[str]:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(prefetch.task), timeout)
+        except asyncio.TimeoutError:
+            return None
+        except asyncio.CancelledError:
+            # A newer transcript replaced this lookup; re-raise if we were cancelled ourselves
+            if prefetch.task.cancelled():
+                return None
+            raise
+        except Exception as e:
+            logger.warning(f"Knowledge base prefetch failed: {e}")
+            return None
+        if self._current is prefetch:
+            self._current = None
+        self.stats["used"] += 1
+        logger.info(
+            f"Using prefetched knowledge base result for: {prefetch.transcript}"
+        )
+        return result
+
+    def close(self):
+        """Cancel any running lookup"""
+        self._cancel_current()
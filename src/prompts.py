@@ -1,3 +1,40 @@
+from datetime import datetime
+from typing import Optional
+
+# Per-session values, appended after the fixed instructions. Providers cache a prompt's
+# longest prefix seen before byte for byte, so anything that changes per call goes here
+SESSION_SUFFIX = """
+# This call
+Current date time: {now}
+Caller name: {caller_name}
+"""
+
+
+class InstructionTemplate:
+    """
+    Agent instructions as a fixed prefix and a small per-session suffix.
+
+    The prefix (company, policies, tool rules) renders to the same bytes for
+    every call of a tenant, so the provider can serve it from its prompt
+    cache; the current time and caller name follow it in the suffix.
+    """
+
+    def __init__(self, prefix: str, suffix: str = SESSION_SUFFIX):
+        """
+        Args:
+            prefix: Instructions shared by every session, without per-call values
+            suffix: Per-session part, formatted with `now` and `caller_name`
+        """
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def render(self, caller_name: str = "Guest", now: Optional[datetime] = None) -> str:
+        """Instructions for one session, rendered when it starts"""
+        now = now or datetime.now()
+        return self.prefix + self.suffix.format(
+            now=now.strftime("%A, %B %d, %Y %H:%M:%S"), caller_name=caller_name
+        )
+
 
 TOOL_INSTRUCTIONS = """
 # Google Calendar Event Creation Tool Example - Return the tool arguments as DICT
@@ -115,4 +152,4 @@ key_points:
 # You will need to book the appointment and confirm the appointment with the patient.
 
 # You will need to check the patient's insurance and verify their benefits.
-# """
\ No newline at end of file
+# """
@@ -0,0 +1,338 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RAG_CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "1024"))
+RAG_CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "900"))
+RAG_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("RAG_CACHE_SIMILARITY_THRESHOLD", "0.93")
+)
+# Ingestion touches `<dir>/<tenant_id>` so workers in other processes drop stale results;
+# ingestion and workers must see the same directory, empty disables
+RAG_CACHE_INVALIDATION_DIR = os.getenv(
+    "RAG_CACHE_INVALIDATION_DIR", ".cache/rag_invalidation"
+)
+
+EmbedFn = Callable[[str], Awaitable[List[float]]]
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+_STOPWORDS = {
+    "a",
+    "an",
+    "and",
+    "are",
+    "at",
+    "be",
+    "can",
+    "do",
+    "does",
+    "for",
+    "from",
+    "have",
+    "how",
+    "i",
+    "in",
+    "is",
+    "it",
+    "me",
+    "my",
+    "of",
+    "on",
+    "or",
+    "please",
+    "so",
+    "that",
+    "the",
+    "there",
+    "this",
+    "to",
+    "we",
+    "what",
+    "when",
+    "where",
+    "which",
+    "who",
+    "why",
+    "with",
+    "you",
+    "your",
+    "about",
+    "could",
+    "would",
+    "tell",
+    "know",
+    "um",
+    "uh",
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial rephrasings match"""
+    query = _PUNCTUATION.sub(" ", query.lower())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def content_words(text: str) -> Set[str]:
+    """Lowercased words of a query without filler and stopwords"""
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+class _CacheEntry:
+    def __init__(self, result: str, embedding: Optional[np.ndarray], generation: int):
+        self.result = result
+        self.embedding = embedding
+        self.generation = generation
+        self.created = time.monotonic()
+
+
+class RetrievalCache:
+    """
+    LRU + TTL cache in front of `WeaviateRAG.retrieve_context`.
+
+    Lookups match on normalized query text first, then (when an embedding function
+    is configured) on cosine similarity to earlier queries of the same tenant.
+    Identical queries that are already being fetched share a single request.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RAG_CACHE_MAX_ENTRIES,
+        ttl: float = RAG_CACHE_TTL,
+        similarity_threshold: float = RAG_CACHE_SIMILARITY_THRESHOLD,
+        embed_fn: Optional[EmbedFn] = None,
+        invalidation_dir: str = RAG_CACHE_INVALIDATION_DIR,
+    ):
+        """
+        Args:
+            max_entries: Maximum number of cached results across all tenants
+            ttl: Seconds a result stays valid
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            embed_fn: Optional coroutine returning the embedding of a query
+            invalidation_dir: Directory of per-tenant marker files written by ingestion
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self.invalidation_dir = Path(invalidation_dir) if invalidation_dir else None
+
+        self._entries: "OrderedDict[Tuple[str, int, str], _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int, str], asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}
+        self._marker_mtimes: Dict[str, float] = {}
+        self._stats = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters plus the overall hit rate"""
+        stats: Dict[str, float] = dict(self._stats)
+        lookups = (
+            stats["hits"]
+            + stats["semantic_hits"]
+            + stats["misses"]
+            + stats["coalesced"]
+        )
+        saved = lookups - stats["misses"]
+        stats["entries"] = len(self._entries)
+        stats["hit_rate"] = round(saved / lookups, 3) if lookups else 0.0
+        return stats
+
+    def invalidate(self, tenant_id: str):
+        """Drop every cached result of a tenant, e.g. after its collection is re-ingested"""
+        self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+        for key in [k for k in self._entries if k[0] == tenant_id]:
+            del self._entries[key]
+        self._stats["invalidations"] += 1
+        logger.info(f"Invalidated RAG cache for tenant: {tenant_id}")
+
+    def _check_marker(self, tenant_id: str):
+        """Invalidate the tenant if another process re-ingested it since the last lookup"""
+        if self.invalidation_dir is None:
+            return
+        try:
+            mtime = (self.invalidation_dir / tenant_id).stat().st_mtime
+        except OSError:
+            mtime = 0.0
+        previous = self._marker_mtimes.get(tenant_id)
+        self._marker_mtimes[tenant_id] = mtime
+        if previous is not None and mtime != previous:
+            self.invalidate(tenant_id)
+
+    def _get_exact(self, key: Tuple[str, int, str]) -> Optional[_CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _get_similar(
+        self, tenant_id: str, limit: int, embedding: np.ndarray
+    ) -> Optional[_CacheEntry]:
+        now = time.monotonic()
+        candidates = [
+            (key, entry)
+            for key, entry in self._entries.items()
+            if key[0] == tenant_id
+            and key[1] == limit
+            and entry.embedding is not None
+            and now - entry.created <= self.ttl
+        ]
+        if not candidates:
+            return None
+
+        matrix = np.stack([entry.embedding for _, entry in candidates])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        key, entry = candidates[best]
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _embed(self, query: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(await self.embed_fn(query), dtype=np.float32)
+        except Exception as e:
+            logger.warning(
+                f"RAG cache could not embed query, skipping semantic match: {e}"
+            )
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _store(
+        self,
+        key: Tuple[str, int, str],
+        result: str,
+        embedding: Optional[np.ndarray],
+        generation: int,
+    ):
+        if self._generations.get(key[0], 0) != generation:
+            # The tenant was re-ingested while this result was being fetched
+            return
+        self._entries[key] = _CacheEntry(result, embedding, generation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_or_fetch(
+        self,
+        tenant_id: str,
+        query: str,
+        limit: int,
+        fetch: Callable[[], Awaitable[str]],
+    ) -> str:
+        """
+        Return a cached result for the query or fetch and cache it.
+
+        Args:
+            tenant_id: Tenant the query is scoped to
+            query: Raw search query text
+            limit: Result limit, part of the cache key
+            fetch: Coroutine factory performing the real retrieval; exceptions are not cached
+
+        Returns:
+            Formatted context string
+        """
+        self._check_marker(tenant_id)
+        key = (tenant_id, limit, normalize_query(query))
+
+        entry = self._get_exact(key)
+        if entry is not None:
+            self._stats["hits"] += 1
+            return entry.result
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leading request was cancelled (e.g. a stale prefetch), start over
+                self._stats["coalesced"] -= 1
+                return await self.get_or_fetch(tenant_id, query, limit, fetch)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generations.get(tenant_id, 0)
+        try:
+            embedding = await self._embed(query)
+            if embedding is not None:
+                entry = self._get_similar(tenant_id, limit, embedding)
+                if entry is not None:
+                    self._stats["semantic_hits"] += 1
+                    future.set_result(entry.result)
+                    return entry.result
+
+            self._stats["misses"] += 1
+            result = await fetch()
+            self._store(key, result, embedding, generation)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Waiters re-raise it; mark retrieved so an unshared failure is not logged
+                future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+
+def touch_invalidation_marker(
+    tenant_id: str, invalidation_dir: str = RAG_CACHE_INVALIDATION_DIR
+):
+    """Signal workers in other processes that a tenant's knowledge base changed"""
+    if not invalidation_dir:
+        return
+    marker = Path(invalidation_dir) / tenant_id
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+    # Bump mtime explicitly, touch on an existing file can land on the same timestamp
+    now = time.time()
+    os.utime(marker, (now, now))
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Return the worker process' shared retrieval cache"""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        from embeddings import RAG_CLIENT_EMBEDDING, get_query_embedder
+
+        # Queries are embedded anyway on the near_vector path, so semantic matching is free
+        embed_fn = get_query_embedder().embed if RAG_CLIENT_EMBEDDING else None
+        _retrieval_cache = RetrievalCache(embed_fn=embed_fn)
+    return _retrieval_cache
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class _Step:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[Any]],
+        after: Sequence[str],
+        required: bool,
+    ):
+        self.name = name
+        self.fn = fn
+        self.after = list(after)
+        self.required = required
+        self.start_ms: Optional[float] = None
+        self.end_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class StartupOrchestrator:
+    """
+    Runs a call's startup steps concurrently and measures time to first audio.
+
+    Each step starts as soon as the steps it depends on have finished. A failed
+    required step cancels the rest and is raised; a failed optional step (e.g. a
+    warm-up) is logged and its dependents run anyway. Step times are recorded
+    relative to the orchestrator's creation, which should be the job start.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.perf_counter,
+        on_first_audio: Optional[Callable[[float], None]] = None,
+    ):
+        """
+        Args:
+            clock: Monotonic clock in seconds
+            on_first_audio: Called with the time to first audio in milliseconds
+        """
+        self._clock = clock
+        self._on_first_audio = on_first_audio
+        self._started = clock()
+        self._steps: Dict[str, _Step] = {}
+        self.first_audio_ms: Optional[float] = None
+
+    def _elapsed_ms(self) -> float:
+        return (self._clock() - self._started) * 1000
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[Any]],
+        after: Sequence[str] = (),
+        required: bool = True,
+    ):
+        """
+        Add a step.
+
+        Args:
+            name: Step name, used in the timing breakdown
+            fn: Coroutine function running the step
+            after: Steps that must finish first; they must have been added already
+            required: Whether a failure of this step fails the startup
+        """
+        missing = [dep for dep in after if dep not in self._steps]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown steps {missing}")
+        self._steps[name] = _Step(name, fn, after, required)
+
+    async def _run_step(self, step: _Step, tasks: Dict[str, asyncio.Task]) -> Any:
+        if step.after:
+            await asyncio.gather(*(tasks[dep] for dep in step.after))
+        step.start_ms = self._elapsed_ms()
+        try:
+            return await step.fn()
+        except Exception as e:
+            step.error = str(e) or type(e).__name__
+            if step.required:
+                raise
+            logger.warning(
+                f"Startup step {step.name} failed, continuing without it: {e}"
+            )
+            return None
+        finally:
+            step.end_ms = self._elapsed_ms()
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run every step.
+
+        Returns:
+            Result per step, None for failed optional steps
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        for step in self._steps.values():
+            tasks[step.name] = asyncio.create_task(
+                self._run_step(step, tasks), name=f"startup_{step.name}"
+            )
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    def mark_first_audio(self):
+        """Record the first agent audio of the call; later calls are ignored"""
+        if self.first_audio_ms is not None:
+            return
+        self.first_audio_ms = self._elapsed_ms()
+        logger.info(
+            f"Time to first audio {self.first_audio_ms:.0f}ms ({self.describe()})"
+        )
+        if self._on_first_audio is not None:
+            self._on_first_audio(self.first_audio_ms)
+
+    def watch_first_audio(self, session):
+        """Mark first audio when the session's agent starts speaking"""
+
+        def on_agent_state_changed(ev):
+            if ev.new_state == "speaking":
+                self.mark_first_audio()
+                session.off("agent_state_changed", on_agent_state_changed)
+
+        session.on("agent_state_changed", on_agent_state_changed)
+
+    def critical_path(self) -> List[str]:
+        """Steps on the chain that finished last, i.e. the ones worth making faster"""
+        finished = [s for s in self._steps.values() if s.end_ms is not None]
+        if not finished:
+            return []
+        step = max(finished, key=lambda s: s.end_ms)
+        path = [step.name]
+        while step.after:
+            step = max(
+                (self._steps[dep] for dep in step.after), key=lambda s: s.end_ms or 0.0
+            )
+            path.append(step.name)
+        return path[::-1]
+
+    def timings(self) -> Dict[str, Any]:
+        """Time to first audio and start/end offsets per step, in milliseconds"""
+        return {
+            "first_audio_ms": self.first_audio_ms,
+            "steps": {
+                s.name: {"start_ms": s.start_ms, "end_ms": s.end_ms, "error": s.error}
+                for s in self._steps.values()
+            },
+            "critical_path": self.critical_path(),
+        }
+
+    def describe(self) -> str:
+        parts = []
+        for s in self._steps.values():
+            if s.start_ms is None:
+                parts.append(f"{s.name} not run")
+            elif s.end_ms is None:
+                parts.append(f"{s.name} {s.start_ms:.0f}ms-")
+            else:
+                parts.append(
+                    f"{s.name} {s.start_ms:.0f}-{s.end_ms:.0f}ms{' failed' if s.error else ''}"
+                )
+        return ", ".join(parts)
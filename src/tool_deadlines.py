@@ -0,0 +1,130 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from turn_metrics import get_turn_metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds a function tool may run before it is cancelled and the model gets a fallback, 0 disables
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "8"))
+# Per-tool overrides, e.g. "search_knowledge_base=4,book_appointment=10"
+TOOL_TIMEOUTS = os.getenv("TOOL_TIMEOUTS", "")
+
+DEFAULT_FALLBACK = (
+    "The {tool} tool did not respond within {timeout:g} seconds and was cancelled. "
+    "Tell the caller this is taking longer than expected and offer to try again or help another way."
+)
+# For tools with side effects, e.g. bookings, whose request may have landed before the deadline
+NO_RETRY_FALLBACK = (
+    "The {tool} tool did not respond within {timeout:g} seconds and was cancelled, but its request "
+    "may already have gone through, so do not call it again. Tell the caller you could not confirm "
+    "the result yet and do not say it failed."
+)
+
+
+def parse_timeouts(value: str) -> Dict[str, float]:
+    """Parse `name=seconds` pairs separated by commas"""
+    timeouts: Dict[str, float] = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, seconds = part.partition("=")
+        try:
+            timeouts[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(
+                f"Ignoring invalid tool timeout {part.strip()!r}, expected name=seconds"
+            )
+    return timeouts
+
+
+_overrides = parse_timeouts(TOOL_TIMEOUTS)
+
+
+def tool_timeout(name: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    Deadline of a tool: its TOOL_TIMEOUTS entry, else the tool's own default, else TOOL_TIMEOUT.
+
+    Returns:
+        Seconds, None when the tool has no deadline
+    """
+    timeout = _overrides.get(name, TOOL_TIMEOUT if default is None else default)
+    return timeout if timeout > 0 else None
+
+
+def timeout_result(
+    tool: str, timeout: float, message: str = DEFAULT_FALLBACK
+) -> Dict[str, Any]:
+    """Structured tool output telling the model what to say instead"""
+    return {
+        "status": "timeout",
+        "tool": tool,
+        "timeout_seconds": timeout,
+        "instructions": message.format(tool=tool, timeout=timeout),
+    }
+
+
+async def run_with_deadline(
+    tool: str,
+    call: Callable[[], Awaitable[Any]],
+    timeout: Optional[float],
+    fallback: str = DEFAULT_FALLBACK,
+) -> Any:
+    """
+    Run a tool call, cancelling it at its deadline, and record its latency.
+
+    Args:
+        tool: Tool name, the metrics label
+        call: Coroutine function running the tool
+        timeout: Deadline in seconds, None for no deadline
+        fallback: Instructions returned to the model when the deadline passes
+
+    Returns:
+        The tool's result, or `timeout_result` when it was cancelled
+    """
+    metrics = get_turn_metrics()
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(call(), timeout)
+    except asyncio.TimeoutError:
+        metrics.increment("tool_timeouts", tool=tool)
+        logger.warning(f"Tool {tool} did not finish within {timeout:g}s, cancelled it")
+        return timeout_result(tool, timeout, fallback)
+    finally:
+        metrics.observe("tool", time.perf_counter() - started, tool=tool)
+
+
+def with_deadline(timeout: Optional[float] = None, fallback: str = DEFAULT_FALLBACK):
+    """
+    Give a function tool a deadline, applied below `@function_tool()`:
+
+        @function_tool()
+        @with_deadline(timeout=4, fallback="Say you can't look that up right now.")
+        async def search_knowledge_base(self, context: RunContext, query: str) -> str:
+            ...
+
+    The signature and docstring are kept, so the tool schema does not change.
+
+    Args:
+        timeout: Default deadline in seconds, TOOL_TIMEOUT if None; 0 only records latency.
+            A TOOL_TIMEOUTS entry for the tool takes precedence.
+        fallback: Instructions returned to the model when the deadline passes,
+            may use `{tool}` and `{timeout}`
+    """
+
+    def decorator(fn):
+        deadline = tool_timeout(fn.__name__, timeout)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await run_with_deadline(
+                fn.__name__, lambda: fn(*args, **kwargs), deadline, fallback
+            )
+
+        return wrapper
+
+    return decorator
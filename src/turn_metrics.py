@@ -0,0 +1,375 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from livekit.agents import metrics
+
+logger = logging.getLogger(__name__)
+
+# Port of the worker's OpenMetrics endpoint, 0 disables it
+AGENT_METRICS_PORT = int(os.getenv("AGENT_METRICS_PORT", "0"))
+# Job processes write their histograms here and the worker merges them on scrape
+AGENT_METRICS_DIR = os.getenv("AGENT_METRICS_DIR", ".cache/agent_metrics")
+# Seconds between histogram snapshots written by a job process
+AGENT_METRICS_FLUSH_INTERVAL = float(os.getenv("AGENT_METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+# Histogram name -> help text, exported as voice_agent_<name>_seconds
+HISTOGRAMS = {
+    "eou_delay": "End of user speech until the end of turn was detected (VAD and turn detector)",
+    "transcription_delay": "End of user speech until the final transcript",
+    "llm_ttft": "LLM time to first token; time to first audio token for realtime models",
+    "tts_ttfb": "TTS time to first audio byte",
+    "eou_to_first_audio": "End of user speech until the agent's first audio of the reply",
+    "tool": "Function tool execution time, including calls cut off at their deadline",
+    "rag": "Knowledge base retrieval time as seen by the turn, including cache hits",
+    "startup_first_audio": "Job start until the agent's first audio of the call",
+}
+# Counter name -> help text, exported as voice_agent_<name>_total
+COUNTERS = {
+    "tool_timeouts": "Function tool calls cancelled at their deadline",
+    "prompt_tokens": "Input tokens sent to the LLM or realtime model",
+    "prompt_cached_tokens": "Input tokens served from the provider's prompt cache",
+}
+# Series of these are labelled by tool as well
+PER_TOOL = {"tool", "tool_timeouts"}
+
+_labels: contextvars.ContextVar = contextvars.ContextVar(
+    "turn_metric_labels", default=("unknown", "unknown")
+)
+
+
+def set_labels(tenant: str, agent: str):
+    """Label the current job's recordings; tasks started afterwards inherit it"""
+    _labels.set((tenant or "unknown", agent))
+
+
+class TurnMetrics:
+    """
+    Latency histograms of one thread of a job process.
+
+    Every recording thread gets its own instance from `get_turn_metrics`, so
+    recording is a bisect and three increments without any locking. Snapshots
+    are written to `<directory>/<pid>-<thread>.json` at most every
+    `flush_interval` seconds and merged by the worker's metrics endpoint.
+    """
+
+    def __init__(
+        self,
+        directory: str = AGENT_METRICS_DIR,
+        flush_interval: float = AGENT_METRICS_FLUSH_INTERVAL,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.path = (
+            Path(directory) / f"{os.getpid()}-{threading.get_ident()}.json"
+            if directory
+            else None
+        )
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        # (name, tenant, agent, tool) -> [bucket counts..., +Inf count, sum, count]
+        self._series: Dict[Tuple[str, str, str, str], List[float]] = {}
+        # (name, tenant, agent, tool) -> count
+        self._counters: Dict[Tuple[str, str, str, str], float] = {}
+        self._last_flush = time.monotonic()
+
+    def observe(
+        self,
+        name: str,
+        seconds: float,
+        labels: Optional[Tuple[str, str]] = None,
+        tool: str = "",
+    ):
+        """Record one duration, negative values (not measured) are ignored"""
+        if seconds < 0:
+            return
+        if name not in HISTOGRAMS:
+            raise KeyError(f"Unknown histogram {name!r}")
+        key = (name, *(labels or _labels.get()), tool)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def increment(
+        self,
+        name: str,
+        labels: Optional[Tuple[str, str]] = None,
+        tool: str = "",
+        amount: float = 1,
+    ):
+        """Count one event, or `amount` of them"""
+        if name not in COUNTERS:
+            raise KeyError(f"Unknown counter {name!r}")
+        key = (name, *(labels or _labels.get()), tool)
+        self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def record(self, ev: metrics.AgentMetrics):
+        """Record the latencies and prompt token use of a `metrics_collected` event"""
+        if isinstance(ev, metrics.EOUMetrics):
+            self.observe("eou_delay", ev.end_of_utterance_delay)
+            self.observe("transcription_delay", ev.transcription_delay)
+        elif isinstance(ev, (metrics.LLMMetrics, metrics.RealtimeModelMetrics)):
+            if not ev.cancelled:
+                self.observe("llm_ttft", ev.ttft)
+            if isinstance(ev, metrics.LLMMetrics):
+                prompt, cached = ev.prompt_tokens, ev.prompt_cached_tokens
+            else:
+                prompt, cached = ev.input_tokens, ev.input_token_details.cached_tokens
+            self.increment("prompt_tokens", amount=prompt)
+            self.increment("prompt_cached_tokens", amount=cached)
+        elif isinstance(ev, metrics.TTSMetrics):
+            if not ev.cancelled:
+                self.observe("tts_ttfb", ev.ttfb)
+
+    def watch_session(self, session):
+        """
+        Record end-of-speech-to-first-audio from the session's events.
+
+        Tool times are recorded by the tools' deadline wrapper, see tool_deadlines.py.
+        """
+        user_stopped_at: List[Optional[float]] = [None]
+
+        def on_user_state_changed(ev):
+            if ev.old_state == "speaking" and ev.new_state != "speaking":
+                user_stopped_at[0] = ev.created_at
+
+        def on_agent_state_changed(ev):
+            if ev.new_state == "speaking" and user_stopped_at[0] is not None:
+                self.observe("eou_to_first_audio", ev.created_at - user_stopped_at[0])
+                user_stopped_at[0] = None
+
+        session.on("user_state_changed", on_user_state_changed)
+        session.on("agent_state_changed", on_agent_state_changed)
+
+    def snapshot(self) -> Dict:
+        return _snapshot(self._series, self._counters, self.buckets)
+
+    def flush(self):
+        """Write the snapshot for the worker's endpoint"""
+        self._last_flush = time.monotonic()
+        if self.path is None or not (self._series or self._counters):
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.snapshot()))
+            tmp.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Could not write turn metrics to {self.path}: {e}")
+
+
+def cached_prompt_ratio(summary: metrics.UsageSummary) -> float:
+    """Share of a session's input tokens served from the provider's prompt cache"""
+    if not summary.llm_prompt_tokens:
+        return 0.0
+    return summary.llm_prompt_cached_tokens / summary.llm_prompt_tokens
+
+
+_local = threading.local()
+
+
+def get_turn_metrics() -> TurnMetrics:
+    """Return the calling thread's histograms"""
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = TurnMetrics()
+    return shard
+
+
+def _snapshot(
+    series: Dict, counters: Dict, buckets: Sequence[float] = LATENCY_BUCKETS
+) -> Dict:
+    return {
+        "buckets": list(buckets),
+        "series": [
+            {
+                "name": name,
+                "tenant": tenant,
+                "agent": agent,
+                "tool": tool,
+                "values": list(values),
+            }
+            for (name, tenant, agent, tool), values in series.items()
+        ],
+        "counters": [
+            {
+                "name": name,
+                "tenant": tenant,
+                "agent": agent,
+                "tool": tool,
+                "value": value,
+            }
+            for (name, tenant, agent, tool), value in counters.items()
+        ],
+    }
+
+
+def merge_snapshots(snapshots: Sequence[Dict]) -> Tuple[Dict, Dict]:
+    """
+    Sum the series and counters of several snapshots; snapshots with other buckets are skipped.
+
+    Returns:
+        Histogram values and counter values per (name, tenant, agent, tool)
+    """
+    merged: Dict[Tuple[str, str, str, str], List[float]] = {}
+    counters: Dict[Tuple[str, str, str, str], float] = {}
+    for snapshot in snapshots:
+        if tuple(snapshot.get("buckets", ())) != LATENCY_BUCKETS:
+            continue
+        for series in snapshot["series"]:
+            key = (
+                series["name"],
+                series["tenant"],
+                series["agent"],
+                series.get("tool", ""),
+            )
+            values = merged.setdefault(key, [0.0] * len(series["values"]))
+            for i, value in enumerate(series["values"]):
+                values[i] += value
+        for counter in snapshot.get("counters", ()):
+            key = (
+                counter["name"],
+                counter["tenant"],
+                counter["agent"],
+                counter.get("tool", ""),
+            )
+            counters[key] = counters.get(key, 0.0) + counter["value"]
+    return merged, counters
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ShardCollector:
+    """
+    prometheus_client collector merging the job processes' snapshots.
+
+    Snapshots of exited processes are folded into `archive.json` on scrape,
+    so the histograms stay cumulative while the directory stays small.
+    """
+
+    def __init__(self, directory: str = AGENT_METRICS_DIR):
+        self.directory = Path(directory)
+        self.archive = self.directory / "archive.json"
+        self._lock = threading.Lock()
+
+    def _read(self, path: Path) -> Optional[Dict]:
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _merged(self) -> Tuple[Dict, Dict]:
+        live, dead = [], []
+        for path in self.directory.glob("*-*.json"):
+            snapshot = self._read(path)
+            if snapshot is None:
+                continue
+            pid = int(path.stem.split("-")[0])
+            (live if process_alive(pid) else dead).append((path, snapshot))
+
+        archive = self._read(self.archive)
+        archived = [archive] if archive else []
+        if dead:
+            archive = _snapshot(
+                *merge_snapshots(archived + [snapshot for _, snapshot in dead])
+            )
+            tmp = self.archive.with_suffix(".tmp")
+            tmp.write_text(json.dumps(archive))
+            tmp.replace(self.archive)
+            for path, _ in dead:
+                path.unlink(missing_ok=True)
+            archived = [archive]
+        return merge_snapshots(archived + [snapshot for _, snapshot in live])
+
+    def collect(self) -> Iterator:
+        from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+        def label_names(name: str) -> List[str]:
+            return (
+                ["tenant", "agent", "tool"] if name in PER_TOOL else ["tenant", "agent"]
+            )
+
+        def label_values(name: str, tenant: str, agent: str, tool: str) -> List[str]:
+            return [tenant, agent, tool] if name in PER_TOOL else [tenant, agent]
+
+        with self._lock:
+            merged, counters = self._merged()
+        families = {
+            name: HistogramMetricFamily(
+                f"voice_agent_{name}",
+                f"{help_text} (seconds)",
+                labels=label_names(name),
+                unit="seconds",
+            )
+            for name, help_text in HISTOGRAMS.items()
+        }
+        counter_families = {
+            name: CounterMetricFamily(
+                f"voice_agent_{name}", help_text, labels=label_names(name)
+            )
+            for name, help_text in COUNTERS.items()
+        }
+        for (name, *labels), values in sorted(merged.items()):
+            if name not in families:
+                continue
+            cumulative, buckets = 0.0, []
+            for bound, count in zip([*LATENCY_BUCKETS, float("inf")], values[:-2]):
+                cumulative += count
+                buckets.append(
+                    ("+Inf" if bound == float("inf") else str(bound), cumulative)
+                )
+            families[name].add_metric(label_values(name, *labels), buckets, values[-2])
+        for (name, *labels), value in sorted(counters.items()):
+            if name in counter_families:
+                counter_families[name].add_metric(label_values(name, *labels), value)
+        yield from families.values()
+        yield from counter_families.values()
+
+
+def start_metrics_server(
+    port: int = AGENT_METRICS_PORT, directory: str = AGENT_METRICS_DIR
+) -> bool:
+    """
+    Serve the merged histograms on `:<port>/metrics`, in the worker's main process.
+
+    Prometheus text or OpenMetrics, depending on the scraper's Accept header.
+    Snapshots of a previous run are discarded, counters start at zero.
+
+    Returns:
+        Whether the endpoint was started
+    """
+    if not port:
+        return False
+    from prometheus_client import CollectorRegistry, start_http_server
+
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    for stale in path.glob("*.json"):
+        stale.unlink(missing_ok=True)
+
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(ShardCollector(directory))
+    start_http_server(port, registry=registry)
+    logger.info(f"Turn latency metrics on :{port}/metrics")
+    return True
@@ -0,0 +1,163 @@
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from livekit.agents import JobProcess
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated components to load in `prewarm`, "auto" uses the agent's pipeline defaults, "none" disables
+AGENT_PREWARM = os.getenv("AGENT_PREWARM", "auto")
+# Tenant whose knowledge base connection is opened during warm-up
+AGENT_PREWARM_TENANT = os.getenv("AGENT_PREWARM_TENANT", "default")
+
+_warmers: Dict[str, Callable[[JobProcess], Any]] = {}
+
+
+def warmer(name: str):
+    """Register a function that loads one component into `proc.userdata[name]`"""
+
+    def register(fn: Callable[[JobProcess], Any]) -> Callable[[JobProcess], Any]:
+        _warmers[name] = fn
+        return fn
+
+    return register
+
+
+def available_components() -> List[str]:
+    return sorted(_warmers)
+
+
+def resolve_components(
+    defaults: Sequence[str], setting: str = AGENT_PREWARM
+) -> List[str]:
+    """
+    Components to warm up for this worker.
+
+    Args:
+        defaults: Components the agent's configured pipeline needs
+        setting: `AGENT_PREWARM` value: "auto", "none" or a comma-separated list
+    """
+    setting = (setting or "auto").strip().lower()
+    if setting == "auto":
+        components = list(defaults)
+    elif setting == "none":
+        components = []
+    else:
+        components = [name.strip() for name in setting.split(",") if name.strip()]
+
+    unknown = [name for name in components if name not in _warmers]
+    if unknown:
+        logger.warning(
+            f"Ignoring unknown prewarm components {unknown}, available: {available_components()}"
+        )
+    return [name for name in components if name in _warmers]
+
+
+def prewarm_components(proc: JobProcess, components: Sequence[str]) -> Dict[str, float]:
+    """
+    Load components into `proc.userdata`, logging how long each one took.
+
+    A component that fails to load is logged and skipped, so the job falls
+    back to initializing it lazily instead of the worker failing to start.
+
+    Returns:
+        Warm-up time in milliseconds per loaded component
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    for name in components:
+        component_start = time.perf_counter()
+        try:
+            value = _warmers[name](proc)
+        except Exception as e:
+            logger.warning(f"Prewarm of {name} failed, it will load on first use: {e}")
+            continue
+        if value is not None:
+            proc.userdata[name] = value
+        timings[name] = (time.perf_counter() - component_start) * 1000
+        logger.info(f"Prewarmed {name} in {timings[name]:.0f}ms")
+
+    proc.userdata["prewarm_timings"] = timings
+    logger.info(
+        f"Prewarm finished in {(time.perf_counter() - start) * 1000:.0f}ms: {sorted(timings)}"
+    )
+    return timings
+
+
+@warmer("vad")
+def _warm_vad(proc: JobProcess):
+    from pipeline import plugin
+
+    return plugin("silero").VAD.load()
+
+
+@warmer("turn_detector")
+def _warm_turn_detector(proc: JobProcess):
+    # The model binds to the job's inference executor, so only its plugin can be loaded ahead of time
+    from pipeline import plugin
+
+    plugin("turn_detector")
+    return None
+
+
+@warmer("noise_cancellation")
+def _warm_noise_cancellation(proc: JobProcess):
+    from pipeline import plugin
+
+    return plugin("noise_cancellation").BVCTelephony()
+
+
+@warmer("callers")
+def _warm_callers(proc: JobProcess):
+    from caller_directory import get_caller_directory
+
+    return get_caller_directory()
+
+
+@warmer("invoices")
+def _warm_invoices(proc: JobProcess):
+    from invoice_ledger import get_invoice_ledger
+
+    return get_invoice_ledger()
+
+
+@warmer("rag")
+def _warm_rag(proc: JobProcess):
+    from db_utils import get_client_pool
+    from embeddings import RAG_CLIENT_EMBEDDING, get_query_embedder
+    from local_index import RAG_LOCAL_INDEX, get_local_index
+    from rag_cache import get_retrieval_cache
+
+    get_retrieval_cache()
+    if RAG_CLIENT_EMBEDDING:
+        get_query_embedder()
+    if RAG_LOCAL_INDEX:
+        get_local_index(AGENT_PREWARM_TENANT)
+
+    # The async client is bound to the job's event loop, which does not exist yet,
+    # so only the threaded client (sync retrieval, local index syncs) is connected here
+    if os.getenv("RAG_CLIENT", "async") == "sync" or RAG_LOCAL_INDEX:
+        pool = get_client_pool()
+        pool.release(pool.acquire(AGENT_PREWARM_TENANT))
+    return None
+
+
+@warmer("mcp")
+def _warm_mcp(proc: JobProcess):
+    # Lists the MCP server's tools unless the worker's cache is still fresh, so calls start without listing
+    from mcp_pool import prefetch_tool_schemas
+
+    prefetch_tool_schemas()
+    return None
+
+
+def get_prewarmed(
+    proc: Optional[JobProcess], name: str, default: Optional[Callable[[], Any]] = None
+) -> Any:
+    """Return a prewarmed component, or build it with `default` if it was not prewarmed"""
+    value = proc.userdata.get(name) if proc is not None else None
+    if value is None and default is not None:
+        value = default()
+    return value
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from pipeline import PipelineConfig
+from turn_metrics import process_alive
+
+logger = logging.getLogger(__name__)
+
+# Load at which the worker stops taking new calls; unset keeps the LiveKit default (0.7, off in dev mode)
+AGENT_LOAD_THRESHOLD = os.getenv("AGENT_LOAD_THRESHOLD", "")
+# Session cost units one worker node serves, see SESSION_COSTS; 0 derives it from the CPU count.
+# Calibrate with `python benchmarks/load_sessions.py`
+AGENT_SESSION_CAPACITY = float(os.getenv("AGENT_SESSION_CAPACITY", "0"))
+# Per-component cost overrides, e.g. "cascade=3,noise_cancellation=1.5"
+AGENT_SESSION_COSTS = os.getenv("AGENT_SESSION_COSTS", "")
+# Event-loop lag of a job process that counts as full load
+AGENT_LOOP_LAG_BUDGET_MS = float(os.getenv("AGENT_LOOP_LAG_BUDGET_MS", "100"))
+# Expected memory of one job process; a node without room for another one is full
+AGENT_JOB_MEMORY_MB = float(os.getenv("AGENT_JOB_MEMORY_MB", "400"))
+# Idle processes kept warm; unset derives it from CPUs and memory headroom
+AGENT_NUM_IDLE_PROCESSES = os.getenv("AGENT_NUM_IDLE_PROCESSES", "")
+# Job processes report their event-loop lag here
+AGENT_LOAD_DIR = os.getenv("AGENT_LOAD_DIR", ".cache/agent_load")
+
+# Relative CPU cost of a call: the pipeline's base cost plus its local audio processing.
+# Realtime calls mostly forward audio; the cascade runs VAD and the turn detector in-process,
+# noise cancellation filters every caller frame, and the avatar publishes a second media stream.
+SESSION_COSTS = {
+    "realtime": 1.0,
+    "cascade": 2.0,
+    "noise_cancellation": 1.0,
+    "avatar": 0.5,
+}
+CAPACITY_PER_CPU = 4.0
+# Load above which load changes are logged, LiveKit's default threshold unless configured
+_LOG_THRESHOLD = float(AGENT_LOAD_THRESHOLD or 0.7)
+_LAG_REPORT_INTERVAL = 1.0
+_LAG_REPORT_MAX_AGE = 10.0
+
+
+def parse_costs(value: str) -> Dict[str, float]:
+    """Parse `component=cost` pairs separated by commas"""
+    costs: Dict[str, float] = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, cost = part.partition("=")
+        try:
+            costs[name.strip()] = float(cost)
+        except ValueError:
+            logger.warning(
+                f"Ignoring invalid session cost {part.strip()!r}, expected component=cost"
+            )
+    return costs
+
+
+def session_cost(
+    config: PipelineConfig, costs: Optional[Dict[str, float]] = None
+) -> float:
+    """Cost units of one call on the given pipeline"""
+    costs = {
+        **SESSION_COSTS,
+        **(costs if costs is not None else parse_costs(AGENT_SESSION_COSTS)),
+    }
+    cost = costs[config.mode]
+    if config.noise_cancellation:
+        cost += costs["noise_cancellation"]
+    if config.avatar:
+        cost += costs["avatar"]
+    return cost
+
+
+def cpu_count() -> float:
+    from livekit.agents.utils.hw import get_cpu_monitor
+
+    return get_cpu_monitor().cpu_count()
+
+
+def _memory_stat(path: Path) -> Dict[str, int]:
+    stats = {}
+    for line in path.read_text().splitlines():
+        name, _, value = line.partition(" ")
+        stats[name] = int(value)
+    return stats
+
+
+def memory_mb(cgroup: str = "/sys/fs/cgroup") -> Dict[str, float]:
+    """
+    Total and available memory, from the cgroup limit when the container has one.
+
+    memory.current includes the page cache, which the kernel reclaims before the
+    limit is hit, so its inactive part counts as available, like psutil's
+    `available` outside a container.
+    """
+    cgroup_dir = Path(cgroup)
+    try:
+        limit = (cgroup_dir / "memory.max").read_text().strip()
+        if limit != "max":
+            current = int((cgroup_dir / "memory.current").read_text())
+            used = max(
+                0, current - _memory_stat(cgroup_dir / "memory.stat")["inactive_file"]
+            )
+            return {
+                "total": int(limit) / 2**20,
+                "available": (int(limit) - used) / 2**20,
+            }
+    except (OSError, ValueError, KeyError):
+        pass
+    import psutil
+
+    memory = psutil.virtual_memory()
+    return {"total": memory.total / 2**20, "available": memory.available / 2**20}
+
+
+class _CPUSampler:
+    """Moving average of the node's CPU use over 2.5 seconds, like LiveKit's default load"""
+
+    def __init__(self):
+        from livekit.agents.utils.hw import get_cpu_monitor
+
+        self._monitor = get_cpu_monitor()
+        self._samples: List[float] = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True, name="worker_load_cpu").start()
+
+    def _run(self):
+        while True:
+            sample = self._monitor.cpu_percent(interval=0.5)
+            with self._lock:
+                self._samples = [*self._samples, sample][-5:]
+
+    def average(self) -> float:
+        with self._lock:
+            return sum(self._samples) / len(self._samples) if self._samples else 0.0
+
+
+_cpu_sampler: Optional[_CPUSampler] = None
+
+
+def cpu_load() -> float:
+    """The node's CPU use as 0-1; sampling starts on the first call"""
+    global _cpu_sampler
+    if _cpu_sampler is None:
+        _cpu_sampler = _CPUSampler()
+    return _cpu_sampler.average()
+
+
+class LoopLagReporter:
+    """
+    Samples a job process' event-loop lag and reports it to the worker.
+
+    The worst lag of the last report interval is written to
+    `<directory>/<pid>.json`, where the worker's load function picks it up.
+    """
+
+    def __init__(self, directory: str = AGENT_LOAD_DIR, interval: float = 0.1):
+        self.path = Path(directory) / f"{os.getpid()}.json" if directory else None
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.path is not None and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop_lag_reporter")
+
+    async def _run(self):
+        worst, reported_at = 0.0, time.monotonic()
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            worst = max(worst, (time.perf_counter() - start - self.interval) * 1000)
+            if time.monotonic() - reported_at >= _LAG_REPORT_INTERVAL:
+                self._write(worst)
+                worst, reported_at = 0.0, time.monotonic()
+
+    def _write(self, lag_ms: float):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"lag_ms": lag_ms, "at": time.time()}))
+            tmp.replace(self.path)
+        except OSError as e:
+            logger.warning(f"Could not report loop lag to {self.path}: {e}")
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+class WorkerLoad:
+    """
+    Load function for `WorkerOptions.load_fnc`.
+
+    The load is the most saturated of four resources, each scaled to 0-1:
+
+    - cpu: moving average of the node's CPU use
+    - sessions: active calls weighted by their pipeline's cost, over the node's capacity
+    - memory: memory in use plus room for one more job process, over the total
+    - loop_lag: the worst event-loop lag job processes reported, over the lag budget
+
+    LiveKit marks the worker full above the load threshold and shrinks the idle
+    process pool as the load approaches it.
+    """
+
+    def __init__(
+        self,
+        config: PipelineConfig,
+        capacity: float = AGENT_SESSION_CAPACITY,
+        lag_budget_ms: float = AGENT_LOOP_LAG_BUDGET_MS,
+        job_memory_mb: float = AGENT_JOB_MEMORY_MB,
+        directory: str = AGENT_LOAD_DIR,
+        cpu: Callable[[], float] = cpu_load,
+        memory: Callable[[], Dict[str, float]] = memory_mb,
+    ):
+        """
+        Args:
+            config: Pipeline the worker's calls run, for their cost
+            capacity: Session cost units the node serves, 0 derives it from the CPU count
+            lag_budget_ms: Event-loop lag counting as full load
+            job_memory_mb: Expected memory of one job process
+            directory: Where job processes report their loop lag
+            cpu: Returns the node's CPU use as 0-1
+            memory: Returns total and available memory in MB
+        """
+        self.cost = session_cost(config)
+        self.capacity = capacity or cpu_count() * CAPACITY_PER_CPU
+        self.lag_budget_ms = lag_budget_ms
+        self.job_memory_mb = job_memory_mb
+        self.directory = Path(directory) if directory else None
+        self._cpu = cpu
+        self._memory = memory
+        self.last: Dict[str, float] = {}
+
+    def _loop_lag_ms(self) -> float:
+        if self.directory is None:
+            return 0.0
+        worst, now = 0.0, time.time()
+        for path in self.directory.glob("*.json"):
+            try:
+                report = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if now - report["at"] > _LAG_REPORT_MAX_AGE or not process_alive(
+                int(path.stem)
+            ):
+                path.unlink(missing_ok=True)
+                continue
+            worst = max(worst, report["lag_ms"])
+        return worst
+
+    def components(self, active_sessions: int) -> Dict[str, float]:
+        memory = self._memory()
+        return {
+            "cpu": self._cpu(),
+            "sessions": active_sessions * self.cost / self.capacity,
+            "memory": (memory["total"] - memory["available"] + self.job_memory_mb)
+            / memory["total"],
+            "loop_lag": self._loop_lag_ms() / self.lag_budget_ms,
+        }
+
+    def __call__(self, worker) -> float:
+        components = self.components(len(worker.active_jobs))
+        load = min(1.0, max(components.values()))
+        bottleneck = max(components, key=components.get)
+        if self.last and (load >= _LOG_THRESHOLD) != (
+            self.last["load"] >= _LOG_THRESHOLD
+        ):
+            logger.info(f"Worker load {load:.2f}, bound by {bottleneck} ({components})")
+        self.last = {**components, "load": load}
+        return load
+
+
+def idle_processes(
+    job_memory_mb: float = AGENT_JOB_MEMORY_MB,
+    memory: Callable[[], Dict[str, float]] = memory_mb,
+) -> int:
+    """
+    Idle processes worth keeping warm: LiveKit's default of one per CPU up to 4,
+    limited to what fits in the free memory next to the jobs still to come.
+    """
+    if AGENT_NUM_IDLE_PROCESSES:
+        return int(AGENT_NUM_IDLE_PROCESSES)
+    by_cpu = min(math.ceil(cpu_count()), 4)
+    # Leave half of the free memory to the jobs the idle processes will turn into
+    by_memory = int(memory()["available"] / 2 // job_memory_mb)
+    return max(1, min(by_cpu, by_memory))
+
+
+def worker_options(config: PipelineConfig, **kwargs):
+    """
+    `WorkerOptions` reporting load with `WorkerLoad` and sizing the idle
+    process pool with `idle_processes`; other options are passed through.
+    """
+    from livekit.agents import WorkerOptions
+    from livekit.agents.worker import _WorkerEnvOption
+
+    kwargs.setdefault("load_fnc", WorkerLoad(config))
+    # Like LiveKit's defaults, dev mode keeps no idle processes and never reports full
+    kwargs.setdefault(
+        "num_idle_processes",
+        _WorkerEnvOption(dev_default=0, prod_default=idle_processes()),
+    )
+    if AGENT_LOAD_THRESHOLD:
+        kwargs.setdefault("load_threshold", float(AGENT_LOAD_THRESHOLD))
+    kwargs.setdefault("job_memory_warn_mb", AGENT_JOB_MEMORY_MB * 1.25)
+    return WorkerOptions(**kwargs)
@@ -0,0 +1,72 @@
+import os
+from types import SimpleNamespace
+
+from caller_directory import CallerDirectory, normalize_phone
+
+
+def test_normalize_phone_formats() -> None:
+    assert normalize_phone("+1 (510) 555-0123") == "+15105550123"
+    assert normalize_phone("0031 20 123 4567") == "+31201234567"
+    assert normalize_phone("020 123 4567", default_country_code="31") == "+31201234567"
+    assert normalize_phone("") == ""
+
+
+def test_lookups_by_phone_and_id(tmp_path) -> None:
+    path = tmp_path / "user_data.csv"
+    path.write_text(
+        "id,name,email,phone_number\n1,Jack,jack@example.com,+1 510 555 0123\n2,Anna,anna@example.com,+31201234567\n"
+    )
+    directory = CallerDirectory(str(path))
+
+    assert len(directory) == 2
+    assert directory.by_phone("+15105550123")["name"] == "Jack"
+    assert directory.by_phone("0031 20 123 4567")["email"] == "anna@example.com"
+    assert directory.by_id("2")["name"] == "Anna"
+    assert directory.by_phone("+19999999999") is None
+    assert directory.by_id("3") is None
+
+
+def test_reloads_when_file_changes(tmp_path) -> None:
+    path = tmp_path / "user_data.csv"
+    path.write_text("id,name,phone_number\n1,Jack,+15105550123\n")
+    directory = CallerDirectory(str(path), reload_interval=0)
+
+    path.write_text("id,name,phone_number\n1,Jack,+15105550123\n2,Anna,+31201234567\n")
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    assert directory.by_phone("+31201234567")["name"] == "Anna"
+
+
+def test_missing_file_keeps_directory_empty(tmp_path) -> None:
+    directory = CallerDirectory(str(tmp_path / "missing.csv"))
+
+    assert len(directory) == 0
+    assert directory.by_phone("+15105550123") is None
+
+
+def test_lookup_caller_reads_the_jobs_room(tmp_path, monkeypatch) -> None:
+    """Function tools resolve the caller from the job's room name, not from RunContext."""
+    import livekit.agents
+
+    import caller_directory
+
+    path = tmp_path / "user_data.csv"
+    path.write_text(
+        "id,name,email,phone_number\n1,Jack,jack@example.com,+15105550123\n"
+    )
+    monkeypatch.setattr(
+        caller_directory, "_caller_directory", CallerDirectory(str(path))
+    )
+    room = SimpleNamespace(name="call-+15105550123")
+    monkeypatch.setattr(
+        livekit.agents,
+        "get_job_context",
+        lambda: SimpleNamespace(job=SimpleNamespace(room=room)),
+    )
+
+    assert caller_directory.lookup_caller()["name"] == "Jack"
+    assert (
+        caller_directory.lookup_caller("call-+19999999999")
+        == caller_directory.UNKNOWN_CALLER
+    )
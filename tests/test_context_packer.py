@@ -0,0 +1,39 @@
+from context_packer import ContextPacker, Hit, estimate_tokens
+
+
+def _filler(topic: str, sentences: int) -> str:
+    return " ".join(
+        f"Our {topic} policy paragraph number {i} has general details."
+        for i in range(sentences)
+    )
+
+
+def test_packs_relevant_passages_within_budget() -> None:
+    """Only the passage answering the query survives a tight budget."""
+    content = (
+        _filler("parking", 20)
+        + " We are open from 9am to 5pm on Saturday. "
+        + _filler("billing", 20)
+    )
+    packer = ContextPacker(token_budget=60, passage_tokens=20)
+
+    packed = packer.pack(
+        "opening hours on saturday", [Hit("Practice info", "info.md", content, 0.8)]
+    )
+
+    assert "9am to 5pm on Saturday" in packed.text
+    assert estimate_tokens(packed.text) <= 60 + 20
+    assert packed.dropped > 0
+
+
+def test_overlapping_hits_are_deduplicated() -> None:
+    shared = "Insurance claims are submitted directly by the practice to your provider within five days."
+    hits = [
+        Hit("Insurance", "insurance.md", shared, 0.9),
+        Hit("FAQ", "faq.md", shared + " Bring your card to every visit.", 0.7),
+    ]
+
+    packed = ContextPacker(token_budget=500).pack("insurance claims", hits)
+
+    assert packed.text.count("submitted directly") == 1
+    assert packed.passages == 1
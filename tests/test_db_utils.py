@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from db_utils import (
+    AsyncWeaviateClientPool,
+    AsyncWeaviateRAG,
+    SearchLimiter,
+    WeaviateClientPool,
+)
+
+
+class _FakeClient:
+    def __init__(self):
+        self.closed = False
+        self.ready = True
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    def is_ready(self) -> bool:
+        return self.ready
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch) -> WeaviateClientPool:
+    monkeypatch.setenv("WEAVIATE_URL", "https://cluster.example")
+    monkeypatch.setenv("WEAVIATE_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    pool = WeaviateClientPool(idle_timeout=0, health_check_interval=0)
+    monkeypatch.setattr(pool, "_connect", lambda *args: _FakeClient())
+    return pool
+
+
+def test_pool_shares_client_across_tenants(pool: WeaviateClientPool) -> None:
+    """Tenants on the same cluster reuse one connection."""
+    first = pool.acquire("tenant-a")
+    second = pool.acquire("tenant-b")
+    assert first is second
+
+    pool.release(first)
+    assert not first.closed
+    pool.release(second)
+    assert first.closed
+
+
+def test_pool_replaces_unhealthy_client(pool: WeaviateClientPool) -> None:
+    """A client failing its readiness probe is swapped for a fresh one."""
+    client = pool.acquire("tenant-a")
+    client.ready = False
+
+    replacement = pool.acquire("tenant-a")
+    assert replacement is not client
+
+    # The stale client is closed once its last holder hands it back
+    pool.release(client)
+    assert client.closed
+    assert not replacement.closed
+
+
+def test_slow_cluster_does_not_block_other_clusters(
+    pool: WeaviateClientPool, monkeypatch
+) -> None:
+    """Connecting to one cluster happens outside the pool lock."""
+    connecting = threading.Event()
+    unblock = threading.Event()
+
+    def connect(url, *args):
+        if url == "https://slow.example":
+            connecting.set()
+            unblock.wait(5)
+        return _FakeClient()
+
+    monkeypatch.setattr(
+        pool,
+        "_cluster_config",
+        lambda tenant: (f"https://{tenant}.example", "key", "key"),
+    )
+    monkeypatch.setattr(pool, "_connect", connect)
+    slow = threading.Thread(target=pool.acquire, args=("slow",))
+    slow.start()
+    assert connecting.wait(5)
+
+    started = time.monotonic()
+    client = pool.acquire("fast")
+    pool.release(client)
+    assert time.monotonic() - started < 1
+    unblock.set()
+    slow.join(5)
+
+
+def test_release_while_the_pool_lock_is_held(pool: WeaviateClientPool) -> None:
+    """A garbage-collected WeaviateRAG can release from inside a locked section on the same thread."""
+    client = pool.acquire("tenant-a")
+    with pool._lock:
+        pool.release(client)
+    # Released and, with no idle timeout, closed instead of deadlocking
+    assert client.closed
+
+
+def test_invalidated_client_stays_open_until_its_last_holder_releases(
+    pool: WeaviateClientPool,
+) -> None:
+    """One job reconnecting must not close the client another job is searching with."""
+    reconnecting = pool.acquire("tenant-a")
+    searching = pool.acquire("tenant-b")
+
+    pool.invalidate(reconnecting)
+    pool.release(reconnecting)
+    assert not searching.closed
+    assert pool.acquire("tenant-c") is not searching
+
+    pool.release(searching)
+    assert searching.closed
+
+
+async def test_invalidated_async_client_stays_open_until_released(monkeypatch) -> None:
+    monkeypatch.setenv("WEAVIATE_URL", "https://cluster.example")
+    monkeypatch.setenv("WEAVIATE_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    pool = AsyncWeaviateClientPool(idle_timeout=0, health_check_interval=3600)
+    closed = []
+
+    async def aconnect(*args):
+        return _FakeAsyncClient()
+
+    async def aclose_client(client):
+        closed.append(client)
+
+    monkeypatch.setattr(pool, "_aconnect", aconnect)
+    monkeypatch.setattr(pool, "_aclose_client", aclose_client)
+    client = await pool.aacquire("tenant-a")
+    assert await pool.aacquire("tenant-b") is client
+
+    pool.ainvalidate(client)
+    await pool.arelease(client)
+    assert closed == []
+    await pool.arelease(client)
+    assert closed == [client]
+
+
+class _FakeAsyncCollections:
+    def __init__(self):
+        self.exists_calls = 0
+
+    async def exists(self, name: str) -> bool:
+        self.exists_calls += 1
+        return True
+
+    def get(self, name: str):
+        return self
+
+    @property
+    def query(self):
+        return self
+
+    async def near_text(self, query: str, limit: int, return_metadata=None):
+        await asyncio.sleep(0.01)
+        return None
+
+
+class _FakeAsyncClient:
+    def __init__(self):
+        self.collections = _FakeAsyncCollections()
+
+
+@pytest.mark.asyncio
+async def test_async_rag_caches_existence_and_bounds_concurrency(monkeypatch) -> None:
+    """The async path checks the collection once and queues searches beyond the limit."""
+    monkeypatch.setenv("WEAVIATE_URL", "https://cluster.example")
+    monkeypatch.setenv("WEAVIATE_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    monkeypatch.setattr(AsyncWeaviateRAG, "_collection_exists", {})
+
+    client = _FakeAsyncClient()
+    pool = AsyncWeaviateClientPool()
+
+    async def aconnect(*args):
+        return client
+
+    monkeypatch.setattr(pool, "_aconnect", aconnect)
+    limiter = SearchLimiter(max_concurrent=2)
+    rag = AsyncWeaviateRAG("tenant-a", pool=pool, limiter=limiter)
+    rag.cache = None
+
+    await asyncio.gather(*(rag.retrieve_context(f"question {i}") for i in range(6)))
+
+    assert client.collections.exists_calls == 1
+    stats = limiter.stats()
+    assert stats["completed"] == 6
+    assert stats["max_queued"] >= 4
+    await rag.aclose()
+    assert all(entry.refs == 0 for entry in pool._async_entries.values())
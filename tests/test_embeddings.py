@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+
+from embeddings import EmbeddingCache, QueryEmbedder
+
+
+class _Item:
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.embedding = [float(len(text)), 1.0]
+
+
+class _FakeOpenAI:
+    def __init__(self):
+        self.requests = []
+
+    @property
+    def embeddings(self):
+        return self
+
+    async def create(self, model: str, input):  # noqa: A002 - the OpenAI keyword
+        self.requests.append(list(input))
+        await asyncio.sleep(0.01)
+        return type(
+            "Response", (), {"data": [_Item(i, text) for i, text in enumerate(input)]}
+        )()
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_batched_and_persisted(tmp_path) -> None:
+    """Repeated phrasings skip the API, also after a restart."""
+    path = str(tmp_path / "embeddings.sqlite3")
+    client = _FakeOpenAI()
+    embedder = QueryEmbedder(client=client, cache=EmbeddingCache(path), batch_size=2)
+
+    vectors = await embedder.embed_many(
+        ["Opening hours?", "Do you take insurance", "opening hours", "Parking"]
+    )
+    assert vectors[0] == vectors[2]
+    # Three distinct normalized texts in batches of two
+    assert client.requests == [["opening hours", "do you take insurance"], ["parking"]]
+
+    restarted = QueryEmbedder(client=_FakeOpenAI(), cache=EmbeddingCache(path))
+    assert await restarted.embed("OPENING HOURS!") == vectors[0]
+    assert restarted.stats["requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_queries_share_a_request() -> None:
+    client = _FakeOpenAI()
+    embedder = QueryEmbedder(client=client)
+
+    await asyncio.gather(*(embedder.embed("parking") for _ in range(4)))
+    assert client.requests == [["parking"]]
+
+
+@pytest.mark.asyncio
+async def test_busy_cache_does_not_block_the_event_loop(tmp_path) -> None:
+    """While another writer holds the SQLite cache, the event loop keeps running."""
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    embedder = QueryEmbedder(client=_FakeOpenAI(), cache=cache)
+    released = threading.Event()
+    ticks_while_busy = []
+
+    async def ticker():
+        for _ in range(10):
+            if not released.is_set():
+                ticks_while_busy.append(1)
+            await asyncio.sleep(0.01)
+
+    def release():
+        released.set()
+        cache._lock.release()
+
+    cache._lock.acquire()
+    threading.Timer(0.2, release).start()
+    await asyncio.gather(embedder.embed("parking"), ticker())
+    assert len(ticks_while_busy) >= 5
+    assert cache.get_many(embedder.model, ["parking"])
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from extraction import extract_pieces, ordered_map
+
+
+def _make_pdf(pages) -> bytes:
+    """Minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def test_ordered_map_bounds_inflight_tasks() -> None:
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def work(n):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        with lock:
+            running -= 1
+        return str(n)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = []
+        for result in ordered_map(
+            executor, work, ((n,) for n in range(50)), max_inflight=3
+        ):
+            results.append(result)
+
+    assert results == [str(n) for n in range(50)]
+    assert peak <= 3
+
+
+def test_csv_rows_become_paragraphs(tmp_path: Path) -> None:
+    path = tmp_path / "prices.csv"
+    path.write_text("treatment,price\nCleaning,80\nWhitening,250\n,\n")
+
+    text = "".join(extract_pieces(path))
+
+    assert "treatment: Cleaning; price: 80\n\ntreatment: Whitening; price: 250" in text
+
+
+def test_pdf_pages_stream_in_order(tmp_path: Path) -> None:
+    pytest.importorskip("pypdf")
+    path = tmp_path / "handbook.pdf"
+    path.write_bytes(_make_pdf([f"Page {i} says hello." for i in range(25)]))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pieces = list(
+            extract_pieces(path, executor=executor, pages_per_task=4, max_inflight=2)
+        )
+
+    assert len(pieces) == 7
+    text = "".join(pieces)
+    assert [f"Page {i} says" in text for i in range(25)] == [True] * 25
+    assert text.index("Page 9 ") < text.index("Page 10 ") < text.index("Page 24 ")
+
+
+def test_unsupported_type_is_rejected(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        list(extract_pieces(tmp_path / "scan.tiff"))
@@ -0,0 +1,162 @@
+import json
+from types import SimpleNamespace
+
+import ingest
+from chunking import chunk_stream
+
+
+def test_chunks_overlap_and_respect_size() -> None:
+    text = " ".join(f"Sentence number {i} about the clinic." for i in range(200))
+    pieces = [text[i : i + 97] for i in range(0, len(text), 97)]
+
+    chunks = list(chunk_stream(pieces, chunk_tokens=50, overlap_tokens=10))
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 50 * 4 for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split()[0] in previous
+    assert chunks[-1].endswith("Sentence number 199 about the clinic.")
+
+
+def test_short_text_is_a_single_chunk() -> None:
+    assert list(
+        chunk_stream(["Open on Saturday."], chunk_tokens=50, overlap_tokens=10)
+    ) == ["Open on Saturday."]
+
+
+class _FakeBatch:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_object(self, properties, uuid=None):
+        self.collection.calls += 1
+        if self.collection.reject > 0:
+            self.collection.reject -= 1
+            obj = SimpleNamespace(properties=properties, uuid=uuid)
+            self.collection.batch.failed_objects.append(
+                SimpleNamespace(object_=obj, message="rate limited")
+            )
+        else:
+            self.collection.stored[uuid] = properties
+
+
+class _FakeBatchManager:
+    def __init__(self, collection):
+        self.collection = collection
+        self.failed_objects = []
+
+    def dynamic(self):
+        self.failed_objects = []
+        return _FakeBatch(self.collection)
+
+    def fixed_size(self, batch_size, concurrent_requests):
+        return self.dynamic()
+
+
+class _FakeCollection:
+    def __init__(self, reject=0):
+        self.reject = reject
+        self.calls = 0
+        self.stored = {}
+        self.batch = _FakeBatchManager(self)
+        self.data = self
+
+    def iterator(self, return_properties=None):
+        return [SimpleNamespace(uuid=u, properties=p) for u, p in self.stored.items()]
+
+    def delete_many(self, where):
+        uuids = [u for u in self.stored if u in where.value]
+        for u in uuids:
+            del self.stored[u]
+        return SimpleNamespace(successful=len(uuids))
+
+
+class _FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+        self.collections = self
+        self.created = []
+
+    def exists(self, name):
+        return bool(self.created)
+
+    def create(self, name, **kwargs):
+        self.created.append(name)
+
+    def get(self, name):
+        return self.collection
+
+
+def _ingest(docs, client, manifests, **kwargs):
+    return ingest.ingest_documents(
+        str(docs),
+        "acme",
+        chunk_tokens=100,
+        overlap_tokens=10,
+        manifest_dir=str(manifests),
+        client=client,
+        **kwargs,
+    )
+
+
+def test_ingest_chunks_files_and_retries_failures(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(ingest.time, "sleep", lambda _: None)
+    invalidated = []
+    monkeypatch.setattr(ingest, "invalidate_tenant", invalidated.append)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "hours.md").write_text("We are open from 9am to 5pm. " * 100)
+    (docs / "notes.txt").write_text("Parking is free.")
+    (docs / "scan.bin").write_bytes(b"\x00")
+    collection = _FakeCollection(reject=2)
+    client = _FakeClient(collection)
+
+    stats = _ingest(docs, client, tmp_path / "manifests")
+
+    assert client.created == ["Documents_acme"]
+    assert stats["files"] == 2 and stats["failed"] == 0
+    assert stats["written"] == len(collection.stored) > 2
+    assert collection.calls == len(collection.stored) + 2
+    metadata = [
+        json.loads(p["metadata"])
+        for p in collection.stored.values()
+        if p["filename"] == "hours.md"
+    ]
+    assert sorted(m["chunk"] for m in metadata) == list(range(len(metadata)))
+    assert invalidated == ["acme"]
+
+
+def test_reingestion_writes_only_changes(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(ingest, "invalidate_tenant", lambda tenant_id: None)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "hours.md").write_text(" ".join(f"Hours sentence {i}." for i in range(200)))
+    (docs / "notes.txt").write_text("Parking is free.")
+    (docs / "old.txt").write_text("We accept cheques.")
+    collection = _FakeCollection()
+    client = _FakeClient(collection)
+    first = _ingest(docs, client, tmp_path / "manifests")
+    total = len(collection.stored)
+
+    unchanged = _ingest(docs, client, tmp_path / "manifests")
+    assert unchanged["written"] == 0 and unchanged["unchanged"] == first["written"]
+    assert collection.calls == total
+
+    (docs / "notes.txt").write_text("Parking is free after 6pm.")
+    (docs / "old.txt").unlink()
+    changed = _ingest(docs, client, tmp_path / "manifests")
+    assert changed["written"] == 1 and changed["deleted"] == 1
+    assert len(collection.stored) == total - 1
+    assert sorted(
+        p["content"] for p in collection.stored.values() if p["filename"] != "hours.md"
+    ) == ["Parking is free after 6pm."]
+
+    # A lost manifest is rebuilt from the hashes stored in Weaviate
+    rebuilt = _ingest(docs, client, tmp_path / "other-manifests")
+    assert rebuilt["written"] == 0 and rebuilt["deleted"] == 0
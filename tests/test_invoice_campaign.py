@@ -0,0 +1,98 @@
+import asyncio
+from datetime import date
+
+import numpy as np
+
+from agents.invoice_campaign import (
+    ANSWERED,
+    FAILED,
+    NO_ANSWER,
+    CampaignProgress,
+    CampaignRunner,
+    score_overdue,
+)
+
+
+def test_score_ranks_by_amount_and_age() -> None:
+    scores = score_overdue(np.array([50.0, 5000.0, 50.0]), np.array([5, 5, 30]))
+
+    assert np.argmax(scores) == 1
+    assert scores[2] > scores[0]
+
+
+class _FakeDialer:
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def dial(self, campaign_id, call, trunk_id):
+        self.calls.append((call.phone, trunk_id))
+        outcomes = self.outcomes.get(call.phone, [ANSWERED])
+        return outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+
+    async def wait_for_end(self, call):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+
+def _progress(tmp_path):
+    progress = CampaignProgress(str(tmp_path / "ledger.sqlite3"))
+    rows = [
+        ("+15105550001", 500_00, "2026-01-01", 2),
+        ("+15105550002", 20_00, "2026-09-01", 1),
+        ("+15105550003", 90_00, "2026-06-01", 1),
+        ("+15105550004", 10_00, "2026-10-01", 1),
+        ("+15105550005", 300_00, "2026-08-01", 3),
+    ]
+    assert progress.plan("oct", rows, date(2026, 10, 17)) == 5
+    return progress
+
+
+async def test_campaign_calls_everyone_with_retries_and_caps(tmp_path) -> None:
+    progress = _progress(tmp_path)
+    dialer = _FakeDialer(
+        {
+            "+15105550002": [NO_ANSWER, ANSWERED],
+            "+15105550003": [NO_ANSWER],
+            "+15105550004": [FAILED],
+        }
+    )
+    runner = CampaignRunner(
+        progress,
+        dialer,
+        trunk_ids=["trunk-a", "trunk-b"],
+        max_concurrent=2,
+        calls_per_minute=6000,
+        max_attempts=3,
+        retry_backoff=0.01,
+        poll_interval=0.01,
+    )
+
+    summary = await runner.run("oct")
+
+    assert summary == {"completed": 3, "exhausted": 1, "failed": 1}
+    assert dialer.calls[0][0] == "+15105550001"
+    assert [phone for phone, _ in dialer.calls].count("+15105550003") == 3
+    assert {trunk for _, trunk in dialer.calls} == {"trunk-a", "trunk-b"}
+    assert dialer.peak <= 2
+    progress.close()
+
+
+async def test_stopped_campaign_resumes(tmp_path) -> None:
+    progress = _progress(tmp_path)
+    claimed = progress.claim("oct", now=1e12, limit=2)
+    progress.update("oct", claimed[0].phone, "in_call", 1)
+    dialer = _FakeDialer({})
+
+    summary = await CampaignRunner(
+        progress, dialer, trunk_ids=["trunk-a"], calls_per_minute=6000
+    ).run("oct")
+
+    assert summary == {"completed": 5}
+    assert claimed[0].phone not in [phone for phone, _ in dialer.calls]
+    assert len(dialer.calls) == 4
+    progress.close()
@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+import pytest
+
+from invoice_ledger import InvoiceLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    export = tmp_path / "invoices.csv"
+    past = (date.today() - timedelta(days=5)).isoformat()
+    future = (date.today() + timedelta(days=3)).isoformat()
+    export.write_text(
+        "invoice_id,customer_id,phone_number,amount,due_date,status,description\n"
+        f"INV-001,1,+1 510 555 0123,150.00,{past},pending,Dental cleaning\n"
+        f"INV-002,1,+15105550123,75.00,{future},pending,X-ray services\n"
+        f"INV-003,1,+15105550123,20.00,{past},paid,Old invoice\n"
+        f"INV-004,2,+31201234567,abc,{future},pending,Broken row\n"
+    )
+    ledger = InvoiceLedger(str(tmp_path / "ledger.sqlite3"))
+    assert ledger.import_csv(str(export)) == 3
+    yield ledger
+    ledger.close()
+
+
+def test_outstanding_invoices_by_phone(ledger) -> None:
+    invoices = ledger.outstanding_for_phone("+15105550123")
+
+    assert [inv["invoice_id"] for inv in invoices] == ["INV-001", "INV-002"]
+    assert invoices[0]["status"] == "overdue"
+    assert invoices[1]["amount"] == 75.0
+    assert ledger.outstanding_for_phone("+31201234567") == []
+
+
+async def test_payments_settle_invoices(ledger) -> None:
+    partial = await ledger.arecord_payment("INV-002", 50, "card")
+    assert partial["status"] == "pending" and partial["balance"] == 25.0
+
+    settled = await ledger.arecord_payment("INV-002", 25, "card")
+    assert settled["status"] == "paid" and settled["balance"] == 0
+    assert [
+        inv["invoice_id"] for inv in ledger.outstanding_for_phone("+15105550123")
+    ] == ["INV-001"]
+    assert await ledger.arecord_payment("INV-999", 10, "card") is None
+
+
+async def test_payments_are_refused_on_settled_invoices_and_overpayment(ledger) -> None:
+    over = await ledger.arecord_payment("INV-002", 80, "card")
+    assert over["error"] and over["balance"] == 75.0
+
+    assert (await ledger.arecord_payment("INV-002", 75, "card"))["status"] == "paid"
+    again = await ledger.arecord_payment("INV-002", 75, "card")
+    assert again["error"] and again["status"] == "paid"
+
+    await ledger.aupdate_status("INV-001", "cancelled")
+    cancelled = await ledger.arecord_payment("INV-001", 150, "card")
+    assert cancelled["error"] and cancelled["status"] == "cancelled"
+    assert ledger.get("INV-001")["status"] == "cancelled"
+
+    (payments,) = ledger._query("SELECT COUNT(*) FROM payments")[0]
+    assert payments == 1
+
+
+async def test_status_updates_and_replace_import(ledger, tmp_path) -> None:
+    assert await ledger.aupdate_status("INV-001", "cancelled") == "pending"
+    assert ledger.get("INV-001")["status"] == "cancelled"
+    with pytest.raises(ValueError):
+        ledger.update_status("INV-001", "lost")
+
+    export = tmp_path / "nightly.csv"
+    export.write_text(
+        "invoice_id,phone_number,amount,due_date,status\nINV-100,+15105550123,10,2030-01-01,pending\n"
+    )
+    assert ledger.import_csv(str(export), replace=True) == 1
+    assert ledger.get("INV-001") is None
+    assert [
+        inv["invoice_id"] for inv in ledger.outstanding_for_phone("+15105550123")
+    ] == ["INV-100"]
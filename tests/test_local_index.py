@@ -0,0 +1,164 @@
+import datetime
+import uuid
+
+import numpy as np
+
+from local_index import LocalVectorIndex
+
+
+class _Metadata:
+    def __init__(self, updated: int):
+        self.last_update_time = datetime.datetime.fromtimestamp(
+            updated, tz=datetime.timezone.utc
+        )
+
+
+class _Object:
+    def __init__(self, object_id: uuid.UUID, vector, title: str, updated: int):
+        self.uuid = object_id
+        self.vector = {"default": vector}
+        self.properties = {
+            "title": title,
+            "content": f"{title} content",
+            "filename": f"{title}.md",
+        }
+        self.metadata = _Metadata(updated)
+
+
+class _Response:
+    def __init__(self, objects):
+        self.objects = objects
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.objects = {}
+        self.fetched = []
+
+    def iterator(self, **kwargs):
+        return iter(self.objects.values())
+
+    @property
+    def query(self):
+        return self
+
+    def fetch_objects_by_ids(self, ids, include_vector=False, limit=None):
+        self.fetched.extend(ids)
+        return _Response([self.objects[i] for i in ids])
+
+
+class _FakeClient:
+    def __init__(self, collection):
+        self.collection = collection
+
+    @property
+    def collections(self):
+        return self
+
+    def exists(self, name: str) -> bool:
+        return True
+
+    def get(self, name: str):
+        return self.collection
+
+
+def _add(collection, title: str, vector, updated: int = 1) -> uuid.UUID:
+    object_id = uuid.uuid4()
+    collection.objects[object_id] = _Object(object_id, vector, title, updated)
+    return object_id
+
+
+def test_sync_is_incremental_and_search_ranks_by_cosine(tmp_path) -> None:
+    collection = _FakeCollection()
+    hours = _add(collection, "hours", [1.0, 0.0, 0.0])
+    _add(collection, "insurance", [0.0, 1.0, 0.0])
+    client = _FakeClient(collection)
+
+    index = LocalVectorIndex("t1", base_dir=str(tmp_path))
+    assert not index.is_usable()
+    assert index.sync(client)
+    assert (
+        index.search([0.9, 0.1, 0.0], limit=1).objects[0].properties["title"] == "hours"
+    )
+
+    # Only new or updated objects are fetched again; deletions are dropped
+    collection.fetched.clear()
+    collection.objects[hours].metadata = _Metadata(2)
+    pricing = _add(collection, "pricing", [0.0, 0.0, 1.0])
+    del collection.objects[
+        next(
+            k
+            for k, o in collection.objects.items()
+            if o.properties["title"] == "insurance"
+        )
+    ]
+    index.sync(client)
+    assert sorted(collection.fetched) == sorted([hours, pricing])
+    assert index.size == 2
+
+    # A second process maps the same files from disk
+    reopened = LocalVectorIndex("t1", base_dir=str(tmp_path))
+    assert (
+        reopened.search([0.0, 0.1, 0.9], limit=1).objects[0].properties["title"]
+        == "pricing"
+    )
+
+
+def test_quantized_index_keeps_ranking_and_respects_size_limit(tmp_path) -> None:
+    rng = np.random.default_rng(0)
+    collection = _FakeCollection()
+    vectors = rng.normal(size=(50, 16))
+    for i, vector in enumerate(vectors):
+        _add(collection, f"doc{i}", vector.tolist())
+    client = _FakeClient(collection)
+
+    index = LocalVectorIndex("t1", base_dir=str(tmp_path), quantize=True)
+    index.sync(client)
+    assert (
+        index.search(vectors[7].tolist(), limit=1).objects[0].properties["title"]
+        == "doc7"
+    )
+
+    small = LocalVectorIndex("t2", base_dir=str(tmp_path), max_objects=10)
+    assert not small.sync(client)
+    assert small.too_large and not small.is_usable()
+
+
+def test_other_workers_sync_is_loaded_only_on_explicit_reload(
+    tmp_path, monkeypatch
+) -> None:
+    """is_usable() never parses meta.json; reloading happens off the event loop."""
+    collection = _FakeCollection()
+    _add(collection, "hours", [1.0, 0.0, 0.0])
+    client = _FakeClient(collection)
+
+    worker = LocalVectorIndex("t1", base_dir=str(tmp_path))
+    LocalVectorIndex("t1", base_dir=str(tmp_path)).sync(client)
+
+    def load():
+        raise AssertionError("is_usable() must not read from disk")
+
+    monkeypatch.setattr(worker, "_load", load)
+    assert not worker.is_usable()
+    monkeypatch.undo()
+    worker.reload_if_changed()
+    assert worker.is_usable()
+
+
+def test_refreshing_a_stale_mirror_keeps_a_newer_sync_from_another_worker(
+    tmp_path,
+) -> None:
+    collection = _FakeCollection()
+    _add(collection, "hours", [1.0, 0.0, 0.0])
+    client = _FakeClient(collection)
+    stale = LocalVectorIndex("t1", base_dir=str(tmp_path))
+    stale.sync(client)
+
+    # Another worker syncs a new document, then this one refreshes its unchanged view
+    _add(collection, "pricing", [0.0, 0.0, 1.0])
+    fresh = LocalVectorIndex("t1", base_dir=str(tmp_path))
+    fresh.sync(client)
+    stale._touch_synced_at()
+
+    assert LocalVectorIndex("t1", base_dir=str(tmp_path)).size == 2
+    assert stale.size == 2
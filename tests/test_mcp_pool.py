@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+
+import mcp_pool
+import tool_deadlines
+from mcp_pool import PooledMCPServerHTTP, ToolSchemaCache
+from turn_metrics import TurnMetrics
+
+URL = "https://mcp.example.com/mcp"
+TOOLS = [
+    {
+        "name": "book_slot",
+        "description": "Book a slot",
+        "inputSchema": {"type": "object"},
+        "meta": None,
+    }
+]
+
+
+class FakeClient:
+    def __init__(self, tools):
+        self.tools = tools
+        self.listings = 0
+
+    async def list_tools(self):
+        self.listings += 1
+        return SimpleNamespace(tools=[SimpleNamespace(**t) for t in self.tools])
+
+    async def call_tool(self, name, arguments):
+        content = [SimpleNamespace(model_dump_json=lambda: f'"{name} {arguments}"')]
+        return SimpleNamespace(isError=False, content=content)
+
+
+def connect_to(server, client):
+    async def open_session():
+        await asyncio.sleep(0)
+        server._client = client
+
+    server._open = open_session
+
+
+def test_schema_cache_revalidation_and_persistence(tmp_path) -> None:
+    cache = ToolSchemaCache(ttl=60, cache_dir=str(tmp_path))
+
+    assert cache.store(URL, TOOLS, list_ms=250.0) is True
+    assert cache.store(URL, TOOLS, list_ms=240.0, revalidation=True) is False
+    assert (
+        cache.store(
+            URL, [*TOOLS, {**TOOLS[0], "name": "cancel_slot"}], 240.0, revalidation=True
+        )
+        is True
+    )
+
+    # A second job process picks the entry up from disk
+    other = ToolSchemaCache(ttl=60, cache_dir=str(tmp_path))
+    entry = other.get(URL)
+    assert [t["name"] for t in entry["tools"]] == ["book_slot", "cancel_slot"]
+    assert other.record_hit(URL, entry) is True
+
+    entry["fetched_at"] = time.time() - 120
+    assert other.record_hit(URL, entry) is False
+    assert other.stats()["hits"] == 1 and other.stats()["stale_hits"] == 1
+    assert other.stats()["saved_ms"] == 480.0
+    assert (
+        cache.stats()["misses"] == 1
+        and cache.stats()["revalidated"] == 1
+        and cache.stats()["changed"] == 1
+    )
+
+
+async def test_cached_tools_skip_listing_and_connect_in_background() -> None:
+    cache = ToolSchemaCache(ttl=60, cache_dir="")
+    cache.store(URL, TOOLS, list_ms=300.0)
+    server = PooledMCPServerHTTP(URL, cache=cache)
+    client = FakeClient(TOOLS)
+    connect_to(server, client)
+
+    assert server.initialized
+    tools = await server.list_tools()
+    assert client.listings == 0
+
+    assert await tools[0]({"day": "monday"}) == "\"book_slot {'day': 'monday'}\""
+    await server._revalidate_task
+    assert client.listings == 0  # fresh entry, nothing to revalidate
+
+
+async def test_uncached_and_stale_listings_update_the_cache() -> None:
+    cache = ToolSchemaCache(ttl=60, cache_dir="")
+    server = PooledMCPServerHTTP(URL, cache=cache)
+    connect_to(server, FakeClient(TOOLS))
+
+    assert not server.initialized
+    assert len(await server.list_tools()) == 1
+    assert cache.get(URL)["tools"] == TOOLS
+
+    cache.get(URL)["fetched_at"] = time.time() - 120
+    changed = [*TOOLS, {**TOOLS[0], "name": "cancel_slot"}]
+    stale_server = PooledMCPServerHTTP(URL, cache=cache)
+    connect_to(stale_server, FakeClient(changed))
+    assert (
+        len(await stale_server.list_tools()) == 1
+    )  # served stale, revalidated in the background
+    await stale_server._revalidate_task
+    assert len(cache.get(URL)["tools"]) == 2
+    assert cache.stats()["changed"] == 1
+
+
+async def test_overdue_mcp_tool_is_not_offered_for_retry(monkeypatch, tmp_path) -> None:
+    """A booking may land after its deadline, so the model must not call it again."""
+    monkeypatch.setattr(
+        tool_deadlines,
+        "get_turn_metrics",
+        lambda: TurnMetrics(directory=str(tmp_path), flush_interval=3600),
+    )
+    monkeypatch.setattr(mcp_pool, "tool_timeout", lambda name: 0.05)
+    client = FakeClient(TOOLS)
+
+    async def slow_call_tool(name, arguments):
+        await asyncio.sleep(10)
+
+    client.call_tool = slow_call_tool
+    server = PooledMCPServerHTTP(URL, cache=ToolSchemaCache(ttl=60, cache_dir=""))
+    connect_to(server, client)
+    tools = await server.list_tools()
+
+    result = await tools[0]({"day": "monday"})
+    assert result["status"] == "timeout"
+    assert "do not call it again" in result["instructions"]
+    assert "try again" not in result["instructions"]
+
+
+@pytest.fixture
+def mcp_server_url():
+    """A local FastMCP server on streamable HTTP"""
+    app = FastMCP("booking")
+
+    @app.tool()
+    def book_slot(day: str) -> str:
+        """Book a slot"""
+        return f"booked {day}"
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app.streamable_http_app(), host="127.0.0.1", port=port, log_level="warning"
+        )
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}/mcp"
+    server.should_exit = True
+    thread.join(5)
+
+
+def test_prefetch_lists_and_closes_against_a_real_server(
+    mcp_server_url, caplog
+) -> None:
+    """The session is closed in the task that opened it and the pooled client is released."""
+    cache = ToolSchemaCache(ttl=60, cache_dir="")
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(mcp_pool._list_once(mcp_server_url, cache))
+
+    assert [t["name"] for t in cache.get(mcp_server_url)["tools"]] == ["book_slot"]
+    assert not mcp_pool._http_clients
+    assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+
+
+async def test_tool_call_and_close_from_another_task(mcp_server_url) -> None:
+    cache = ToolSchemaCache(ttl=60, cache_dir="")
+    server = PooledMCPServerHTTP(mcp_server_url, cache=cache)
+    tools = await server.list_tools()
+
+    result = await asyncio.create_task(tools[0]({"day": "monday"}))
+    assert "booked monday" in result
+    await server.aclose()
+    assert server._client is None
+    await mcp_pool.close_http_clients()
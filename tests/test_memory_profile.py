@@ -0,0 +1,125 @@
+import gc
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from db_utils import WeaviateClientPool, WeaviateRAG, rag_client_stats
+from memory_profile import JobMemoryProfiler, component_of
+
+
+def _frames(*filenames):
+    return [SimpleNamespace(filename=name) for name in filenames]
+
+
+def test_allocations_attribute_to_innermost_component() -> None:
+    """The most recent frame matching a component decides, library frames before callers."""
+    assert (
+        component_of(
+            _frames(
+                "/app/src/agent.py", "/app/src/db_utils.py", "/venv/weaviate/client.py"
+            )
+        )
+        == "weaviate"
+    )
+    assert (
+        component_of(
+            _frames("/app/src/caller_directory.py", "/venv/pandas/io/parsers.py")
+        )
+        == "caller_data"
+    )
+    assert (
+        component_of(
+            _frames(
+                "/venv/livekit/agents/voice/agent_session.py",
+                "/venv/livekit/plugins/bey/avatar.py",
+            )
+        )
+        == "avatar"
+    )
+    assert component_of(_frames("/usr/lib/python3.11/json/decoder.py")) == "other"
+
+
+def test_budget_warns_once_while_exceeded(caplog) -> None:
+    """RSS is checked per turn without tracing; a warning is logged on crossing the budget."""
+    rss = iter([100.0, 300.0, 320.0, 150.0, 310.0])
+    profiler = JobMemoryProfiler(profile=False, budget_mb=250, rss=lambda: next(rss))
+
+    with caplog.at_level(logging.WARNING, logger="memory_profile"):
+        profiler.start()
+        for turn in range(4):
+            profiler.snapshot(f"turn {turn + 1}")
+
+    warnings = [r.message for r in caplog.records if "over budget" in r.message]
+    assert len(warnings) == 2
+    assert "turn 1" in warnings[0] and "turn 4" in warnings[1]
+
+
+def test_growth_over_consecutive_turns_is_flagged() -> None:
+    profiler = JobMemoryProfiler(profile=False, budget_mb=0)
+    for turn, (rag, session) in enumerate(
+        [(1.0, 5.0), (1.5, 4.0), (2.0, 6.0), (2.5, 5.5)]
+    ):
+        profiler.snapshots.append(
+            {
+                "label": f"turn {turn + 1}",
+                "rss_mb": 0.0,
+                "components_mb": {"rag": rag, "session": session},
+            }
+        )
+
+    assert profiler.growing_components() == ["rag"]
+
+
+@pytest.mark.asyncio
+async def test_unclosed_rag_client_is_reported(monkeypatch, caplog) -> None:
+    """A WeaviateRAG left to garbage collection shows up as a leak at shutdown."""
+    monkeypatch.setenv("WEAVIATE_URL", "https://cluster.example")
+    monkeypatch.setenv("WEAVIATE_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    pool = WeaviateClientPool(idle_timeout=0, health_check_interval=0)
+    monkeypatch.setattr(
+        pool, "_connect", lambda *args: SimpleNamespace(close=lambda: None)
+    )
+    profiler = JobMemoryProfiler(profile=False, budget_mb=10**6, rss=lambda: 100.0)
+    profiler.start()
+
+    rag = WeaviateRAG(
+        "tenant-leak", pool=pool, cache=None, local_index=None, embedder=object()
+    )
+    assert "tenant-leak" in rag_client_stats()["open"]
+    del rag
+    gc.collect()
+
+    assert profiler.leaks()["rag_clients_released_by_gc"] == 1
+    with caplog.at_level(logging.WARNING, logger="memory_profile"):
+        await profiler.shutdown()
+    assert any("leak suspects" in r.message for r in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_profiling_snapshots_every_turn_off_the_loop() -> None:
+    handlers = {}
+    session = SimpleNamespace(
+        on=lambda event, handler: handlers.setdefault(event, handler)
+    )
+    profiler = JobMemoryProfiler(profile=True, budget_mb=0, frames=1, rss=lambda: 100.0)
+    profiler.start()
+    profiler.watch_session(session)
+
+    for _ in range(2):
+        handlers["agent_state_changed"](
+            SimpleNamespace(old_state="thinking", new_state="speaking")
+        )
+        handlers["agent_state_changed"](
+            SimpleNamespace(old_state="speaking", new_state="listening")
+        )
+    await profiler.shutdown()
+
+    assert [s["label"] for s in profiler.snapshots] == [
+        "start",
+        "turn 1",
+        "turn 2",
+        "shutdown",
+    ]
+    assert all("components_mb" in s for s in profiler.snapshots)
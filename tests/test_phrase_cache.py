@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import phrase_cache
+from phrase_cache import PhraseAudioCache, say_phrase
+
+PCM = b"\x01\x00" * 24000  # one second of 24kHz mono
+
+
+class FakeSession:
+    def __init__(self, tts=None):
+        self.tts = tts
+        self.spoken = []
+
+    async def say(self, text, audio=None, **kwargs):
+        frames = [frame async for frame in audio] if audio is not None else None
+        self.spoken.append(("say", text, frames))
+
+    async def generate_reply(self, instructions):
+        self.spoken.append(("generate", instructions, None))
+
+
+def counting_synthesizer(calls):
+    async def synthesize(text, voice):
+        calls.append((text, voice))
+        await asyncio.sleep(0.01)
+        return PCM, 24000, 1
+
+    return synthesize
+
+
+async def test_phrases_are_synthesized_once_and_replayed_from_disk(tmp_path) -> None:
+    calls = []
+    cache = PhraseAudioCache(
+        cache_dir=str(tmp_path), synthesize=counting_synthesizer(calls)
+    )
+
+    first, second = await asyncio.gather(
+        cache.get_or_synthesize("acme", "marin", "Goodbye!"),
+        cache.get_or_synthesize("acme", "marin", "Goodbye!"),
+    )
+    assert calls == [("Goodbye!", "marin")] and first is second
+    assert first.duration == 1.0
+
+    # A new process reads it from disk; other tenants, voices and models are separate entries
+    reloaded = PhraseAudioCache(
+        cache_dir=str(tmp_path), synthesize=counting_synthesizer(calls)
+    )
+    assert reloaded.load("acme", "marin", "Goodbye!").pcm == PCM
+    assert reloaded.load("other", "marin", "Goodbye!") is None
+    assert reloaded.load("acme", "cedar", "Goodbye!") is None
+    assert (
+        PhraseAudioCache(cache_dir=str(tmp_path), model="tts-1").load(
+            "acme", "marin", "Goodbye!"
+        )
+        is None
+    )
+
+    frames = [frame async for frame in first.frames()]
+    assert len(frames) == 50 and frames[0].samples_per_channel == 480
+
+
+async def test_say_phrase_plays_cached_audio_and_fills_misses(
+    monkeypatch, tmp_path
+) -> None:
+    calls = []
+    cache = PhraseAudioCache(
+        cache_dir=str(tmp_path), synthesize=counting_synthesizer(calls)
+    )
+    monkeypatch.setattr(phrase_cache, "_phrase_cache", cache)
+    session = FakeSession()
+
+    async def model_greeting():
+        await session.generate_reply("Greet the user")
+
+    # Miss with a fallback: the model speaks, the phrase is cached for the next call
+    await say_phrase(session, "Welcome!", "acme", "marin", fallback=model_greeting)
+    await asyncio.gather(*cache._background)
+    await say_phrase(session, "Welcome!", "acme", "marin", fallback=model_greeting)
+    # Miss without a fallback: synthesized before playing
+    await say_phrase(session, "Goodbye!", "acme", "marin", allow_interruptions=False)
+
+    assert [kind for kind, _, _ in session.spoken] == ["generate", "say", "say"]
+    assert len(session.spoken[1][2]) == 50
+    assert calls == [("Welcome!", "marin"), ("Goodbye!", "marin")]
+
+
+async def test_say_phrase_without_audio_uses_the_session(monkeypatch, tmp_path) -> None:
+    async def broken(text, voice):
+        raise RuntimeError("TTS unavailable")
+
+    monkeypatch.setattr(
+        phrase_cache,
+        "_phrase_cache",
+        PhraseAudioCache(cache_dir=str(tmp_path), synthesize=broken),
+    )
+    realtime, cascade = FakeSession(), FakeSession(tts=SimpleNamespace())
+
+    await say_phrase(realtime, "Goodbye!", "acme", "marin")
+    await say_phrase(cascade, "Goodbye!", "acme", "marin")
+
+    assert realtime.spoken == [("generate", 'Say exactly: "Goodbye!"', None)]
+    assert cascade.spoken == [("say", "Goodbye!", None)]
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+import pipeline
+from pipeline import PipelineConfig
+
+
+def test_config_references_only_the_plugins_it_uses() -> None:
+    realtime = PipelineConfig("realtime", avatar="bey")
+    cascade = PipelineConfig("cascade", noise_cancellation=False)
+
+    assert realtime.plugins() == ["openai", "noise_cancellation", "bey"]
+    assert realtime.prewarm_components(["callers"]) == ["noise_cancellation", "callers"]
+    assert cascade.plugins() == [
+        "assemblyai",
+        "openai",
+        "cartesia",
+        "silero",
+        "turn_detector",
+    ]
+    assert cascade.prewarm_components() == ["vad", "turn_detector"]
+
+    with pytest.raises(ValueError):
+        PipelineConfig("speech-to-speech")
+
+
+def test_from_env_avatar_override(monkeypatch) -> None:
+    monkeypatch.setattr(pipeline, "AGENT_PIPELINE", "Cascade")
+    monkeypatch.setattr(pipeline, "AGENT_AVATAR", None)
+    assert PipelineConfig.from_env(avatar="bey").avatar == "bey"
+    assert PipelineConfig.from_env().mode == "cascade"
+
+    monkeypatch.setattr(pipeline, "AGENT_AVATAR", "none")
+    assert (
+        PipelineConfig.from_env(avatar="bey").plugins()
+        == pipeline.PipelineConfig("cascade").plugins()
+    )
+
+
+def test_noise_cancellation_uses_the_prewarmed_filter() -> None:
+    prewarmed = object()
+    proc = SimpleNamespace(userdata={"noise_cancellation": prewarmed})
+
+    assert (
+        pipeline.noise_cancellation_filter(PipelineConfig("realtime"), proc)
+        is prewarmed
+    )
+    assert (
+        pipeline.noise_cancellation_filter(
+            PipelineConfig("realtime", noise_cancellation=False), proc
+        )
+        is None
+    )
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from prefetch import KnowledgePrefetcher
+
+
+class _FakeRAG:
+    def __init__(self):
+        self.queries = []
+
+    async def retrieve_context(self, query: str, limit: int = 3) -> str:
+        self.queries.append(query)
+        await asyncio.sleep(0.02)
+        return f"context for {query}"
+
+
+@pytest.mark.asyncio
+async def test_stale_lookups_are_cancelled() -> None:
+    """Only the latest transcript keeps a running lookup."""
+    rag = _FakeRAG()
+    prefetcher = KnowledgePrefetcher(rag, debounce=0.01)
+
+    prefetcher.on_transcript("do you accept dental insurance", is_final=False)
+    prefetcher.on_transcript("do you accept dental insurance plans", is_final=False)
+    await asyncio.sleep(0.05)
+
+    assert rag.queries == ["do you accept dental insurance plans"]
+    assert prefetcher.stats["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tool_query_takes_matching_prefetch() -> None:
+    """A tool query covered by the transcript reuses the running lookup."""
+    rag = _FakeRAG()
+    prefetcher = KnowledgePrefetcher(rag, debounce=0)
+
+    prefetcher.on_transcript("what are your opening hours on saturday", is_final=True)
+    assert await prefetcher.take("billing address") is None
+    assert (
+        await prefetcher.take("opening hours saturday")
+        == "context for what are your opening hours on saturday"
+    )
+    assert len(rag.queries) == 1
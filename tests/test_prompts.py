@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from prompts import InstructionTemplate
+
+
+def test_sessions_share_the_prefix_and_differ_only_in_the_suffix() -> None:
+    template = InstructionTemplate("You are a receptionist with Acme.\n")
+
+    first = template.render("Ada", now=datetime(2025, 10, 15, 9, 30))
+    second = template.render("Grace", now=datetime(2025, 10, 16, 14, 0))
+
+    assert first.startswith(template.prefix) and second.startswith(template.prefix)
+    assert "Current date time: Wednesday, October 15, 2025 09:30:00" in first
+    assert "Caller name: Grace" in second
+    assert "Ada" not in second
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rag_cache import RetrievalCache, touch_invalidation_marker
+
+
+@pytest.mark.asyncio
+async def test_normalized_query_hits_cache() -> None:
+    """Rephrasings that only differ in case and punctuation share a result."""
+    cache = RetrievalCache()
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        return "Opening hours: 9-17"
+
+    assert (
+        await cache.get_or_fetch("t1", "What are your opening hours?", 3, fetch)
+        == "Opening hours: 9-17"
+    )
+    assert (
+        await cache.get_or_fetch("t1", "what are your  opening hours", 3, fetch)
+        == "Opening hours: 9-17"
+    )
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+    # Other tenants never see each other's results
+    await cache.get_or_fetch("t2", "What are your opening hours?", 3, fetch)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_inflight_queries_are_coalesced() -> None:
+    """Concurrent identical queries trigger a single retrieval."""
+    cache = RetrievalCache()
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(
+        *(cache.get_or_fetch("t1", "insurance", 3, fetch) for _ in range(5))
+    )
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_semantic_match_and_tenant_invalidation(tmp_path) -> None:
+    """Similar embeddings hit the cache until the tenant is re-ingested."""
+    vectors = {
+        "do you take insurance": [1.0, 0.0],
+        "is insurance accepted": [0.99, 0.05],
+    }
+
+    async def embed(query: str):
+        return vectors[query]
+
+    cache = RetrievalCache(embed_fn=embed, invalidation_dir=str(tmp_path))
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        return f"answer {len(calls)}"
+
+    assert (
+        await cache.get_or_fetch("t1", "do you take insurance", 3, fetch) == "answer 1"
+    )
+    assert (
+        await cache.get_or_fetch("t1", "is insurance accepted", 3, fetch) == "answer 1"
+    )
+    assert cache.stats()["semantic_hits"] == 1
+
+    touch_invalidation_marker("t1", str(tmp_path))
+    assert (
+        await cache.get_or_fetch("t1", "do you take insurance", 3, fetch) == "answer 2"
+    )
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached() -> None:
+    cache = RetrievalCache()
+
+    async def failing() -> str:
+        raise RuntimeError("weaviate down")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_fetch("t1", "pricing", 3, failing)
+
+    async def fetch() -> str:
+        return "prices"
+
+    assert await cache.get_or_fetch("t1", "pricing", 3, fetch) == "prices"
+
+
+@pytest.mark.asyncio
+async def test_ingest_in_another_process_invalidates_worker_cache(
+    tmp_path, monkeypatch
+) -> None:
+    """With the default settings, re-ingesting a tenant from the CLI drops the workers' results."""
+    monkeypatch.chdir(tmp_path)
+    cache = RetrievalCache()
+    calls = []
+
+    async def fetch() -> str:
+        calls.append(1)
+        return f"result {len(calls)}"
+
+    assert await cache.get_or_fetch("acme", "insurance", 3, fetch) == "result 1"
+    assert await cache.get_or_fetch("acme", "insurance", 3, fetch) == "result 1"
+
+    src = Path(__file__).resolve().parent.parent / "src"
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from ingest import invalidate_tenant; invalidate_tenant('acme')",
+        ],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": str(src)},
+        check=True,
+        timeout=120,
+    )
+
+    assert await cache.get_or_fetch("acme", "insurance", 3, fetch) == "result 2"
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from startup import StartupOrchestrator
+
+
+async def test_independent_steps_overlap_and_dependents_wait() -> None:
+    startup = StartupOrchestrator()
+    order = []
+
+    async def step(name, delay):
+        await asyncio.sleep(delay)
+        order.append(name)
+        return name
+
+    startup.add("connect", lambda: step("connect", 0.02))
+    startup.add("avatar", lambda: step("avatar", 0.05))
+    startup.add("session", lambda: step("session", 0.01), after=["avatar"])
+    startup.add("greeting", lambda: step("greeting", 0), after=["connect", "session"])
+
+    results = await startup.run()
+    startup.mark_first_audio()
+    timings = startup.timings()
+
+    assert order == ["connect", "avatar", "session", "greeting"]
+    assert results["greeting"] == "greeting"
+    steps = timings["steps"]
+    assert steps["connect"]["start_ms"] < 10 and steps["avatar"]["start_ms"] < 10
+    assert steps["session"]["start_ms"] >= steps["avatar"]["end_ms"]
+    assert timings["critical_path"] == ["avatar", "session", "greeting"]
+    assert timings["first_audio_ms"] >= steps["greeting"]["end_ms"]
+
+
+async def test_optional_failures_continue_and_required_failures_cancel() -> None:
+    startup = StartupOrchestrator()
+
+    async def broken():
+        raise RuntimeError("weaviate unavailable")
+
+    startup.add("rag", broken, required=False)
+    startup.add("greeting", lambda: asyncio.sleep(0, result="hi"), after=["rag"])
+    assert (await startup.run()) == {"rag": None, "greeting": "hi"}
+    assert startup.timings()["steps"]["rag"]["error"] == "weaviate unavailable"
+
+    startup = StartupOrchestrator()
+    slow = asyncio.Event()
+    startup.add("connect", broken)
+    startup.add("avatar", slow.wait)
+    with pytest.raises(RuntimeError):
+        await startup.run()
+    assert startup.timings()["steps"]["avatar"]["end_ms"] is not None
+
+    with pytest.raises(ValueError):
+        startup.add("session", broken, after=["unknown"])
+
+
+async def test_avatar_starts_after_connect_sets_the_room_name() -> None:
+    """The agent's step graph: the avatar joins the room by name, which is empty before connecting."""
+    room = SimpleNamespace(name="")
+    startup = StartupOrchestrator()
+
+    async def connect():
+        await asyncio.sleep(0.01)
+        room.name = "call-1234"
+
+    async def start_avatar():
+        assert room.name, "avatar started before the room was connected"
+        return room.name
+
+    startup.add("connect", connect)
+    startup.add("avatar", start_avatar, after=["connect"])
+    startup.add("session", lambda: asyncio.sleep(0), after=["avatar"])
+    startup.add("greeting", lambda: asyncio.sleep(0), after=["connect", "session"])
+
+    results = await startup.run()
+    assert results["avatar"] == "call-1234"
+    assert startup.timings()["critical_path"] == [
+        "connect",
+        "avatar",
+        "session",
+        "greeting",
+    ]
@@ -0,0 +1,86 @@
+import asyncio
+
+from livekit.agents.llm import function_tool
+from livekit.agents.llm.tool_context import get_function_info
+
+import tool_deadlines
+from tool_deadlines import run_with_deadline, with_deadline
+from turn_metrics import TurnMetrics
+
+
+def use_metrics(monkeypatch, tmp_path) -> TurnMetrics:
+    metrics = TurnMetrics(directory=str(tmp_path), flush_interval=3600)
+    monkeypatch.setattr(tool_deadlines, "get_turn_metrics", lambda: metrics)
+    return metrics
+
+
+async def test_overdue_tool_is_cancelled_and_answers_with_fallback(
+    monkeypatch, tmp_path
+) -> None:
+    metrics = use_metrics(monkeypatch, tmp_path)
+    cancelled = asyncio.Event()
+
+    class Agent:
+        @function_tool()
+        @with_deadline(timeout=0.05, fallback="Say {tool} is slow today.")
+        async def check_calendar(self, day: str) -> str:
+            """Check the calendar for a day."""
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "free"
+
+        @function_tool()
+        @with_deadline(timeout=0.05)
+        async def echo(self, text: str) -> str:
+            """Echo text."""
+            return text
+
+    agent = Agent()
+    assert (
+        get_function_info(agent.check_calendar).description
+        == "Check the calendar for a day."
+    )
+
+    result = await agent.check_calendar("monday")
+    assert cancelled.is_set()
+    assert (
+        result["status"] == "timeout"
+        and result["instructions"] == "Say check_calendar is slow today."
+    )
+    assert await agent.echo("hi") == "hi"
+
+    snapshot = metrics.snapshot()
+    assert {s["tool"]: s["values"][-1] for s in snapshot["series"]} == {
+        "check_calendar": 1,
+        "echo": 1,
+    }
+    assert [(c["tool"], c["value"]) for c in snapshot["counters"]] == [
+        ("check_calendar", 1.0)
+    ]
+
+
+async def test_configured_timeouts_take_precedence(monkeypatch, tmp_path) -> None:
+    use_metrics(monkeypatch, tmp_path)
+    monkeypatch.setattr(
+        tool_deadlines,
+        "_overrides",
+        tool_deadlines.parse_timeouts("slow=0.05, quick=0, bad=x"),
+    )
+    monkeypatch.setattr(tool_deadlines, "TOOL_TIMEOUT", 30.0)
+
+    assert tool_deadlines.tool_timeout("slow", default=10) == 0.05
+    assert tool_deadlines.tool_timeout("quick", default=10) is None
+    assert tool_deadlines.tool_timeout("other") == 30.0
+    assert tool_deadlines.tool_timeout("other", default=0) is None
+
+    result = await run_with_deadline(
+        "slow", lambda: asyncio.sleep(1, "done"), tool_deadlines.tool_timeout("slow")
+    )
+    assert result["status"] == "timeout" and result["timeout_seconds"] == 0.05
+    assert (
+        await run_with_deadline("quick", lambda: asyncio.sleep(0.1, "done"), None)
+        == "done"
+    )
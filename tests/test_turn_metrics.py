@@ -0,0 +1,149 @@
+import json
+from types import SimpleNamespace
+
+from livekit.agents import metrics
+from prometheus_client import CollectorRegistry, generate_latest
+
+import turn_metrics
+from turn_metrics import ShardCollector, TurnMetrics
+
+
+def test_records_agent_metrics_into_labelled_histograms(tmp_path) -> None:
+    shard = TurnMetrics(directory=str(tmp_path), flush_interval=3600)
+    turn_metrics.set_labels("acme", "assistant")
+
+    shard.record(
+        metrics.EOUMetrics(
+            timestamp=0,
+            end_of_utterance_delay=0.42,
+            transcription_delay=0.15,
+            on_user_turn_completed_delay=0,
+            last_speaking_time=0,
+        )
+    )
+    shard.record(
+        metrics.TTSMetrics(
+            label="tts",
+            request_id="r",
+            timestamp=0,
+            ttfb=0.18,
+            duration=1,
+            audio_duration=1,
+            cancelled=False,
+            characters_count=10,
+            streamed=True,
+        )
+    )
+    shard.observe(
+        "tool", 1.2, labels=("acme", "invoice_reminder"), tool="process_payment"
+    )
+    shard.observe("llm_ttft", -1)  # realtime responses without audio report -1
+
+    series = {(s["name"], s["agent"]): s["values"] for s in shard.snapshot()["series"]}
+    assert set(series) == {
+        ("eou_delay", "assistant"),
+        ("transcription_delay", "assistant"),
+        ("tts_ttfb", "assistant"),
+        ("tool", "invoice_reminder"),
+    }
+    eou = series[("eou_delay", "assistant")]
+    assert eou[turn_metrics.LATENCY_BUCKETS.index(0.5)] == 1 and eou[-2:] == [0.42, 1]
+
+
+def test_session_events_give_end_of_speech_to_first_audio(tmp_path) -> None:
+    handlers = {}
+    session = SimpleNamespace(on=lambda event, fn: handlers.setdefault(event, fn))
+    shard = TurnMetrics(directory=str(tmp_path), flush_interval=3600)
+    shard.watch_session(session)
+
+    handlers["user_state_changed"](
+        SimpleNamespace(old_state="speaking", new_state="listening", created_at=10.0)
+    )
+    handlers["agent_state_changed"](
+        SimpleNamespace(new_state="thinking", created_at=10.2)
+    )
+    handlers["agent_state_changed"](
+        SimpleNamespace(new_state="speaking", created_at=10.9)
+    )
+    handlers["agent_state_changed"](
+        SimpleNamespace(new_state="speaking", created_at=15.0)
+    )
+
+    values = {s["name"]: s["values"] for s in shard.snapshot()["series"]}
+    assert values["eou_to_first_audio"][-1] == 1
+    assert abs(values["eou_to_first_audio"][-2] - 0.9) < 1e-9
+
+
+def test_collector_merges_live_and_exited_job_processes(tmp_path) -> None:
+    live = TurnMetrics(directory=str(tmp_path), flush_interval=3600)
+    live.observe("eou_to_first_audio", 0.8, labels=("acme", "assistant"))
+    live.increment(
+        "tool_timeouts", labels=("acme", "assistant"), tool="search_knowledge_base"
+    )
+    live.flush()
+    exited = {
+        "buckets": list(turn_metrics.LATENCY_BUCKETS),
+        "series": [
+            {
+                "name": "eou_to_first_audio",
+                "tenant": "acme",
+                "agent": "assistant",
+                "values": live.snapshot()["series"][0]["values"],
+            }
+        ],
+    }
+    # No such pid, stands in for a job process that has exited
+    (tmp_path / "999999999-1.json").write_text(json.dumps(exited))
+
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(ShardCollector(str(tmp_path)))
+    text = generate_latest(registry).decode()
+
+    labels = 'agent="assistant",tenant="acme"'
+    assert (
+        'voice_agent_eou_to_first_audio_seconds_bucket{agent="assistant",le="0.75",tenant="acme"} 0.0'
+        in text
+    )
+    assert (
+        'voice_agent_eou_to_first_audio_seconds_bucket{agent="assistant",le="1.0",tenant="acme"} 2.0'
+        in text
+    )
+    assert f"voice_agent_eou_to_first_audio_seconds_count{{{labels}}} 2.0" in text
+    # The exited process was folded into the archive, and scraping again does not double count
+    assert not (tmp_path / "999999999-1.json").exists()
+    assert (
+        f"voice_agent_eou_to_first_audio_seconds_count{{{labels}}} 2.0"
+        in generate_latest(registry).decode()
+    )
+    assert live.path.exists()
+    assert (
+        'voice_agent_tool_timeouts_total{agent="assistant",tenant="acme",tool="search_knowledge_base"} 1.0'
+        in text
+    )
+
+
+def test_prompt_tokens_are_counted_with_their_cached_share(tmp_path) -> None:
+    shard = TurnMetrics(directory=str(tmp_path), flush_interval=3600)
+    turn_metrics.set_labels("acme", "assistant")
+    collector = metrics.UsageCollector()
+    for prompt, cached in [(1200, 0), (1300, 1152)]:
+        ev = metrics.LLMMetrics(
+            label="llm",
+            request_id="r",
+            timestamp=0,
+            duration=1,
+            ttft=0.3,
+            cancelled=False,
+            completion_tokens=20,
+            prompt_tokens=prompt,
+            prompt_cached_tokens=cached,
+            total_tokens=prompt + 20,
+            tokens_per_second=20,
+        )
+        shard.record(ev)
+        collector.collect(ev)
+
+    counters = {c["name"]: c["value"] for c in shard.snapshot()["counters"]}
+    assert counters == {"prompt_tokens": 2500, "prompt_cached_tokens": 1152}
+    assert turn_metrics.cached_prompt_ratio(collector.get_summary()) == 1152 / 2500
+    assert turn_metrics.cached_prompt_ratio(metrics.UsageSummary()) == 0.0
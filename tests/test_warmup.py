@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import warmup
+
+
+def test_prewarm_loads_resolved_components_and_skips_failures(monkeypatch) -> None:
+    monkeypatch.setattr(warmup, "_warmers", {})
+    warmup.warmer("directory")(lambda proc: {"+15105550123": "Jack"})
+    warmup.warmer("plugin")(lambda proc: None)
+
+    def broken(proc):
+        raise RuntimeError("no model files")
+
+    warmup.warmer("model")(broken)
+    proc = SimpleNamespace(userdata={})
+
+    components = warmup.resolve_components(
+        ["directory", "model"], setting="directory,model,plugin,unknown"
+    )
+    timings = warmup.prewarm_components(proc, components)
+
+    assert components == ["directory", "model", "plugin"]
+    assert sorted(timings) == ["directory", "plugin"]
+    assert proc.userdata["directory"] == {"+15105550123": "Jack"}
+    assert "plugin" not in proc.userdata and "model" not in proc.userdata
+    assert warmup.get_prewarmed(proc, "model", lambda: "lazy") == "lazy"
+
+
+def test_resolve_auto_and_none(monkeypatch) -> None:
+    monkeypatch.setattr(warmup, "_warmers", {"vad": None, "callers": None})
+
+    assert warmup.resolve_components(["callers"], setting="auto") == ["callers"]
+    assert warmup.resolve_components(["callers"], setting="none") == []
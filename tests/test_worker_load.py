@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import psutil
+
+import worker_load
+from pipeline import PipelineConfig
+from worker_load import LoopLagReporter, WorkerLoad, session_cost
+
+MEMORY = {"total": 8000.0, "available": 6000.0}
+
+
+def test_session_cost_weights_pipeline_components() -> None:
+    assert session_cost(PipelineConfig("realtime", None, False), costs={}) == 1.0
+    assert session_cost(PipelineConfig("realtime", "bey", True), costs={}) == 2.5
+    assert (
+        session_cost(PipelineConfig("cascade", None, True), costs={"cascade": 3.0})
+        == 4.0
+    )
+
+
+def test_load_is_the_most_saturated_resource(tmp_path) -> None:
+    load = WorkerLoad(
+        PipelineConfig("realtime", "bey", True),
+        capacity=10,
+        lag_budget_ms=100,
+        job_memory_mb=400,
+        directory=str(tmp_path),
+        cpu=lambda: 0.3,
+        memory=lambda: MEMORY,
+    )
+    assert load(SimpleNamespace(active_jobs=[])) == 0.3
+    assert load.last["memory"] == (2000 + 400) / 8000
+
+    # 3 avatar + noise-cancelled calls of 2.5 units on a node serving 10
+    assert load(SimpleNamespace(active_jobs=[1, 2, 3])) == 0.75
+
+    (tmp_path / f"{os.getpid()}.json").write_text(
+        json.dumps({"lag_ms": 90, "at": time.time()})
+    )
+    (tmp_path / "999999999.json").write_text(
+        json.dumps({"lag_ms": 500, "at": time.time()})
+    )  # exited job
+    assert load(SimpleNamespace(active_jobs=[1, 2, 3])) == 0.9
+    assert not (tmp_path / "999999999.json").exists()
+
+    # No room for another job process
+    load._memory = lambda: {"total": 8000.0, "available": 300.0}
+    assert load(SimpleNamespace(active_jobs=[])) == 1.0
+
+
+def test_idle_processes_fit_in_free_memory(monkeypatch) -> None:
+    monkeypatch.setattr(worker_load, "cpu_count", lambda: 8)
+    assert worker_load.idle_processes(400, memory=lambda: MEMORY) == 4
+    assert (
+        worker_load.idle_processes(
+            400, memory=lambda: {"total": 4000.0, "available": 1000.0}
+        )
+        == 1
+    )
+    monkeypatch.setattr(worker_load, "AGENT_NUM_IDLE_PROCESSES", "6")
+    assert worker_load.idle_processes(400, memory=lambda: MEMORY) == 6
+
+
+def test_cgroup_page_cache_counts_as_available(tmp_path, monkeypatch) -> None:
+    """Inactive page cache is reclaimable, so it does not count as used memory."""
+    mb = 2**20
+    (tmp_path / "memory.max").write_text(f"{4000 * mb}\n")
+    (tmp_path / "memory.current").write_text(f"{3000 * mb}\n")
+    (tmp_path / "memory.stat").write_text(
+        f"anon {1000 * mb}\nfile {1900 * mb}\ninactive_file {1500 * mb}\n"
+    )
+    assert worker_load.memory_mb(str(tmp_path)) == {
+        "total": 4000.0,
+        "available": 2500.0,
+    }
+
+    # Without memory.stat the cgroup numbers would count the cache, psutil's are used instead
+    (tmp_path / "memory.stat").unlink()
+    monkeypatch.setattr(
+        psutil,
+        "virtual_memory",
+        lambda: SimpleNamespace(total=8000 * mb, available=6000 * mb),
+    )
+    assert worker_load.memory_mb(str(tmp_path)) == MEMORY
+
+
+async def test_job_reports_loop_lag_until_shutdown(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(worker_load, "_LAG_REPORT_INTERVAL", 0.2)
+    reporter = LoopLagReporter(directory=str(tmp_path), interval=0.01)
+    reporter.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.25)  # blocks the loop, the next sample reports it
+    await asyncio.sleep(0.05)
+
+    assert json.loads(reporter.path.read_text())["lag_ms"] >= 200
+    await reporter.aclose()
+    assert not reporter.path.exists()